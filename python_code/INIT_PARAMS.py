@@ -5,4 +5,34 @@ VIDEO_FEED_WIDTH = 400
 
 DENSITY = 7
 
-OPERATOR_SHEET = r'OperatorDetails/OperatorDetails.xlsx'
\ No newline at end of file
+OPERATOR_SHEET = r'OperatorDetails/OperatorDetails.xlsx'
+
+RADAR_SAMPLE_HZ = 10        # distance while a ladle is under the radar
+RADAR_IDLE_HZ = 1           # distance while no ladle is present
+RADAR_SLOW_POLL_S = 5       # temperature
+RADAR_DIAG_POLL_S = 10      # optional power / SNR
+NO_LADLE_DISTANCE = 16.5
+TREND_WINDOW_S = 1800
+TREND_CAPACITY = TREND_WINDOW_S * RADAR_SAMPLE_HZ
+TREND_CHART_POINTS = 600
+FLOW_WINDOW_S = 3.0
+FLOW_MIN_R2 = 0.6
+POUR_START_HOLD_S = 2.0     # a confident rise must last this long ...
+POUR_START_MIN_KG = 1000    # ... and add this much metal to start a pour
+POUR_MIN_S = 10             # shorter or lighter candidates are dropped, not stored
+POUR_MIN_KG = 2000
+
+LIVE_REFRESH_S = 0.3
+TREND_REFRESH_S = 1.0
+VIDEO_REFRESH_S = 0.2
+VIDEO_PASSTHROUGH = True    # send the camera's JPEG bytes as is (no decode/re-encode)
+VIDEO_FPS = 5               # camera tile frame rate (frames in between are skipped)
+VIDEO_QUEUE = 2             # decoded frames buffered per feed; older ones are dropped
+DEMO_VIDEO = r'VideoFeed/CameraFeed.mp4'
+HISTORY_REFRESH_S = 2.0
+HISTORY_PAGE_SIZE = 25
+
+TRACE_RECORDING = True
+
+MQTT_BROKER = "192.168.1.10"    # MQTT_BROKER / MQTT_PORT env vars override
+MQTT_PORT = 1883
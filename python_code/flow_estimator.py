@@ -0,0 +1,108 @@
+# flow_estimator.py
+import math
+from collections import deque
+
+import INIT_PARAMS as IPS
+
+RESYNC_EVERY = 1000     # recompute the sums from scratch this often (float drift)
+
+
+class FlowEstimator:
+    """Sliding-window least-squares slope of weight vs time.
+
+    Running sums make every update O(1); the fit is the flow in kg/s and
+    ``r2``/``stderr`` say how much to trust it. Times are kept relative to
+    an anchor so epoch seconds don't eat the float precision.
+    """
+
+    def __init__(self, window_s=IPS.FLOW_WINDOW_S, min_samples=3, min_span=0.75):
+        self.window_s = window_s
+        self.min_samples = min_samples
+        # a fit over a sliver of the window (e.g. just after clear()) is noise
+        self.min_span_s = min_span * window_s
+        self.clear()
+
+    def clear(self):
+        self._pts = deque()
+        self._t0 = None
+        self._sx = self._sy = self._sxx = self._sxy = self._syy = 0.0
+        self._updates = 0
+
+    def __len__(self):
+        return len(self._pts)
+
+    def _add(self, x, y, sign):
+        self._sx += sign * x
+        self._sy += sign * y
+        self._sxx += sign * x * x
+        self._sxy += sign * x * y
+        self._syy += sign * y * y
+
+    def _resync(self):
+        self._t0 = self._pts[0][0] if self._pts else None
+        self._sx = self._sy = self._sxx = self._sxy = self._syy = 0.0
+        for t, w in self._pts:
+            self._add(t - self._t0, w, 1)
+
+    def update(self, t, w):
+        """Add one (epoch seconds, kg) sample; returns the current slope.
+
+        A missing weight (None/NaN) adds nothing but still moves the
+        window on to ``t``.
+        """
+        if self._pts and t <= self._pts[-1][0]:
+            return self.slope          # duplicate / out-of-order reading
+        if w is not None and w == w:
+            if self._t0 is None:
+                self._t0 = t
+            self._pts.append((t, w))
+            self._add(t - self._t0, w, 1)
+        while self._pts and self._pts[0][0] < t - self.window_s:
+            old_t, old_w = self._pts.popleft()
+            self._add(old_t - self._t0, old_w, -1)
+
+        self._updates += 1
+        if not self._pts or self._updates % RESYNC_EVERY == 0:
+            self._resync()
+        return self.slope
+
+    def _moments(self):
+        n = len(self._pts)
+        if n < self.min_samples or self._pts[-1][0] - self._pts[0][0] < self.min_span_s:
+            return None
+        sxx = self._sxx - self._sx * self._sx / n
+        sxy = self._sxy - self._sx * self._sy / n
+        syy = self._syy - self._sy * self._sy / n
+        if sxx <= 0:
+            return None
+        return n, sxx, sxy, syy
+
+    @property
+    def slope(self):
+        """Flow in kg/s, or None until the window has enough samples."""
+        m = self._moments()
+        return None if m is None else m[2] / m[1]
+
+    @property
+    def r2(self):
+        m = self._moments()
+        if m is None:
+            return None
+        n, sxx, sxy, syy = m
+        if syy <= 0:
+            return 1.0
+        return max(min(sxy * sxy / (sxx * syy), 1.0), 0.0)
+
+    @property
+    def stderr(self):
+        """Standard error of the slope (kg/s)."""
+        m = self._moments()
+        if m is None or m[0] < 3:
+            return None
+        n, sxx, sxy, syy = m
+        resid = max(syy - sxy * sxy / sxx, 0.0)
+        return math.sqrt(resid / (n - 2) / sxx)
+
+    def confident(self, min_r2=IPS.FLOW_MIN_R2):
+        r2 = self.r2
+        return r2 is not None and r2 >= min_r2
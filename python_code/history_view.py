@@ -0,0 +1,83 @@
+# history_view.py
+import streamlit as st
+
+import INIT_PARAMS as IPS
+from pour_store import open_store, DB_FILE
+
+SHIFTS = ["A", "B", "C", "Night"]
+
+
+# =====================================================
+# CACHED QUERIES (KEYED ON THE STORE VERSION)
+# =====================================================
+@st.cache_data(max_entries=64, show_spinner=False)
+def _history_page(path, version, page, page_size, date_from, date_to, shifts, operator):
+    # ``version`` is only part of the cache key: a new pour -> new entry
+    return open_store(path).query(
+        offset=page * page_size, limit=page_size,
+        date_from=date_from, date_to=date_to,
+        shifts=list(shifts), operator=operator
+    )
+
+
+@st.cache_data(max_entries=8, show_spinner=False)
+def _operators(path, version):
+    return open_store(path).distinct("operator")
+
+
+# =====================================================
+# POUR HISTORY TABLE
+# =====================================================
+def _filters(path, version, key):
+    f1, f2, f3 = st.columns(3)
+    dates = f1.date_input("Date range", value=(), key=f"{key}_dates")
+    shifts = f2.multiselect("Shift", SHIFTS, key=f"{key}_shifts")
+    operator = f3.selectbox(
+        "Operator", [""] + _operators(path, version), key=f"{key}_operator",
+        format_func=lambda o: o or "All"
+    )
+
+    date_from = dates[0] if len(dates) > 0 else None
+    date_to = dates[1] if len(dates) > 1 else date_from
+    return date_from, date_to, tuple(shifts), operator or None
+
+
+def _turn_page(page_key, step):
+    st.session_state[page_key] += step
+
+
+def pour_history(path=DB_FILE, page_size=IPS.HISTORY_PAGE_SIZE, key="history"):
+    """Newest-first, paginated pour table. Only the visible page is
+    queried and sent, and only again once a pour has been added."""
+    version = open_store(path).version()
+    date_from, date_to, shifts, operator = _filters(path, version, key)
+
+    page_key = f"{key}_page"
+    st.session_state.setdefault(page_key, 0)
+    page = st.session_state[page_key]
+
+    df, total = _history_page(
+        path, version, page, page_size, date_from, date_to, shifts, operator
+    )
+    pages = max((total - 1) // page_size + 1, 1)
+    if page >= pages:
+        st.session_state[page_key] = page = pages - 1
+        df, total = _history_page(
+            path, version, page, page_size, date_from, date_to, shifts, operator
+        )
+
+    st.dataframe(df, use_container_width=True, hide_index=True)
+
+    p1, p2, p3 = st.columns([1, 2, 1])
+    p1.button("◀ Newer", key=f"{key}_newer", disabled=page == 0,
+              on_click=_turn_page, args=(page_key, -1))
+    p2.caption(f"Page {page + 1} of {pages} · {total} pours")
+    p3.button("Older ▶", key=f"{key}_older", disabled=page >= pages - 1,
+              on_click=_turn_page, args=(page_key, 1))
+
+
+@st.fragment(run_every=IPS.HISTORY_REFRESH_S)
+def pour_history_panel(path=DB_FILE, key="history"):
+    """``pour_history`` re-checked on a slow timer so pours saved by any
+    session show up; a cache hit costs one ``MAX(id)`` query."""
+    pour_history(path, key=key)
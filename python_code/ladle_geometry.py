@@ -0,0 +1,219 @@
+# ladle_geometry.py
+import argparse
+import json
+import math
+import os
+import threading
+from functools import lru_cache
+
+import numpy as np
+
+# =====================================================
+# LADLE PROFILES
+# =====================================================
+# Inner (hot-face) profile of a freshly lined ladle as (height above the
+# bottom, diameter) breakpoints in metres; straight lines in between.
+# The 1.2 top/bottom taper is the trapezoid ladle_imager.py draws; the
+# dimensions are nominal until each ladle's drawing is entered here.
+NOMINAL_PROFILE = ((0.0, 2.75), (5.0, 3.30))
+
+LADLE_PROFILES = {
+    "27AX": NOMINAL_PROFILE,
+    "32AV": NOMINAL_PROFILE,
+    "21AG": NOMINAL_PROFILE,
+    "27AV": NOMINAL_PROFILE,
+}
+LADLE_IDS = tuple(LADLE_PROFILES)
+# what the pages offer; None (the default) keeps the engine's plain
+# cylinder, so recorded weights don't move to nominal dimensions
+LADLE_CHOICES = (None,) + LADLE_IDS
+
+METAL_DENSITY = 7000            # kg/m3
+LUT_STEP_M = 0.001              # height resolution of the lookup table
+
+# current refractory wear per ladle (mm of wall lost since relining)
+WEAR_FILE = os.path.join("data", "ladle_wear.json")
+_wear_lock = threading.Lock()
+_wear_cache = {}                # path -> ((mtime_ns, size), wear)
+
+
+# =====================================================
+# HEIGHT -> VOLUME LOOKUP TABLE
+# =====================================================
+class LadleGeometry:
+    """A ladle profile compiled into a dense height -> volume table.
+
+    Every conversion is one ``np.interp`` over the table, so a scalar
+    and a whole trace cost the same call. Heights past the top are
+    extrapolated with the top cross-section.
+    """
+
+    def __init__(self, profile, wear_mm=0.0, step_m=LUT_STEP_M):
+        h, d = (np.asarray(v, np.float64) for v in zip(*profile))
+        if len(h) < 2 or np.any(np.diff(h) <= 0):
+            raise ValueError("profile heights must be increasing")
+        self.profile = tuple(profile)
+        self.wear_mm = float(wear_mm)
+        self.depth = float(h[-1])
+
+        # worn refractory widens the bore on both sides
+        n = int(round(self.depth / step_m)) + 1
+        self.heights = np.linspace(0.0, self.depth, n)
+        diameter = np.interp(self.heights, h, d) + 2 * self.wear_mm / 1000
+        self.areas = math.pi * (diameter / 2) ** 2
+
+        # trapezoid rule on the area; exact for the taper up to 1 mm steps
+        dv = np.diff(self.heights) * (self.areas[1:] + self.areas[:-1]) / 2
+        self.volumes = np.concatenate([[0.0], np.cumsum(dv)])
+        self.capacity = float(self.volumes[-1])
+        self._top_area = float(self.areas[-1])
+
+    @classmethod
+    def cylinder(cls, diameter_m, depth_m=5.0):
+        return cls(((0.0, diameter_m), (depth_m, diameter_m)))
+
+    def volume(self, height):
+        """m3 of metal at ``height`` m (scalar or array; NaN passes through)."""
+        h = np.asarray(height, np.float64)
+        v = np.interp(np.clip(h, 0.0, self.depth), self.heights, self.volumes)
+        v = v + np.maximum(h - self.depth, 0.0) * self._top_area
+        return float(v) if v.ndim == 0 else v
+
+    def weight(self, height, density=METAL_DENSITY):
+        """kg of metal at ``height`` m."""
+        return self.volume(height) * density
+
+    def height(self, volume):
+        """Inverse of ``volume`` within the ladle."""
+        h = np.interp(volume, self.volumes, self.heights)
+        return float(h) if np.ndim(h) == 0 else h
+
+
+# =====================================================
+# PER-LADLE WEAR AND CACHED TABLES
+# =====================================================
+def load_wear(path=WEAR_FILE):
+    """Wear per ladle; the file is only re-read after it changes."""
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return {}
+    stamp = (stat.st_mtime_ns, stat.st_size)
+    cached = _wear_cache.get(path)
+    if cached is None or cached[0] != stamp:
+        with open(path) as f:
+            cached = _wear_cache[path] = (stamp, json.load(f))
+    return dict(cached[1])
+
+
+def set_wear(ladle_id, wear_mm, path=WEAR_FILE):
+    """Record the current wall wear (0 right after relining)."""
+    if ladle_id not in LADLE_PROFILES:
+        raise KeyError(f"Unknown ladle: {ladle_id}")
+    with _wear_lock:
+        wear = load_wear(path)
+        wear[ladle_id] = float(wear_mm)
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp = path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(wear, f, indent=2, sort_keys=True)
+        os.replace(tmp, path)
+
+
+def is_nominal(ladle_id):
+    """True while the ladle still uses the placeholder NOMINAL_PROFILE
+    (weights are approximate until its drawing is entered)."""
+    return ladle_id is not None and LADLE_PROFILES[ladle_id] is NOMINAL_PROFILE
+
+
+def ladle_label(ladle_id):
+    """Selectbox label for a ``LADLE_CHOICES`` entry."""
+    return ladle_id or "Not set (plain cylinder)"
+
+
+@lru_cache(maxsize=64)
+def _compiled(profile, wear_mm):
+    return LadleGeometry(profile, wear_mm)
+
+
+def get_geometry(ladle_id, wear_mm=None):
+    """Compiled geometry for a ladle; ``wear_mm`` defaults to the value
+    in the wear file. Tables are built once per (profile, wear)."""
+    if ladle_id not in LADLE_PROFILES:
+        raise KeyError(f"Unknown ladle: {ladle_id}")
+    if wear_mm is None:
+        wear_mm = load_wear().get(ladle_id, 0.0)
+    return _compiled(LADLE_PROFILES[ladle_id], float(wear_mm))
+
+
+# =====================================================
+# BATCH RE-WEIGHING OF THE POUR HISTORY
+# =====================================================
+def reweigh(store, ladle_id, wear_mm=None, date_from=None, date_to=None,
+            density=METAL_DENSITY):
+    """Recompute ``total_weight_kg`` of a ladle's recorded pours with its
+    current (or the given) geometry; returns the number of pours updated."""
+    geometry = get_geometry(ladle_id, wear_mm)
+
+    where, args = ["ladle_id = ?"], [ladle_id]
+    if date_from is not None:
+        where.append("pour_start >= ?")
+        args.append(str(date_from))
+    if date_to is not None:
+        where.append("pour_start < date(?, '+1 day')")
+        args.append(str(date_to))
+    pours = store.read_sql(
+        "SELECT id, material_height_m, empty_distance_m, end_distance_m "
+        f"FROM pours WHERE {' AND '.join(where)}",
+        args
+    )
+
+    # radar pours may only carry the two distances
+    height = pours["material_height_m"].to_numpy(np.float64)
+    from_dist = (pours["empty_distance_m"] - pours["end_distance_m"]).clip(lower=0)
+    height = np.where(np.isnan(height), from_dist.to_numpy(np.float64), height)
+
+    ok = ~np.isnan(height)
+    weights = geometry.weight(height[ok], density)
+    return store.update_weights(dict(zip(pours["id"][ok].tolist(), weights.tolist())))
+
+
+# =====================================================
+# CLI
+# =====================================================
+def main(argv=None):
+    from pour_store import open_store
+
+    ap = argparse.ArgumentParser(description="Ladle geometry tables and history re-weighing.")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+
+    tab = sub.add_parser("table", help="print a ladle's height -> volume/weight table")
+    tab.add_argument("ladle_id", choices=LADLE_IDS)
+    tab.add_argument("--wear", type=float, default=None, help="wall wear in mm")
+    tab.add_argument("--every", type=float, default=0.25, help="row spacing in m")
+
+    wear = sub.add_parser("wear", help="record the current wall wear (0 after relining)")
+    wear.add_argument("ladle_id", choices=LADLE_IDS)
+    wear.add_argument("wear_mm", type=float)
+
+    rw = sub.add_parser("reweigh", help="recompute recorded pour weights")
+    rw.add_argument("ladle_id", choices=LADLE_IDS)
+    rw.add_argument("--wear", type=float, default=None, help="wall wear in mm")
+    rw.add_argument("--from", dest="start", default=None)
+    rw.add_argument("--to", dest="end", default=None)
+    args = ap.parse_args(argv)
+
+    if args.cmd == "table":
+        g = get_geometry(args.ladle_id, args.wear)
+        for h in np.arange(0.0, g.depth + 1e-9, args.every):
+            print(f"{h:6.2f} m  {g.volume(h):8.3f} m3  {g.weight(h) / 1000:8.2f} t")
+    elif args.cmd == "wear":
+        set_wear(args.ladle_id, args.wear_mm)
+        print(f"{args.ladle_id}: wear {args.wear_mm:g} mm")
+    else:
+        n = reweigh(open_store(legacy_csv=None), args.ladle_id, args.wear, args.start, args.end)
+        print(f"{args.ladle_id}: {n} pours re-weighed")
+
+
+if __name__ == "__main__":
+    main()
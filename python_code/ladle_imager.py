@@ -1,44 +1,162 @@
 from PIL import Image, ImageDraw
+import argparse
+import json
+import math
+import os
 import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import INIT_PARAMS as IPS
 
 # Define the liquid color and fill level
 liquid_color = (255, 165, 0)  # Orange color (RGB)
 
-def ladle_image_gen(liq_color):
-    # Calculate the coordinates of the liquid area
-    x1, y1 = 425, 1726
-    x2, y2 = 1525, 1726
-    x3, y3 = 309, 821
-    x4, y4 = 1630, 800
-
-    # Load the ladle image
-    ladle_image = Image.open("LadleImages/Ladle_Image.jpg")
-    # Create a copy of the ladle image to avoid modifying the original
-    ladle_with_liquid = ladle_image.copy()
-
-    # Create a drawing context to draw the liquid
-    draw = ImageDraw.Draw(ladle_with_liquid)
-
-    taper = x1-x3
-    height = y1-y3
-    for step in range(100):
-        fill_level = step * 0.01
-        ya = int(y1 - fill_level * y1)
-        xa = int(x1 - (y1-ya) * taper/height)
-
-        yb = int(y1 - fill_level * y1)
-        xb = int(x2 + (y1-ya) * taper/height)
-
-        # Draw the liquid based on the fill level
-        draw.polygon(
-            [(x1, y1), (x2, y2), (xb, yb), (xa, ya)],
-            fill=liq_color
-        )
-
-        # Save the image with the liquid filling
-        ladle_with_liquid.save(f"LadleImages/Ladle_Image_{step}.png")
-        time.sleep(0.3)
-
-ladle_image_gen(liquid_color)
-# # Display the image (optional)
-# ladle_with_liquid.show()
\ No newline at end of file
+# Ladle outline in Ladle_Image.jpg pixels: bottom corners, then a point
+# on each wall (sets the taper; the walls run to the top of the image)
+x1, y1 = 425, 1726
+x2, y2 = 1525, 1726
+x3, y3 = 309, 821
+x4, y4 = 1630, 800
+
+BASE_IMAGE = "LadleImages/Ladle_Image.jpg"
+ASSET_DIR = Path(__file__).parent
+ATLAS_NAME = "ladle_atlas"
+
+
+def liquid_polygon(fill_level, scale=1.0):
+    """Corners of the liquid for a fill fraction (0 = bottom, 1 = top of
+    the image), in pixels of the base image times ``scale``."""
+    fill_level = min(max(fill_level, 0.0), 1.0)
+    taper = x1 - x3
+    height = y1 - y3
+
+    ya = y1 - fill_level * y1
+    xa = x1 - (y1 - ya) * taper / height
+    xb = x2 + (y1 - ya) * taper / height
+
+    return [(x * scale, y * scale) for x, y in ((x1, y1), (x2, y2), (xb, ya), (xa, ya))]
+
+
+# =====================================================
+# FRAME RENDERING (ONE CALL PER FRAME, ANY WORKER)
+# =====================================================
+# per-process: the empty ladle at output width and its scale
+_base = None
+
+
+def _init_worker(width):
+    global _base
+    image = Image.open(ASSET_DIR / BASE_IMAGE).convert("RGB")
+    scale = 1.0
+    if width and width != image.width:
+        scale = width / image.width
+        image = image.resize((width, round(image.height * scale)), Image.LANCZOS)
+    _base = image, scale
+
+
+def render_frame(fill_level, liq_color):
+    """The ladle filled to ``fill_level`` (0-1), drawn on a fresh copy."""
+    base, scale = _base
+    image = base.copy()
+    if fill_level > 0:
+        ImageDraw.Draw(image).polygon(liquid_polygon(fill_level, scale), fill=liq_color)
+    return image
+
+
+def _save_frame(job):
+    step, fill_level, liq_color, path, fmt = job
+    image = render_frame(fill_level, liq_color)
+    if fmt == "webp":
+        image.save(path, format="WEBP", quality=85, method=4)
+    else:
+        image.save(path, format="PNG")
+    return step
+
+
+def _raw_frame(job):
+    step, fill_level, liq_color = job
+    image = render_frame(fill_level, liq_color)
+    return step, image.size, image.tobytes()
+
+
+# =====================================================
+# SPRITE SET / ATLAS
+# =====================================================
+def ladle_image_gen(liq_color, steps=100, width=None, fmt="png", atlas=False,
+                    out_dir=ASSET_DIR / "LadleImages", workers=None):
+    """Render frames 0..steps (frame n is n/steps full) across a process pool.
+
+    Writes ``Ladle_Image_{n}.{fmt}`` per frame, or with ``atlas`` one
+    ``ladle_atlas.{fmt}`` grid plus ``ladle_atlas.json`` giving each
+    frame's fill and box.
+    """
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    liq_color = tuple(liq_color)
+    fills = [step / steps for step in range(steps + 1)]
+
+    with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(width,)) as pool:
+        if not atlas:
+            jobs = [
+                (step, fill, liq_color, out_dir / f"Ladle_Image_{step}.{fmt}", fmt)
+                for step, fill in enumerate(fills)
+            ]
+            for _ in pool.map(_save_frame, jobs, chunksize=4):
+                pass
+            return [job[3] for job in jobs]
+
+        columns = math.ceil(math.sqrt(len(fills)))
+        rows = math.ceil(len(fills) / columns)
+        sheet, frames = None, []
+        jobs = [(step, fill, liq_color) for step, fill in enumerate(fills)]
+        for step, (w, h), raw in pool.map(_raw_frame, jobs, chunksize=4):
+            if sheet is None:
+                sheet = Image.new("RGB", (columns * w, rows * h))
+            x, y = (step % columns) * w, (step // columns) * h
+            sheet.paste(Image.frombytes("RGB", (w, h), raw), (x, y))
+            frames.append({"step": step, "fill": fills[step], "x": x, "y": y, "w": w, "h": h})
+
+    path = out_dir / f"{ATLAS_NAME}.{fmt}"
+    if fmt == "webp":
+        sheet.save(path, format="WEBP", quality=85, method=4)
+    else:
+        sheet.save(path, format="PNG")
+    index = {"image": path.name, "steps": steps, "columns": columns, "frames": frames}
+    with open(out_dir / f"{ATLAS_NAME}.json", "w") as f:
+        json.dump(index, f, indent=1)
+    return [path]
+
+
+# =====================================================
+# CLI
+# =====================================================
+def _color(text):
+    text = text.lstrip("#")
+    if "," in text:
+        return tuple(int(v) for v in text.split(","))
+    return tuple(int(text[i:i + 2], 16) for i in (0, 2, 4))
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Generate the ladle fill sprite set.")
+    ap.add_argument("--steps", type=int, default=100, help="frames are 0..steps")
+    ap.add_argument("--color", type=_color, default=liquid_color,
+                    help="liquid colour, 'r,g,b' or hex (default orange)")
+    ap.add_argument("--width", type=int, default=IPS.LADLE_IMG_WIDTH,
+                    help="output width (default: the display width, 0 = full size)")
+    ap.add_argument("--format", dest="fmt", choices=["png", "webp"], default="png")
+    ap.add_argument("--atlas", action="store_true", help="one sprite sheet + JSON index")
+    ap.add_argument("--out", default=str(ASSET_DIR / "LadleImages"))
+    ap.add_argument("--workers", type=int, default=os.cpu_count())
+    args = ap.parse_args(argv)
+
+    t0 = time.perf_counter()
+    paths = ladle_image_gen(args.color, args.steps, args.width, args.fmt,
+                            args.atlas, args.out, args.workers)
+    print(f"{args.steps + 1} frames -> {len(paths)} file(s) in {args.out} "
+          f"({time.perf_counter() - t0:.1f} s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+# ladle_render.py
+import io
+from functools import lru_cache
+from pathlib import Path
+
+from PIL import Image, ImageDraw
+
+import INIT_PARAMS as IPS
+import ladle_imager
+
+# =====================================================
+# LADLE SCHEMATIC + STATUS LIGHTS (RENDERED IN MEMORY)
+# =====================================================
+# The schematic is drawn straight from ladle_imager's outline at display
+# width, so any fill level works without the Ladle_Image_{n}.png set.
+# Results are PNG bytes, ready for st.image, cached per (level, width).
+ASSET_DIR = Path(__file__).parent
+FILL_STEPS = 1000               # cache key resolution (0.1 %)
+LIGHT_COLORS = ("Red", "Yellow", "Green")
+
+
+def _png(image):
+    buf = io.BytesIO()
+    image.save(buf, format="PNG", compress_level=1)
+    return buf.getvalue()
+
+
+@lru_cache(maxsize=4)
+def _base(width):
+    """The empty ladle, resized once per display width."""
+    image = Image.open(ASSET_DIR / ladle_imager.BASE_IMAGE).convert("RGB")
+    height = round(image.height * width / image.width)
+    return image.resize((width, height), Image.LANCZOS), width / image.width
+
+
+@lru_cache(maxsize=512)
+def _ladle_png(step, width, color):
+    base, scale = _base(width)
+    image = base.copy()
+    if step:
+        ImageDraw.Draw(image).polygon(
+            ladle_imager.liquid_polygon(step / FILL_STEPS, scale), fill=color
+        )
+    return _png(image)
+
+
+def ladle_png(fill_pct, width=IPS.LADLE_IMG_WIDTH, color=ladle_imager.liquid_color):
+    """PNG of the ladle filled to ``fill_pct`` (0-100, fractions fine)."""
+    step = round(min(max(fill_pct, 0.0), 100.0) * FILL_STEPS / 100)
+    return _ladle_png(step, width, tuple(color))
+
+
+@lru_cache(maxsize=8)
+def light_png(color, width=IPS.LIGHT_IMG_WIDTH):
+    """Status light (``Red``/``Yellow``/``Green``) pre-sized to ``width``."""
+    image = Image.open(ASSET_DIR / "LightImages" / f"{color}.png")
+    height = round(image.height * width / image.width)
+    return _png(image.resize((width, height), Image.LANCZOS))
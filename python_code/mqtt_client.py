@@ -1,68 +1,508 @@
 # mqtt_client.py
+import os
 import threading
 import base64
+import itertools
 import json
+import time
+import weakref
+from collections import deque
 import cv2
 import numpy as np
 import paho.mqtt.client as mqtt
 
+import INIT_PARAMS as IPS
+import telemetry_format as tf
+from pour_engine import StationPours
+from pour_store import DB_FILE
+from ring_buffer import RingBuffer
+from trace_recorder import get_recorder, trace_dir, TRACE_DTYPE, TRACE_FIELDS
+from trend_chart import TrendPyramid
+
 # =====================================================
 # MQTT CONFIG
 # =====================================================
-BROKER_IP = "192.168.1.10"
+BROKER_IP = os.environ.get("MQTT_BROKER", IPS.MQTT_BROKER)
+BROKER_PORT = int(os.environ.get("MQTT_PORT", IPS.MQTT_PORT))
+
+# "<device>/<kind>": the first level names the station (e.g. "pi", "tlc1")
+VIDEO_TOPIC  = "+/video/frame"
+GYRO_TOPIC   = "+/gyro/data"
+RS485_TOPIC  = "+/rs485/radar"
+
+TOPIC_KINDS = {"video/frame": "video", "gyro/data": "gyro", "rs485/radar": "rs485"}
+
+FANOUT_QUEUE = 2000     # per-subscriber backlog of radar/gyro messages
+TREND_COLUMNS = ("material_height", "fill_pct", "flow")
+LINGER_S = 30           # keep the connection this long after the last viewer
+
+# =====================================================
+# RADAR PARSER (MATCHES THE PI PAYLOAD)
+# =====================================================
+def parse_radar(rs):
+    if not isinstance(rs, dict):
+        return None, None, None, None
+
+    rs = {k.lower(): v for k, v in rs.items()}
+
+    try:
+        material_height = float(rs.get("material_height_m"))
+    except:
+        material_height = None
+
+    try:
+        fill_pct = float(rs.get("material_pct"))
+    except:
+        fill_pct = None
+
+    try:
+        current = float(rs.get("current_ma"))
+    except:
+        current = None
+
+    try:
+        temperature = float(rs.get("temp_c"))
+    except:
+        temperature = None
+
+    return material_height, fill_pct, current, temperature
+
+
+def radar_records(rs, t):
+    """JSON fallback: one RADAR_DTYPE record from a Pi payload dict."""
+    rec = np.zeros(1, tf.RADAR_DTYPE)
+    rec["t"] = t
+    for name, v in zip(tf.RADAR_DTYPE.names[1:], parse_radar(rs)):
+        rec[name] = np.nan if v is None else v
+    return rec
+
+
+def _record_radar(device, records):
+    rec = np.zeros(len(records), TRACE_DTYPE)
+    for name in TRACE_FIELDS:
+        rec[name] = records[name] if name in records.dtype.names else np.nan
+    rec["t"] = records["t"]
+    get_recorder(trace_dir(device)).write(rec)
+
+# =====================================================
+# JPEG PAYLOADS
+# =====================================================
+JPEG_SOI = b"\xff\xd8"
+RESIZE_QUALITY = 80
+
+
+def jpeg_bytes(payload):
+    """Raw JPEG from a payload that is either binary JPEG or base64."""
+    if payload[:2] == JPEG_SOI:
+        return bytes(payload)
+    return base64.b64decode(payload)
+
+
+def jpeg_size(data):
+    """(width, height) from the JPEG frame header, without decoding."""
+    i, n = 2, len(data)
+    while i + 9 < n:
+        if data[i] != 0xFF:
+            i += 1
+            continue
+        marker = data[i + 1]
+        if marker in (0xD8, 0x01) or 0xD0 <= marker <= 0xD7 or marker == 0xFF:
+            i += 1 if marker == 0xFF else 2
+            continue
+        length = int.from_bytes(data[i + 2:i + 4], "big")
+        # SOF0..SOF15, except DHT (C4), JPG (C8) and DAC (CC)
+        if 0xC0 <= marker <= 0xCF and marker not in (0xC4, 0xC8, 0xCC):
+            h = int.from_bytes(data[i + 5:i + 7], "big")
+            w = int.from_bytes(data[i + 7:i + 9], "big")
+            return w, h
+        i += 2 + length
+    return None
+
+
+def fit_jpeg(data, width):
+    """``data`` unchanged if it is at most ``width`` wide, otherwise a
+    downscaled re-encode (decoded at 1/2, 1/4 or 1/8 scale when that is
+    still wide enough, which is most of the saving)."""
+    size = jpeg_size(data)
+    if width is None or (size is not None and size[0] <= width):
+        return data
+
+    flags = cv2.IMREAD_COLOR
+    if size is not None:
+        for factor, reduced in ((8, cv2.IMREAD_REDUCED_COLOR_8),
+                                (4, cv2.IMREAD_REDUCED_COLOR_4),
+                                (2, cv2.IMREAD_REDUCED_COLOR_2)):
+            if size[0] // factor >= width:
+                flags = reduced
+                break
+
+    img = cv2.imdecode(np.frombuffer(data, np.uint8), flags)
+    if img is None:
+        return data
+    h, w = img.shape[:2]
+    if w > width:
+        img = cv2.resize(img, (width, max(1, h * width // w)), interpolation=cv2.INTER_AREA)
+    ok, out = cv2.imencode(".jpg", img, [cv2.IMWRITE_JPEG_QUALITY, RESIZE_QUALITY])
+    return out.tobytes() if ok else data
+
+
+# =====================================================
+# LAZY FRAME DECODER (NEWEST FRAME ONLY, ON DEMAND)
+# =====================================================
+class FrameDecoder:
+    """Decodes a station's newest stashed video payload on a worker
+    thread.
 
-VIDEO_TOPIC  = "pi/video/frame"
-GYRO_TOPIC   = "pi/gyro/data"
-RS485_TOPIC  = "pi/rs485/radar"
+    ``latest`` never blocks: it returns the last decoded frame and asks
+    the worker for a fresher one. Frames nobody asked for, or that were
+    superseded before the worker got to them, are never decoded.
+    """
+
+    def __init__(self, state):
+        self.state = state
+        self._cond = threading.Condition()
+        self._wanted = False
+        self._frame = None
+        self._seq = 0
+        self._thread = None
+
+    def latest(self):
+        """(seq, RGB frame) of the newest decoded frame, or (0, None)."""
+        with self._cond:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+            self._wanted = True
+            self._cond.notify()
+            return self._seq, self._frame
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._wanted:
+                    self._cond.wait()
+                self._wanted = False
+                done = self._seq
+
+            raw, seq = self.state.frame()
+            if raw is None or seq == done:
+                continue
+
+            try:
+                arr = np.frombuffer(jpeg_bytes(raw), np.uint8)
+            except ValueError:          # corrupt payload: wait for the next one
+                continue
+            frame = cv2.imdecode(arr, cv2.IMREAD_COLOR)
+            if frame is None:
+                continue
+            frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+            with self._cond:
+                self._seq, self._frame = seq, frame
 
 # =====================================================
-# THREAD-SAFE SHARED DATA
+# PER-STATION STATE SHARDS
 # =====================================================
-latest_data = {
-    "frame": None,
-    "gyro": {},
-    "rs485": {}
-}
+class DeviceState:
+    """Everything one station publishes, behind its own lock.
+
+    The lock only guards reference swaps and buffer appends: nothing is
+    parsed or decoded while it is held, so radar/gyro updates never wait
+    on video and one station's traffic never waits on another's.
+
+    Radar readings also go through the station's one pour detector
+    (``pours``, which stores finished pours in ``store_path``) and its
+    trend, so every viewer sees the same pours and each is saved once.
+    """
+
+    def __init__(self, name, store_path=None):
+        self.name = name
+        self.lock = threading.Lock()
+        self.frame_raw = None       # newest JPEG payload (binary or base64), undecoded
+        self.frame_seq = 0          # bumps on every video message
+        self.gyro = {}
+        self.radar = RingBuffer(IPS.TREND_CAPACITY, tf.RADAR_DTYPE.names[1:])
+        self.trend = TrendPyramid(TREND_COLUMNS)
+        self.pours = StationPours(store_path, station=name)
+        self.last_seen = 0.0
+
+        self.decoder = FrameDecoder(self)
+        self._jpeg_cache = {}       # width -> (seq, bytes); one entry per viewer width
+        self._jpeg_lock = threading.Lock()
 
-lock = threading.Lock()
+    def frame(self):
+        with self.lock:
+            return self.frame_raw, self.frame_seq
+
+    def add_radar(self, records):
+        """Append a batch of RADAR_DTYPE records in one vectorized write,
+        then feed them to the pour detector and the trend."""
+        with self.lock:
+            self.radar.extend(
+                records["t"], **{c: records[c] for c in self.radar.columns}
+            )
+            self.last_seen = time.time()
+
+        rows = []
+        for t, height, pct in zip(
+            records["t"].tolist(), records["material_height"].tolist(),
+            records["fill_pct"].tolist()
+        ):
+            height = None if height != height else height
+            pct = None if pct != pct else pct
+            self.pours.update(t, material_height=height, fill_pct=pct)
+            if height is not None:
+                rows.append((t, height, pct, self.pours.engine.flow))
+        with self.lock:
+            for t, height, pct, flow in rows:
+                self.trend.append(t, material_height=height, fill_pct=pct, flow=flow)
+
+    def series(self, column, window_s, width=IPS.TREND_CHART_POINTS):
+        """Chart-sized downsample of a trend column (see TrendPyramid)."""
+        with self.lock:
+            if not len(self.trend):
+                return None
+            return self.trend.series(column, window_s, width)
+
+    def readings(self):
+        """(gyro dict, newest radar sample dict) as last received; radar
+        fields that were missing are None."""
+        with self.lock:
+            gyro = self.gyro
+            if not len(self.radar):
+                return gyro, {}
+            radar = {c: self.radar.last(c) for c in self.radar.columns}
+            radar["t"] = self.radar.last()
+        return gyro, {k: None if v != v else v for k, v in radar.items()}
+
+    def latest_frame(self):
+        """Newest decoded camera frame (RGB array) or None."""
+        return self.decoder.latest()[1]
+
+    def latest_jpeg(self, width=None):
+        """Newest camera frame as compressed JPEG bytes, ready for the
+        browser, or None. The bytes are computed once per frame and
+        width and shared by every viewer."""
+        raw, seq = self.frame()
+        if raw is None:
+            return None
+
+        with self._jpeg_lock:
+            hit = self._jpeg_cache.get(width)
+            if hit is not None and hit[0] == seq:
+                return hit[1]
+            try:
+                data = fit_jpeg(jpeg_bytes(raw), width)
+            except ValueError:
+                return hit[1] if hit else None
+            self._jpeg_cache[width] = (seq, data)
+            return data
+
+
+_devices = {}
+_devices_lock = threading.Lock()
+
+
+def device(name):
+    """State shard for station ``name`` (created on first use)."""
+    state = _devices.get(name)
+    if state is None:
+        with _devices_lock:
+            state = _devices.get(name)
+            if state is None:
+                state = _devices[name] = DeviceState(name, _hub.store_path)
+    return state
+
+
+def devices():
+    """Names of every station heard from so far."""
+    return sorted(_devices)
 
 # =====================================================
 # CALLBACK
 # =====================================================
 def on_message(client, userdata, msg):
-    global latest_data
+    name, _, rest = msg.topic.partition("/")
+    kind = TOPIC_KINDS.get(rest)
+    if kind is None:
+        return
+    state = device(name)
+    now = time.time()
 
-    with lock:
-        if msg.topic == VIDEO_TOPIC:
-            jpg = base64.b64decode(msg.payload)
-            arr = np.frombuffer(jpg, np.uint8)
-            frame = cv2.imdecode(arr, cv2.IMREAD_COLOR)
-            if frame is not None:
-                latest_data["frame"] = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+    if kind == "video":
+        # stash only (binary or base64 JPEG); nothing is decoded here
+        with state.lock:
+            state.frame_raw = msg.payload
+            state.frame_seq += 1
+            state.last_seen = now
+        return
+
+    # ---------------- BATCHED BINARY (ONE frombuffer PER MESSAGE) ----------------
+    if tf.is_binary(msg.payload):
+        try:
+            code, records = tf.decode(msg.payload)
+        except tf.FormatError:
+            return
+        if tf.KIND_NAMES.get(code) != kind or not len(records):
+            return
+        if kind == "gyro":
+            last = records[-1]
+            _set_gyro(state, {c: float(last[c]) for c in records.dtype.names[1:]}, now)
+            _hub.publish(kind, name, records)
+        else:
+            _on_radar(name, state, records)
+        return
+
+    # ---------------- JSON FALLBACK (ONE READING PER MESSAGE) ----------------
+    payload = json.loads(msg.payload.decode())
+    if kind == "gyro":
+        _set_gyro(state, payload, now)
+        _hub.publish(kind, name, payload)
+    else:
+        _on_radar(name, state, radar_records(payload, now))
 
-        elif msg.topic == GYRO_TOPIC:
-            latest_data["gyro"] = json.loads(msg.payload.decode())
 
-        elif msg.topic == RS485_TOPIC:
-            latest_data["rs485"] = json.loads(msg.payload.decode())
+def _set_gyro(state, gyro, now):
+    with state.lock:
+        state.gyro = gyro
+        state.last_seen = now
+
+
+def _on_radar(name, state, records):
+    state.add_radar(records)
+    if IPS.TRACE_RECORDING:
+        _record_radar(name, records)
+    _hub.publish("rs485", name, records)
 
 # =====================================================
-# MQTT LOOP
+# ONE CLIENT PER PROCESS, FANNED OUT TO SESSIONS
 # =====================================================
-def _mqtt_loop():
-    client = mqtt.Client()
-    client.on_message = on_message
-    client.connect(BROKER_IP, 1883, 60)
+class Subscription:
+    """A session's handle on the shared client; holding one keeps the
+    connection up. Dropping the handle (e.g. the session ends) releases it.
+
+    Pages read the station shards and need nothing else. A consumer
+    that wants every radar/gyro message (in order, once each) attaches
+    with those ``kinds``: each message is parsed once by the hub and
+    appended to every such queue, and ``drain`` returns what it has
+    not seen yet, from every station.
+    """
+
+    def __init__(self, hub, sub_id, queues):
+        self.id = sub_id
+        self._queues = queues
+        self._finalizer = weakref.finalize(self, hub._release, sub_id)
+        self._finalizer.atexit = False
+
+    def drain(self, kind):
+        """[(epoch seconds, station, payload), ...] of ``kind`` received
+        since the last call. "rs485" payloads are RADAR_DTYPE record
+        batches; "gyro" ones a dict (JSON) or GYRO_DTYPE batch."""
+        q = self._queues[kind]
+        out = []
+        while q:
+            out.append(q.popleft())
+        return out
+
+    def close(self):
+        self._finalizer()
+
+
+class MqttHub:
+    """Reference-counted owner of the single paho client."""
+
+    def __init__(self, broker=BROKER_IP, port=BROKER_PORT, client_factory=None,
+                 store_path=DB_FILE):
+        self.broker = broker
+        self.port = port
+        self.store_path = store_path     # where station shards save pours (None: nowhere)
+        # anything with paho's Client interface (e.g. mqtt_loadgen's loopback)
+        self.client_factory = client_factory or mqtt.Client
+        self.lock = threading.Lock()
+        self._client = None
+        self._queues = {}           # subscription id -> {topic: deque}
+        self._ids = itertools.count(1)
+        self._stop_timer = None
+
+    @property
+    def viewers(self):
+        return len(self._queues)
+
+    def attach(self, kinds=()):
+        with self.lock:
+            sub_id = next(self._ids)
+            queues = {kind: deque(maxlen=FANOUT_QUEUE) for kind in kinds}
+            self._queues[sub_id] = queues
+            if self._stop_timer is not None:
+                self._stop_timer.cancel()
+                self._stop_timer = None
+            if self._client is None:
+                self._client = self._connect()
+        return Subscription(self, sub_id, queues)
+
+    def _release(self, sub_id):
+        with self.lock:
+            self._queues.pop(sub_id, None)
+            if self._queues or self._client is None or self._stop_timer is not None:
+                return
+            # a page reload re-attaches within seconds: don't reconnect for that
+            self._stop_timer = threading.Timer(LINGER_S, self._stop_if_idle)
+            self._stop_timer.daemon = True
+            self._stop_timer.start()
+
+    def _stop_if_idle(self):
+        with self.lock:
+            self._stop_timer = None
+            if self._queues or self._client is None:
+                return
+            client, self._client = self._client, None
+        client.loop_stop()
+        client.disconnect()
+
+    def _connect(self):
+        client = self.client_factory()
+        client.on_connect = _on_connect
+        client.on_message = on_message
+        client.connect_async(self.broker, self.port, 60)
+        client.loop_start()     # paho's thread; reconnects on its own
+        return client
+
+    def publish(self, kind, name, payload):
+        item = (time.time(), name, payload)
+        for queues in list(self._queues.values()):
+            if kind in queues:
+                queues[kind].append(item)
+
+
+def _on_connect(client, userdata, flags, rc):
+    # (re)subscribe on every connect so a broker restart is survived
     client.subscribe([
         (VIDEO_TOPIC, 0),
         (GYRO_TOPIC, 0),
         (RS485_TOPIC, 0)
     ])
-    client.loop_forever()
 
-# =====================================================
-# START ONCE
-# =====================================================
-def start_mqtt():
-    t = threading.Thread(target=_mqtt_loop, daemon=True)
-    t.start()
+
+_hub = MqttHub()
+
+
+def attach(kinds=()):
+    """Subscribe this session to the shared client (connecting if it is
+    the first); keep the returned handle in session state. ``kinds``
+    ("rs485", "gyro") also queues every such message for ``drain``."""
+    return _hub.attach(kinds)
+
+
+def use_transport(client_factory, broker=None, port=None):
+    """Swap the client class (tests, load generation). Only takes effect
+    for the next connection, i.e. before the first ``attach``."""
+    _hub.client_factory = client_factory
+    if broker is not None:
+        _hub.broker = broker
+    if port is not None:
+        _hub.port = port
+
+
+def use_store(path):
+    """Where station shards created from now on save their pours
+    (None: detect only, e.g. load generation)."""
+    _hub.store_path = path
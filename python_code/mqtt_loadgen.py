@@ -0,0 +1,476 @@
+# mqtt_loadgen.py
+import argparse
+import base64
+import heapq
+import json
+import queue
+import threading
+import time
+from collections import defaultdict
+
+import cv2
+import numpy as np
+
+import INIT_PARAMS as IPS
+import mqtt_client
+import telemetry_format as tf
+
+# =====================================================
+# LOAD CONFIG
+# =====================================================
+INBOX_SIZE = 1000           # loopback subscriber queue (QoS 0: overflow is dropped)
+VIDEO_VARIANTS = 8          # distinct pre-encoded frames cycled per station
+FALLS_OVER_DROP_PCT = 1.0       # a level "falls over" past this drop rate ...
+FALLS_OVER_RADAR_P99_S = 1.0    # ... or this radar time-to-screen, net of the batch period
+FALLS_OVER_VIDEO_P99_S = 1.0    # ... or this video time-to-screen
+
+
+def _kind(topic):
+    return mqtt_client.TOPIC_KINDS.get(topic.partition("/")[2])
+
+
+# =====================================================
+# LOOPBACK TRANSPORT (NO BROKER, NO NETWORK)
+# =====================================================
+def topic_matches(pattern, topic):
+    p, t = pattern.split("/"), topic.split("/")
+    for i, part in enumerate(p):
+        if part == "#":
+            return True
+        if i >= len(t) or (part != "+" and part != t[i]):
+            return False
+    return len(p) == len(t)
+
+
+class _Message:
+    __slots__ = ("topic", "payload", "sent")
+
+    def __init__(self, topic, payload, sent):
+        self.topic = topic
+        self.payload = payload
+        self.sent = sent
+
+
+class LoopbackBroker:
+    """In-process stand-in for the broker: fans each publish out to the
+    subscribed LoopbackClients."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self._clients = []
+
+    def client(self):
+        """A client factory bound to this broker (for use_transport)."""
+        return LoopbackClient(self)
+
+    def _attach(self, client):
+        with self.lock:
+            if client not in self._clients:
+                self._clients.append(client)
+
+    def _detach(self, client):
+        with self.lock:
+            if client in self._clients:
+                self._clients.remove(client)
+
+    def publish(self, topic, payload):
+        msg = _Message(topic, payload, time.time())
+        with self.lock:
+            clients = list(self._clients)
+        for c in clients:
+            if c.wants(topic):
+                c._deliver(msg)
+
+
+class LoopbackClient:
+    """The slice of paho's Client the dashboard uses, wired to a
+    LoopbackBroker. Callbacks run on the client's own thread like
+    paho's network loop, behind a bounded inbox that drops (and counts)
+    what the callback can't keep up with. Callback time is measured per
+    message kind."""
+
+    def __init__(self, broker, inbox=INBOX_SIZE):
+        self.broker = broker
+        self.on_connect = None
+        self.on_message = None
+        self._patterns = []
+        self._inbox = queue.Queue(inbox)
+        self._thread = None
+        self._stop = threading.Event()
+
+        self.received = defaultdict(int)
+        self.dropped = defaultdict(int)
+        self.decode_s = defaultdict(list)
+        self.last_sent = {}            # (station, kind) -> publish time of newest handled
+
+    # ---------------- paho API ----------------
+    def connect(self, host=None, port=1883, keepalive=60):
+        self.broker._attach(self)
+
+    connect_async = connect
+
+    def loop_start(self):
+        self.broker._attach(self)
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, daemon=True)
+        self._thread.start()
+
+    def loop_stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=2)
+
+    def disconnect(self):
+        self.broker._detach(self)
+
+    def subscribe(self, topics, qos=0):
+        if isinstance(topics, str):
+            topics = [(topics, qos)]
+        self._patterns.extend(t for t, _ in topics)
+
+    def publish(self, topic, payload, qos=0):
+        self.broker.publish(topic, payload)
+
+    # ---------------- delivery ----------------
+    def wants(self, topic):
+        return any(topic_matches(p, topic) for p in self._patterns)
+
+    def _deliver(self, msg):
+        try:
+            self._inbox.put_nowait(msg)
+        except queue.Full:
+            self.dropped[_kind(msg.topic)] += 1
+
+    def _loop(self):
+        if self.on_connect:
+            self.on_connect(self, None, {}, 0)
+        while not self._stop.is_set():
+            try:
+                msg = self._inbox.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            kind = _kind(msg.topic)
+            tic = time.perf_counter()
+            self.on_message(self, None, msg)
+            self.decode_s[kind].append(time.perf_counter() - tic)
+            self.received[kind] += 1
+            self.last_sent[(msg.topic.partition("/")[0], kind)] = msg.sent
+
+
+# =====================================================
+# SOURCES
+# =====================================================
+def synthetic_radar(n, hz, t0=0.0, pour_s=90.0, idle_s=60.0, noise=0.003):
+    """Repeating idle/pour/hold cycles of material height and fill."""
+    t = t0 + np.arange(n) / hz
+    phase = np.mod(t, idle_s + pour_s + 30.0)
+    height = np.clip((phase - idle_s) / pour_s, 0, 1) * 4.0
+    height += np.random.normal(0, noise, n)
+    return {
+        "material_height": height,
+        "fill_pct": 100 * height / 5.0,
+        "current": 4 + 16 * height / 5.0,
+        "temperature": np.full(n, 45.0),
+    }
+
+
+def recorded_radar(t0, t1, station=None):
+    from trace_recorder import load_slice, trace_dir
+
+    trace = load_slice(t0, t1, trace_dir(station))
+    if len(trace) == 0:
+        raise SystemExit("No recorded trace in that range.")
+    return {c: trace[c].astype(np.float64)
+            for c in ("material_height", "fill_pct", "current", "temperature")}
+
+
+def synthetic_frames(width, height, quality, count=VIDEO_VARIANTS):
+    """Pre-encoded JPEGs with enough detail to compress like a camera."""
+    frames = []
+    yy, xx = np.mgrid[0:height, 0:width]
+    for k in range(count):
+        img = np.stack([(xx + 8 * k) % 256, (yy + 4 * k) % 256, (xx ^ yy) % 256], -1)
+        img = (img + np.random.randint(0, 40, img.shape)).clip(0, 255).astype(np.uint8)
+        ok, buf = cv2.imencode(".jpg", img, [cv2.IMWRITE_JPEG_QUALITY, quality])
+        frames.append(buf.tobytes())
+    return frames
+
+
+# =====================================================
+# PUBLISHER
+# =====================================================
+class Publisher:
+    """Publishes every station's radar, gyro and video streams on one
+    scheduler thread at the configured rates."""
+
+    def __init__(self, publish, stations, radar, radar_hz, batch, use_json,
+                 gyro_hz, video_fps, frames, video_binary):
+        self.publish = publish
+        self.stations = stations
+        self.radar = radar
+        self.radar_hz = radar_hz
+        self.batch = batch
+        self.use_json = use_json
+        self.gyro_hz = gyro_hz
+        self.video_fps = video_fps
+        self.frames = frames if video_binary else [base64.b64encode(f) for f in frames]
+        self.sent = defaultdict(int)            # kind -> messages
+        self.samples = defaultdict(int)         # station -> radar samples
+        self.bytes = defaultdict(int)
+        self._stop = threading.Event()
+        self._cursor = defaultdict(int)
+
+    def stop(self):
+        self._stop.set()
+
+    def _radar_payloads(self, name, now):
+        n = 1 if self.use_json else self.batch
+        i = self._cursor[name]
+        idx = (i + np.arange(n)) % len(self.radar["material_height"])
+        self._cursor[name] = i + n
+        cols = {c: v[idx] for c, v in self.radar.items()}
+        cols["t"] = now - (n - 1 - np.arange(n)) / self.radar_hz
+        self.samples[name] += n
+        if not self.use_json:
+            return [tf.encode(tf.KIND_RADAR, cols)]
+        return [json.dumps({
+            "material_height_m": float(cols["material_height"][0]),
+            "material_pct": float(cols["fill_pct"][0]),
+            "current_ma": float(cols["current"][0]),
+            "temp_c": float(cols["temperature"][0]),
+        }).encode()]
+
+    def _emit(self, name, kind, now):
+        if kind == "rs485":
+            payloads = self._radar_payloads(name, now)
+            topic = f"{name}/rs485/radar"
+        elif kind == "gyro":
+            g = np.random.normal(0, 0.5, 3)
+            payloads = [tf.encode(tf.KIND_GYRO, {"t": [now], "x": g[:1], "y": g[1:2], "z": g[2:]})]
+            topic = f"{name}/gyro/data"
+        else:
+            payloads = [self.frames[self.sent[kind] % len(self.frames)]]
+            topic = f"{name}/video/frame"
+        for p in payloads:
+            self.publish(topic, p)
+            self.sent[kind] += 1
+            self.bytes[kind] += len(p)
+
+    def run(self, duration):
+        periods = {"rs485": (1 if self.use_json else self.batch) / self.radar_hz,
+                   "gyro": 1.0 / self.gyro_hz if self.gyro_hz else None,
+                   "video": 1.0 / self.video_fps if self.video_fps else None}
+        start = time.monotonic()
+        due = [(start + k * 1e-3, name, kind)
+               for k, (name, kind) in enumerate(
+                   (n, kd) for n in self.stations for kd, p in periods.items() if p)]
+        heapq.heapify(due)
+        while due and not self._stop.is_set():
+            at, name, kind = heapq.heappop(due)
+            if at - start > duration:
+                break
+            delay = at - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            self._emit(name, kind, time.time())
+            heapq.heappush(due, (at + periods[kind], name, kind))
+
+
+# =====================================================
+# VIEWERS (WHAT ONE Test.py SESSION DOES)
+# =====================================================
+class Viewer(threading.Thread):
+    """Reads each station's readings, pour status and trend, and fetches
+    its frame, at the page's refresh rates (pour detection itself runs
+    once per station, in the hub)."""
+
+    def __init__(self, stations, transport, passthrough=IPS.VIDEO_PASSTHROUGH):
+        super().__init__(daemon=True)
+        self.stations = stations
+        self.transport = transport
+        self.passthrough = passthrough
+        self.sub = mqtt_client.attach()
+        self.radar_latency = []
+        self.video_latency = []
+        self.cpu_s = 0.0
+        self._halt = threading.Event()
+
+    def stop(self):
+        self._halt.set()
+
+    def _live(self):
+        now = time.time()
+        for name in self.stations:
+            state = mqtt_client.device(name)
+            _, radar = state.readings()
+            state.pours.status()
+            state.series("material_height", IPS.TREND_WINDOW_S)
+            if radar.get("t") is not None:
+                self.radar_latency.append(now - radar["t"])
+
+    def _video(self):
+        for name in self.stations:
+            state = mqtt_client.device(name)
+            if self.passthrough:
+                frame = state.latest_jpeg(IPS.VIDEO_FEED_WIDTH)
+            else:
+                frame = state.latest_frame()
+            sent = getattr(self.transport, "last_sent", {}).get((name, "video"))
+            if frame is not None and sent is not None:
+                self.video_latency.append(time.time() - sent)
+
+    def run(self):
+        cpu0 = time.thread_time()
+        next_live = next_video = time.monotonic()
+        while not self._halt.is_set():
+            now = time.monotonic()
+            if now >= next_live:
+                self._live()
+                next_live += IPS.LIVE_REFRESH_S
+            if now >= next_video:
+                self._video()
+                next_video += IPS.VIDEO_REFRESH_S
+            self._halt.wait(max(min(next_live, next_video) - time.monotonic(), 0))
+        self.cpu_s = time.thread_time() - cpu0
+
+
+# =====================================================
+# ONE LOAD LEVEL
+# =====================================================
+def _pct(values, q):
+    return float(np.percentile(values, q)) if len(values) else float("nan")
+
+
+def run_level(args, publish, transport, stations, radar, frames, video_fps):
+    before = {s: (mqtt_client.device(s).radar.total, mqtt_client.device(s).frame_seq)
+              for s in stations}
+    recv0 = dict(getattr(transport, "received", {}))
+    drop0 = dict(getattr(transport, "dropped", {}))
+    dec0 = {k: len(v) for k, v in getattr(transport, "decode_s", {}).items()}
+
+    viewers = [Viewer(stations, transport) for _ in range(args.viewers)]
+    pub = Publisher(publish, stations, radar, args.radar_hz, args.batch, args.json,
+                    args.gyro_hz, video_fps, frames, args.video_binary)
+    cpu0, wall0 = time.process_time(), time.monotonic()
+    for v in viewers:
+        v.start()
+    pub.run(args.duration)
+    time.sleep(0.5)                     # let in-flight messages land
+    for v in viewers:
+        v.stop()
+        v.join()
+        v.sub.close()
+    wall = time.monotonic() - wall0
+    cpu = time.process_time() - cpu0
+
+    # ---------------- drops: published vs what reached the station shards ----------------
+    got_samples = sum(mqtt_client.device(s).radar.total - before[s][0] for s in stations)
+    got_frames = sum(mqtt_client.device(s).frame_seq - before[s][1] for s in stations)
+    sent_samples = sum(pub.samples.values())
+    radar_drop = 100 * max(sent_samples - got_samples, 0) / max(sent_samples, 1)
+    video_drop = 100 * max(pub.sent["video"] - got_frames, 0) / max(pub.sent["video"], 1)
+
+    radar_lat = np.concatenate([v.radar_latency for v in viewers]) if viewers else []
+    video_lat = np.concatenate([v.video_latency for v in viewers]) if viewers else []
+    frame_kb = np.mean([len(f) for f in pub.frames]) / 1024 if pub.frames else 0
+
+    print(f"\n== {len(stations)} station(s), {args.viewers} viewer(s), radar {args.radar_hz:g} Hz"
+          f" ({'json' if args.json else f'batch {args.batch}'}), video {video_fps:g} fps"
+          f" @ {frame_kb:,.0f} KB, {wall:.1f} s")
+    for kind in ("rs485", "gyro", "video"):
+        if not pub.sent[kind]:
+            continue
+        line = f"  {kind:6s} sent {pub.sent[kind]:7,d}  {pub.bytes[kind] / wall / 1024:9,.1f} KB/s"
+        if hasattr(transport, "received"):
+            recv = transport.received[kind] - recv0.get(kind, 0)
+            drop = transport.dropped[kind] - drop0.get(kind, 0)
+            dec = transport.decode_s[kind][dec0.get(kind, 0):]
+            line += (f"  recv {recv:7,d}  dropped {drop:6,d}"
+                     f"  callback p50 {_pct(dec, 50) * 1e6:7.1f} us  p99 {_pct(dec, 99) * 1e6:7.1f} us")
+        print(line)
+    # a batch's newest sample waits up to one batch period before it is sent;
+    # that is the chosen trade-off, not saturation, so it is judged net of it
+    batch_s = 0.0 if args.json else args.batch / args.radar_hz
+    radar_net = np.maximum(np.asarray(radar_lat) - batch_s, 0)
+    print(f"  radar  samples lost {radar_drop:5.2f} %   time-to-screen p50 {_pct(radar_lat, 50) * 1e3:6.0f} ms"
+          f"  p99 {_pct(radar_lat, 99) * 1e3:6.0f} ms"
+          f"  (p99 {_pct(radar_net, 99) * 1e3:.0f} ms net of the {batch_s * 1e3:.0f} ms batch)")
+    if pub.sent["video"]:
+        print(f"  video  frames lost  {video_drop:5.2f} %   time-to-screen p50 {_pct(video_lat, 50) * 1e3:6.0f} ms"
+              f"  p99 {_pct(video_lat, 99) * 1e3:6.0f} ms")
+    per_viewer = [100 * v.cpu_s / wall for v in viewers]
+    print(f"  cpu    process {100 * cpu / wall:5.1f} %   per viewer {np.mean(per_viewer) if per_viewer else 0:5.1f} %")
+
+    falls_over = bool(max(radar_drop, video_drop) > FALLS_OVER_DROP_PCT
+                       or _pct(radar_net, 99) > FALLS_OVER_RADAR_P99_S
+                       or (len(video_lat) and _pct(video_lat, 99) > FALLS_OVER_VIDEO_P99_S))
+    if falls_over:
+        print("  ** falls over at this level **")
+    return falls_over
+
+
+# =====================================================
+# CLI
+# =====================================================
+def _floats(text):
+    return [float(v) for v in text.split(",")]
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Drive mqtt_client with synthetic or recorded streams.")
+    ap.add_argument("--broker", default=None,
+                    help="publish through a real broker (default: in-process loopback)")
+    ap.add_argument("--port", type=int, default=mqtt_client.BROKER_PORT)
+    ap.add_argument("--stations", type=int, default=1)
+    ap.add_argument("--viewers", type=int, default=1)
+    ap.add_argument("--duration", type=float, default=10.0, help="seconds per level")
+    ap.add_argument("--radar-hz", type=float, default=20.0)
+    ap.add_argument("--batch", type=int, default=10, help="radar samples per binary message")
+    ap.add_argument("--json", action="store_true", help="one JSON message per radar sample")
+    ap.add_argument("--gyro-hz", type=float, default=10.0)
+    ap.add_argument("--video-fps", type=_floats, default=[10.0],
+                    help="comma list: each value is one load level")
+    ap.add_argument("--video-size", default="1280x720")
+    ap.add_argument("--video-quality", type=int, default=80)
+    ap.add_argument("--video-binary", action="store_true", help="raw JPEG instead of base64")
+    ap.add_argument("--from", dest="start", default=None, help="replay recorded radar from here")
+    ap.add_argument("--to", dest="end", default=None)
+    args = ap.parse_args(argv)
+
+    from datetime import datetime
+
+    if args.start:
+        end = datetime.fromisoformat(args.end) if args.end else datetime.now()
+        radar = recorded_radar(datetime.fromisoformat(args.start).timestamp(), end.timestamp())
+    else:
+        radar = synthetic_radar(int(600 * args.radar_hz), args.radar_hz)
+    w, h = (int(v) for v in args.video_size.lower().split("x"))
+    frames = synthetic_frames(w, h, args.video_quality)
+    stations = [f"load{i + 1}" for i in range(args.stations)]
+
+    transport = None
+    if args.broker:
+        import paho.mqtt.client as mqtt
+
+        mqtt_client.use_transport(mqtt.Client, args.broker, args.port)
+        out = mqtt.Client()
+        out.connect(args.broker, args.port, 60)
+        out.loop_start()
+        publish = out.publish
+    else:
+        broker = LoopbackBroker()
+        mqtt_client.use_transport(broker.client)
+        publish = broker.publish
+
+    IPS.TRACE_RECORDING = False         # load samples stay out of data/traces
+    mqtt_client.use_store(None)         # detect pours, never store them
+    hold = mqtt_client.attach()         # keeps the hub connected between levels
+    if not args.broker:
+        transport = mqtt_client._hub._client
+    for fps in args.video_fps:
+        if run_level(args, publish, transport, stations, radar, frames, fps):
+            break
+    hold.close()
+
+if __name__ == "__main__":
+    main()
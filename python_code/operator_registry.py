@@ -0,0 +1,114 @@
+# operator_registry.py
+import hashlib
+import os
+import threading
+from pathlib import Path
+
+import pandas as pd
+
+import INIT_PARAMS as IPS
+
+# =====================================================
+# OPERATOR ROSTER (OperatorDetails.xlsx, PARSED ONCE PER CHANGE)
+# =====================================================
+# Every rerun only stats the file; the workbook is hashed when its
+# mtime/size move and re-parsed only when the contents really changed.
+ROSTER_FILE = Path(__file__).parent / IPS.OPERATOR_SHEET
+NAME_COLUMN = "Operator"
+ID_COLUMNS = ("Employee ID", "EmployeeID", "Employee Id", "Emp ID", "ID")   # optional
+
+
+def _key(text):
+    return str(text).strip().casefold()
+
+
+def _employee_id(value):
+    # Excel hands numeric IDs back as floats (1234.0)
+    if value is None or value != value:
+        return None
+    text = str(value).strip()
+    return text[:-2] if text.endswith(".0") else text or None
+
+
+def _file_hash(path):
+    h = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 16), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+class Roster:
+    """Indexed operator sheet: ``frame`` (indexed by operator name) plus
+    dict lookups by name (case/space-insensitive) and employee ID."""
+
+    def __init__(self, frame, version=None):
+        id_column = next((c for c in ID_COLUMNS if c in frame.columns), None)
+        frame = frame.dropna(subset=[NAME_COLUMN]).copy()
+        frame[NAME_COLUMN] = frame[NAME_COLUMN].astype(str).str.strip()
+        if id_column is not None:
+            frame = frame.rename(columns={id_column: "Employee ID"})
+            frame["Employee ID"] = frame["Employee ID"].map(_employee_id)
+
+        self.frame = frame.set_index(NAME_COLUMN, drop=True)
+        self.version = version
+        self.names = self.frame.index.tolist()
+
+        records = self.frame.reset_index().to_dict("records")
+        if id_column is not None:
+            for r in records:
+                r["Employee ID"] = _employee_id(r["Employee ID"])  # NaN -> None
+        self._by_name = {_key(r[NAME_COLUMN]): r for r in records}
+        self._by_id = {
+            _key(r["Employee ID"]): r for r in records if r.get("Employee ID")
+        }
+
+    def __len__(self):
+        return len(self.names)
+
+    def get(self, name):
+        """The operator's row as a dict, or None."""
+        return self._by_name.get(_key(name)) if name else None
+
+    def by_employee_id(self, employee_id):
+        return self._by_id.get(_key(employee_id)) if employee_id else None
+
+    def lookup(self, text):
+        """Row for a name or an employee ID."""
+        return self.get(text) or self.by_employee_id(text)
+
+    def employee_id(self, name):
+        row = self.get(name)
+        return row.get("Employee ID") if row else None
+
+
+EMPTY = Roster(pd.DataFrame({NAME_COLUMN: pd.Series(dtype=str)}))
+
+# =====================================================
+# PROCESS-WIDE CACHE
+# =====================================================
+_cache = {}         # path -> (stat signature, content hash, Roster)
+_cache_lock = threading.Lock()
+
+
+def get_roster(path=ROSTER_FILE):
+    """The current roster; EMPTY if the sheet is missing."""
+    path = str(path)
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return EMPTY
+    signature = (st.st_mtime_ns, st.st_size)
+
+    with _cache_lock:
+        cached = _cache.get(path)
+        if cached is not None and cached[0] == signature:
+            return cached[2]
+
+        digest = _file_hash(path)
+        if cached is not None and cached[1] == digest:
+            roster = cached[2]              # touched, not changed
+        else:
+            roster = Roster(pd.read_excel(path), version=digest)
+        _cache[path] = (signature, digest, roster)
+        return roster
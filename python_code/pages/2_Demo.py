@@ -1,14 +1,17 @@
 import random
 import numpy as np
-import pandas as pd
 import streamlit as st
 import time
 import INIT_PARAMS as IPS
-from pathlib import Path
+from pour_analytics import operator_performance
+from ladle_geometry import LADLE_CHOICES, LadleGeometry, get_geometry, is_nominal, ladle_label
+from ladle_render import ladle_png, light_png, LIGHT_COLORS
+from operator_registry import get_roster
+from video_source import file_feed
 
-# Define the initial value of current_flow_rate
+# Define the initial value of current_flow_rate (mean over the pour so far)
 if 'flow_rate' not in st.session_state:
-    st.session_state.flow_rate = []
+    st.session_state.flow_rate = 0.0
 if 'fill_level' not in st.session_state:
     st.session_state.fill_level = 0
 if 'threshold' not in st.session_state:
@@ -16,25 +19,29 @@ if 'threshold' not in st.session_state:
 if 'df_op' not in st.session_state:
     st.session_state.df_op = None
 
+# no ladle picked: the Demo's original scale (pi m2 cross-section, 8 m deep)
+DEMO_LADLE = LadleGeometry.cylinder(2.0, 8.0)
+
 
 # Function to update the Streamlit app with sensor data
 def update_streamlit():
     global initial_sensor_reading
     count = 0
+    flow_total = 0.0    # running sum, so the mean flow is O(1) per tick
     sensor_reading = initial_sensor_reading
     while True:
         # Simulate sensor reading (replace with actual sensor code)
-        if count == 0:
-            st.session_state.flow_rate = []
-        flow_ = np.round(0.05 * random.random(), 3)
-        st.session_state.flow_rate.append(flow_)  # 0 to 0.05 fill rate random
-        sensor_reading_new = sensor_reading - st.session_state.flow_rate[count]  # Simulated sensor reading
+        flow_ = np.round(0.05 * random.random(), 3)  # 0 to 0.05 fill rate random
+        flow_total += flow_
+        st.session_state.flow_rate = flow_total / (count + 1)
+        sensor_reading_new = sensor_reading - flow_  # Simulated sensor reading
         st.session_state.fill_level = min(int(100 * (initial_sensor_reading - sensor_reading)), 100)    # Simulated fill level
 
-        wt_raw = np.round(st.session_state.fill_level * 0.01 * 3.142 * IPS.DENSITY * 8, 2)
+        geometry = get_geometry(ladle_id) if ladle_id else DEMO_LADLE
+        wt_raw = np.round(geometry.weight(st.session_state.fill_level * 0.01 * geometry.depth, IPS.DENSITY), 2)
         wt_mdld = np.round(wt_raw + np.random.randint(-50, 100) * 0.01, 2)
 
-        etf = np.round((st.session_state.threshold - st.session_state.fill_level) / np.mean(np.array(st.session_state.flow_rate)), 2)
+        etf = np.round((st.session_state.threshold - st.session_state.fill_level) / st.session_state.flow_rate, 2)
         etf_c = etf if etf >= 0 else 0
 
         # Update the Streamlit app
@@ -55,31 +62,45 @@ def update_streamlit():
         else:
             status_light.image(status_images['Green'], width=IPS.LIGHT_IMG_WIDTH)
 
-        ladle_img_path = Path(__file__).parent.parent / 'LadleImages' / f'Ladle_Image_{st.session_state.fill_level}.png'
-        bucket_image.image(str(ladle_img_path), width=IPS.LADLE_IMG_WIDTH,
+        bucket_image.image(ladle_png(st.session_state.fill_level), width=IPS.LADLE_IMG_WIDTH,
                            caption=f'Fill Level: {int(st.session_state.fill_level)}%')
 
+        show_camera()
+
         # Sleep for a short interval
         time.sleep(0.3)
         count += 1
         sensor_reading = sensor_reading_new
 
+# Newest camera frame (decoded, skipped and resized on the feed's own thread)
+def show_camera():
+    frame = file_feed().latest(wait_s=1.0)
+    if frame is not None:
+        operation_feed.image(frame, width=IPS.VIDEO_FEED_WIDTH)
+    else:
+        operation_feed.info("Starting camera feed...")
+
 # Set the layout to a two-column format
 st.set_page_config(layout="wide")
 
-# Load Operator file
-operator_sheet = Path(__file__).parent.parent / 'OperatorDetails' / 'OperatorDetails.xlsx'
-st.session_state.df_op = pd.read_excel(operator_sheet)
-st.session_state.df_op = st.session_state.df_op.set_index('Operator', drop=True)
+# Operator roster (parsed once per change to the sheet)
+roster = get_roster()
+st.session_state.df_op = roster.frame
 
 # Create columns for layout
 left_col, right_col = st.columns(2)
 
 with st.sidebar.form(key="Operator Details"):
     st.sidebar.header('Operator Details')
-    operator_names = st.session_state.df_op.index.values.tolist()
-    operator_name = st.sidebar.selectbox('Operator Name', (operator_names))
-    performance_val = int(100 * st.session_state.df_op.at[operator_name, 'Adhered']/st.session_state.df_op.at[operator_name, 'Runs'])
+    operator_name = st.sidebar.selectbox('Operator Name', roster.names)
+    # recorded pours when there are any, the roster sheet figures otherwise
+    recorded = operator_performance(operator_name)
+    if recorded:
+        runs, adhered = recorded
+    else:
+        row = roster.get(operator_name)
+        runs, adhered = row['Runs'], row['Adhered']
+    performance_val = int(100 * adhered / runs)
     operator_stopped_count = st.sidebar.metric('Performance %', value=performance_val)
     op_details_submitted = st.form_submit_button("Submit Details")
     if op_details_submitted:
@@ -87,7 +108,10 @@ with st.sidebar.form(key="Operator Details"):
 
 with st.sidebar.form(key="Ladle Details"):
     st.sidebar.header('Ladle Details')
-    ladle_id = st.sidebar.selectbox('Ladle ID', ('27AX', '32AV', '21AG', '27AV'))
+    ladle_id = st.sidebar.selectbox('Ladle ID', LADLE_CHOICES, format_func=ladle_label)
+    if is_nominal(ladle_id):
+        st.sidebar.warning(f"⚠️ {ladle_id} uses the placeholder nominal profile "
+                           "(uncalibrated): weights are approximate.")
     tlc_stand = st.sidebar.selectbox('TLC Stand', ('1', '2'))
     ladle_details_submitted = st.form_submit_button("Submit Ladle")
     if ladle_details_submitted:
@@ -105,15 +129,9 @@ with left_col:
         etf_placeholder = st.empty()
 
         st.header('Status Lights')
-        redpath = Path(__file__).parent.parent / 'LightImages' / 'Red.png'
-        yellowpath = Path(__file__).parent.parent / 'LightImages' / 'Yellow.png'
-        greenpath = Path(__file__).parent.parent / 'LightImages' / 'Green.png'
-        status_images = {
-            'Red': str(redpath),
-            'Yellow': str(yellowpath),
-            'Green': str(greenpath)
-        }
-        status_light = st.image(str(greenpath), width=IPS.LIGHT_IMG_WIDTH)
+        # pre-sized PNG bytes, decoded once per process
+        status_images = {color: light_png(color) for color in LIGHT_COLORS}
+        status_light = st.image(status_images['Green'], width=IPS.LIGHT_IMG_WIDTH)
 
         ladle_details_submitted = st.form_submit_button("Submit ladle details")
         if ladle_details_submitted:
@@ -122,13 +140,12 @@ with left_col:
 # Right column with Bucket Schematic and Operator Stats
 with right_col:
     st.header('Bucket Schematic')
-    init_image =  Path(__file__).parent.parent / 'LadleImages' / 'Ladle_Image_0.png'
-    video_gif =  Path(__file__).parent.parent / 'VideoFeed' / 'CameraFeed.gif'
-    bucket_image = st.image(str(init_image), width=IPS.LADLE_IMG_WIDTH,
+    bucket_image = st.image(ladle_png(0), width=IPS.LADLE_IMG_WIDTH,
                             caption=f'Fill Level: {int(st.session_state.fill_level)}%')
 
     st.header('Live Camera Feed')
-    operation_feed = st.image(str(video_gif), width=IPS.VIDEO_FEED_WIDTH)
+    operation_feed = st.empty()
+    show_camera()
 
 # Initialize the initial sensor reading
 initial_sensor_reading = 1
@@ -0,0 +1,116 @@
+import streamlit as st
+import pandas as pd
+
+import pour_analytics as pa
+from pour_store import open_store
+from ring_buffer import local_times
+from trace_recorder import load_slice, trace_dir
+
+# =====================================================
+# STREAMLIT CONFIG
+# =====================================================
+st.set_page_config(page_title="Pour Analytics", layout="wide")
+st.title("📊 Pour Analytics")
+
+store = open_store()
+version = store.version()
+
+# =====================================================
+# CACHED AGGREGATES (A NEW POUR -> NEW VERSION)
+# =====================================================
+@st.cache_data(max_entries=16, show_spinner=False)
+def shift_tonnage(path, version, day_from, day_to):
+    return pa.tonnage_per_shift(path, day_from, day_to)
+
+
+@st.cache_data(max_entries=16, show_spinner=False)
+def operators(path, version, day_from, day_to):
+    return pa.operator_summary(path, day_from, day_to)
+
+
+@st.cache_data(max_entries=16, show_spinner=False)
+def flow_distribution(path, version, operator, day_from, day_to):
+    return pa.operator_flow_distribution(path, operator, day_from, day_to)
+
+
+@st.cache_data(max_entries=16, show_spinner=False)
+def durations(path, version, day_from, day_to):
+    return pa.duration_percentiles(path, day_from=day_from, day_to=day_to)
+
+# =====================================================
+# SIDEBAR
+# =====================================================
+st.sidebar.header("🔎 Filters")
+dates = st.sidebar.date_input("Date range", value=())
+day_from = dates[0] if len(dates) > 0 else None
+day_to = dates[1] if len(dates) > 1 else day_from
+
+summary = operators(store.path, version, day_from, day_to)
+operator = st.sidebar.selectbox(
+    "Operator", [""] + summary.index.tolist(), format_func=lambda o: o or "All"
+)
+
+st.caption(f"{store.count()} pours recorded")
+
+# =====================================================
+# TONNAGE PER SHIFT
+# =====================================================
+st.subheader("⚖️ Tonnage per Shift")
+tonnage = shift_tonnage(store.path, version, day_from, day_to)
+if tonnage.empty:
+    st.info("No pours in the selected range.")
+else:
+    st.bar_chart(tonnage.pivot(index="day", columns="shift", values="tonnes").fillna(0))
+
+# =====================================================
+# OPERATORS
+# =====================================================
+st.subheader("👷 Operators")
+st.dataframe(summary, use_container_width=True)
+
+st.subheader("🌊 Average Flow Distribution (kg/s)")
+dist = flow_distribution(store.path, version, operator or None, day_from, day_to)
+if dist.empty:
+    st.info("No flow data yet.")
+else:
+    st.bar_chart(dist)
+
+# =====================================================
+# DURATION PERCENTILES
+# =====================================================
+st.subheader("⏱️ Pour Duration Percentiles")
+cols = st.columns(4)
+for col, (p, v) in zip(cols, durations(store.path, version, day_from, day_to).items()):
+    col.metric(f"P{p} (s)", "—" if v != v else f"{v:.0f}")
+
+# =====================================================
+# POUR TRACE (POST-MORTEM FROM THE RAW RECORDINGS)
+# =====================================================
+st.markdown("---")
+st.subheader("🔬 Pour Trace")
+recent, _ = store.query(
+    limit=200, date_from=day_from, date_to=day_to, operator=operator or None
+)
+recent = recent[recent["trace_t0"].notna()]
+
+if recent.empty:
+    st.info("No recorded pours with a trace yet.")
+else:
+    labels = {
+        i: f"{r.pour_id} · {r.operator or '—'} · {r.total_weight_kg or 0:,.0f} kg"
+        for i, r in recent.iterrows()
+    }
+    pick = st.selectbox("Pour", list(labels), format_func=labels.get)
+    row = recent.loc[pick]
+    trace = load_slice(row["trace_t0"], row["trace_t1"], trace_dir(row["station"]))
+    if len(trace) == 0:
+        st.info("The trace for this pour has been rotated out.")
+    else:
+        df = pd.DataFrame({
+            "time": local_times(trace["t"]),
+            "material_height": trace["material_height"],
+            "fill_pct": trace["fill_pct"],
+            "distance": trace["distance"],
+        }).set_index("time")
+        st.line_chart(df[["material_height", "distance"]], height=250)
+        st.line_chart(df[["fill_pct"]], height=250)
@@ -1,9 +1,13 @@
 import streamlit as st
-import math, time, os
-import pandas as pd
-from datetime import datetime
 
-from mqtt_client import start_mqtt, latest_data, lock
+import INIT_PARAMS as IPS
+from ladle_geometry import LADLE_CHOICES, is_nominal, ladle_label
+from trend_chart import TREND_WINDOWS
+from pour_store import open_store
+from history_view import pour_history_panel, SHIFTS
+from operator_registry import get_roster
+from mqtt_client import attach, device, devices
+from video_source import station_feed
 
 # =====================================================
 # STREAMLIT CONFIG
@@ -11,69 +15,22 @@ from mqtt_client import start_mqtt, latest_data, lock
 st.set_page_config(page_title="Radar Ladle Pouring", layout="wide")
 
 # =====================================================
-# START MQTT ONCE
+# SHARED MQTT CLIENT (ONE PER PROCESS, THIS SESSION SUBSCRIBES)
 # =====================================================
-if "mqtt_started" not in st.session_state:
-    start_mqtt()
-    st.session_state.mqtt_started = True
+if "mqtt_sub" not in st.session_state:
+    st.session_state.mqtt_sub = attach()
 
 # =====================================================
 # CONSTANTS
 # =====================================================
-FLOW_START_KG_S = 50
-FLOW_STOP_KG_S  = 10
-
-LADLE_DIAMETER_M = 3.0
-METAL_DENSITY   = 7000
-
 MIN_HEIGHT_ALARM = 0.5
 MAX_HEIGHT_ALARM = 14.0
 
 # =====================================================
-# DATA STORAGE
+# DATA STORAGE (APPEND-ONLY, IMPORTS THE OLD CSV ONCE)
 # =====================================================
-DATA_DIR = "data"
-HISTORY_FILE = os.path.join(DATA_DIR, "pour_history.csv")
-os.makedirs(DATA_DIR, exist_ok=True)
-
-if not os.path.exists(HISTORY_FILE):
-    pd.DataFrame(columns=[
-        "pour_id","operator","employee_id","shift",
-        "pour_start","pour_end","duration_s",
-        "material_height_m","fill_pct",
-        "total_weight_kg","avg_flow_kg_s"
-    ]).to_csv(HISTORY_FILE, index=False)
-
-# =====================================================
-# RADAR PARSER (MATCHES YOUR PAYLOAD)
-# =====================================================
-def parse_radar(rs):
-    if not isinstance(rs, dict):
-        return None, None, None, None
-
-    rs = {k.lower(): v for k, v in rs.items()}
-
-    try:
-        material_height = float(rs.get("material_height_m"))
-    except:
-        material_height = None
-
-    try:
-        fill_pct = float(rs.get("material_pct"))
-    except:
-        fill_pct = None
-
-    try:
-        current = float(rs.get("current_ma"))
-    except:
-        current = None
-
-    try:
-        temperature = float(rs.get("temp_c"))
-    except:
-        temperature = None
-
-    return material_height, fill_pct, current, temperature
+# pours are detected and written once per station by the MQTT hub
+store = open_store()
 
 # =====================================================
 # UI HEADER
@@ -81,154 +38,174 @@ def parse_radar(rs):
 st.title("🔥 Radar-Based Ladle Pouring Dashboard (MQTT)")
 
 # =====================================================
-# SIDEBAR
+# SIDEBAR – STATIONS
 # =====================================================
-st.sidebar.header("👷 Operator Details")
-operator     = st.sidebar.text_input("Operator Name")
-employee_id  = st.sidebar.text_input("Employee ID")
-shift        = st.sidebar.selectbox("Shift", ["A","B","C","Night"])
+st.sidebar.header("📡 Stations")
+known    = devices()
+stations = st.sidebar.multiselect(
+    "Stations", known, default=known[:1], help="Pick several to tile them side by side"
+)
 
-# =====================================================
-# SESSION STATE
-# =====================================================
-ss = st.session_state
-ss.setdefault("samples", [])
-ss.setdefault("pouring", False)
-ss.setdefault("pour_start", None)
-ss.setdefault("trend", [])
-
-# =====================================================
-# FETCH MQTT DATA
-# =====================================================
-with lock:
-    frame = latest_data["frame"]
-    gyro  = latest_data["gyro"]
-    rs    = latest_data["rs485"]
-
-material_height, fill_pct, current, temperature = parse_radar(rs)
-now = datetime.now()
 
-# =====================================================
-# WEIGHT & FLOW
-# =====================================================
-area = math.pi * (LADLE_DIAMETER_M / 2) ** 2
-weight = None
-flow = None
-
-if material_height is not None:
-    weight = material_height * area * METAL_DENSITY
-    ss.samples.append({"t": now, "w": weight})
-    ss.samples = ss.samples[-20:]
-
-    if len(ss.samples) >= 2:
-        dw = ss.samples[-1]["w"] - ss.samples[-2]["w"]
-        dt = (ss.samples[-1]["t"] - ss.samples[-2]["t"]).total_seconds()
-        if dt > 0 and dw > 0:
-            flow = dw / dt
-
-# =====================================================
-# POUR START / END
-# =====================================================
-if not ss.pouring and flow and flow > FLOW_START_KG_S:
-    ss.pouring = True
-    ss.pour_start = now
+def shown():
+    # nothing picked yet (e.g. no station had published at page load)
+    return stations or devices()[:1]
 
-if ss.pouring and flow and flow < FLOW_STOP_KG_S:
-    ss.pouring = False
-    duration = (now - ss.pour_start).total_seconds()
 
-    df = pd.read_csv(HISTORY_FILE)
-    df.loc[len(df)] = [
-        now.strftime("%Y%m%d_%H%M%S"),
-        operator, employee_id, shift,
-        ss.pour_start, now, duration,
-        material_height, fill_pct,
-        weight, flow
-    ]
-    df.to_csv(HISTORY_FILE, index=False)
-    ss.samples.clear()
+# what each station's detector tags pours with; a new session starts
+# from it, so opening the page never changes the recorded operator
+current = {name: device(name).pours.context() for name in shown()}
+first = current[shown()[0]] if current else {"ladle_id": None}
 
 # =====================================================
-# STORE TRENDS (FIXED)
+# SIDEBAR – OPERATOR
 # =====================================================
-if material_height is not None:
-    ss.trend.append({
-        "time": now,
-        "material_height": material_height,
-        "fill_pct": fill_pct,
-        "flow": flow
-    })
-
-# ✅ FIXED SLICE (NO INDEX ERROR)
-ss.trend = ss.trend[-300:]
-
-trend_df = pd.DataFrame(ss.trend)
+st.sidebar.header("👷 Operator Details")
+roster = get_roster()
+if len(roster):
+    name = first.get("operator")
+    operator = st.sidebar.selectbox(
+        "Operator Name", roster.names, placeholder="Select operator",
+        index=roster.names.index(name) if name in roster.names else None
+    ) or ""
+else:
+    operator = st.sidebar.text_input("Operator Name", first.get("operator", ""))  # no roster sheet
+known_id = roster.employee_id(operator)
+if known_id is None and operator == first.get("operator"):
+    default_id = first.get("employee_id") or ""
+else:
+    default_id = known_id or ""
+employee_id = st.sidebar.text_input(
+    "Employee ID", default_id, disabled=known_id is not None, key=f"employee_id_{operator}"
+)
+shift = st.sidebar.selectbox(
+    "Shift", SHIFTS, index=SHIFTS.index(first.get("shift", SHIFTS[0]))
+)
+
+st.sidebar.header("🪣 Ladles")
+for name, ctx in current.items():
+    ladle_id = st.sidebar.selectbox(
+        f"Ladle ID · {name}", LADLE_CHOICES, format_func=ladle_label,
+        index=LADLE_CHOICES.index(ctx["ladle_id"]) if ctx["ladle_id"] in LADLE_CHOICES else 0
+    )
+    if is_nominal(ladle_id):
+        st.sidebar.warning(f"⚠️ {ladle_id} uses the placeholder nominal profile "
+                           "(uncalibrated): weights are approximate.")
+    context = dict(ladle_id=ladle_id, operator=operator, employee_id=employee_id, shift=shift)
+    if context != ctx:
+        device(name).pours.set_context(**context)
+
+st.sidebar.header("📈 Trend")
+trend_window = TREND_WINDOWS[st.sidebar.selectbox("Window", list(TREND_WINDOWS))]
+
+# =====================================================
+# LIVE PANEL (REFRESHES ON ITS OWN TIMER)
+# =====================================================
+def station_readings(name, compact):
+    gyro, radar = device(name).readings()
+    material_height = radar.get("material_height")
+    fill_pct        = radar.get("fill_pct")
+    temperature     = radar.get("temperature")
+    flow = device(name).pours.status()["flow"]
+
+    # ---------------- GYRO ----------------
+    if not compact:
+        st.subheader("🧭 Gyroscope")
+    if gyro:
+        cols = st.columns(len(gyro))
+        for col, (k, v) in zip(cols, gyro.items()):
+            col.metric(k, f"{v:.2f}")
+
+    # ---------------- RADAR METRICS ----------------
+    if not compact:
+        st.subheader("📡 Radar Readings")
+
+    if compact:
+        left, right = st.columns(2)
+        r1, r2, r3, r4 = left, right, left, right
+    else:
+        r1, r2, r3, r4 = st.columns(4)
+
+    r1.metric("Material Height (m)", f"{material_height:.2f}" if material_height else "—")
+    r2.metric("Fill (%)", f"{fill_pct:.1f}%" if fill_pct else "—")
+    r3.metric("Flow (kg/s)", f"{flow:.1f}" if flow else "—")
+    r4.metric("Temperature (°C)", f"{temperature:.1f}" if temperature else "—")
+
+    # ---------------- ALARMS ----------------
+    if material_height is not None:
+        if material_height < MIN_HEIGHT_ALARM:
+            st.error("🔴 LOW LEVEL ALARM")
+        elif material_height > MAX_HEIGHT_ALARM:
+            st.error("🔴 HIGH LEVEL ALARM")
+        else:
+            st.success("🟢 Level Normal")
+
+
+@st.fragment(run_every=IPS.LIVE_REFRESH_S)
+def live_panel():
+    # pour detection and trends run in the MQTT hub, on every message
+    names = shown()
+    if not names:
+        st.info("Waiting for a station to publish...")
+        return
+    for col, name in zip(st.columns(len(names)), names):
+        with col:
+            if len(names) > 1:
+                st.markdown(f"### {name}")
+            station_readings(name, compact=len(names) > 1)
 
 # =====================================================
 # VIDEO
 # =====================================================
-st.subheader("📷 Live Camera Feed")
-if frame is not None:
-    st.image(frame)
-else:
-    st.info("Waiting for video stream...")
+@st.fragment(run_every=IPS.VIDEO_REFRESH_S)
+def video_panel():
+    names = shown()
+    for col, name in zip(st.columns(max(len(names), 1)), names):
+        if IPS.VIDEO_PASSTHROUGH:
+            frame = station_feed(name).latest()
+        else:
+            frame = device(name).latest_frame()
 
-# =====================================================
-# GYRO
-# =====================================================
-st.subheader("🧭 Gyroscope")
-if gyro:
-    cols = st.columns(len(gyro))
-    for col, (k, v) in zip(cols, gyro.items()):
-        col.metric(k, f"{v:.2f}")
+        if frame is not None:
+            col.image(frame, width=IPS.VIDEO_FEED_WIDTH, caption=name)
+        else:
+            col.info(f"Waiting for video stream from {name}...")
 
 # =====================================================
-# RADAR METRICS
+# REAL-TIME CHARTS
 # =====================================================
-st.subheader("📡 Radar Readings")
-
-r1, r2, r3, r4 = st.columns(4)
+@st.fragment(run_every=IPS.TREND_REFRESH_S)
+def trend_panel():
+    names = shown()
+    for col, name in zip(st.columns(max(len(names), 1)), names):
+        with col:
+            state = device(name)
+            height = state.series("material_height", trend_window)
+            if height is None:
+                st.info("Waiting for radar data...")
+                continue
+            st.line_chart(height, height=250)
+            st.line_chart(state.series("fill_pct", trend_window), height=250)
 
-r1.metric("Material Height (m)", f"{material_height:.2f}" if material_height else "—")
-r2.metric("Fill (%)", f"{fill_pct:.1f}%" if fill_pct else "—")
-r3.metric("Flow (kg/s)", f"{flow:.1f}" if flow else "—")
-r4.metric("Temperature (°C)", f"{temperature:.1f}" if temperature else "—")
+            flow = state.series("flow", trend_window)
+            if not flow.empty:
+                st.line_chart(flow, height=250)
 
 # =====================================================
-# ALARMS
+# LAYOUT
 # =====================================================
-if material_height is not None:
-    if material_height < MIN_HEIGHT_ALARM:
-        st.error("🔴 LOW LEVEL ALARM")
-    elif material_height > MAX_HEIGHT_ALARM:
-        st.error("🔴 HIGH LEVEL ALARM")
-    else:
-        st.success("🟢 Level Normal")
+st.subheader("📷 Live Camera Feed")
+video_panel()
+
+live_panel()
 
-# =====================================================
-# REAL-TIME CHARTS
-# =====================================================
 st.markdown("---")
 st.subheader("📈 Real-Time Trends")
-
-if not trend_df.empty:
-    st.line_chart(trend_df.set_index("time")[["material_height"]], height=250)
-    st.line_chart(trend_df.set_index("time")[["fill_pct"]], height=250)
-
-    if trend_df["flow"].notna().any():
-        st.line_chart(trend_df.set_index("time")[["flow"]], height=250)
-else:
-    st.info("Waiting for radar data...")
+trend_panel()
 
 # =====================================================
 # HISTORY
 # =====================================================
 st.markdown("---")
 st.subheader("📜 Pour History")
-st.dataframe(pd.read_csv(HISTORY_FILE), use_container_width=True)
-
-# =====================================================
-# AUTO REFRESH
-# =====================================================
-time.sleep(0.3)
-st.rerun()
+pour_history_panel(store.path)
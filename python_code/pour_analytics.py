@@ -0,0 +1,95 @@
+# pour_analytics.py
+import math
+
+from pour_store import open_store, DB_FILE, FLOW_BIN_KG_S, DURATION_BIN_S
+
+# All figures come from the agg_* tables the store keeps up to date on
+# every insert, so nothing here scans the pours table.
+
+
+def _where(day_from=None, day_to=None, *conditions):
+    """WHERE clause and args for a day range plus extra (sql, args) terms."""
+    where, args = [], []
+    if day_from is not None:
+        where.append("day >= ?")
+        args.append(str(day_from))
+    if day_to is not None:
+        where.append("day <= ?")
+        args.append(str(day_to))
+    for sql, values in conditions:
+        where.append(sql)
+        args.extend(values)
+    return (f"WHERE {' AND '.join(where)}" if where else ""), args
+
+
+def tonnage_per_shift(path=DB_FILE, day_from=None, day_to=None):
+    clause, args = _where(day_from, day_to)
+    return open_store(path).read_sql(
+        f"SELECT day, shift, pours, total_kg / 1000.0 AS tonnes "
+        f"FROM agg_shift {clause} ORDER BY day, shift",
+        args
+    )
+
+
+def operator_summary(path=DB_FILE, day_from=None, day_to=None):
+    clause, args = _where(day_from, day_to, ("operator != ''", ()))
+    df = open_store(path).read_sql(
+        "SELECT operator, SUM(pours) AS pours, SUM(total_kg) / 1000.0 AS tonnes, "
+        "SUM(flow_n) AS flow_n, SUM(flow_sum) AS flow_sum, SUM(flow_sq) AS flow_sq, "
+        "SUM(rated) AS runs, SUM(adhered) AS adhered "
+        f"FROM agg_operator {clause} GROUP BY operator ORDER BY operator",
+        args
+    )
+    n = df["flow_n"].where(df["flow_n"] > 0)
+    df["mean_flow_kg_s"] = df["flow_sum"] / n
+    df["std_flow_kg_s"] = (df["flow_sq"] / n - df["mean_flow_kg_s"] ** 2).clip(lower=0) ** 0.5
+    df["performance_pct"] = 100 * df["adhered"] / df["runs"].where(df["runs"] > 0)
+    return df.drop(columns=["flow_n", "flow_sum", "flow_sq"]).set_index("operator")
+
+
+def operator_performance(operator, path=DB_FILE, day_from=None, day_to=None):
+    """(runs, adhered) for one operator, or None if nothing was rated."""
+    clause, args = _where(day_from, day_to, ("operator = ?", (operator,)))
+    row = open_store(path).read_sql(
+        f"SELECT SUM(rated) AS rated, SUM(adhered) AS adhered FROM agg_operator {clause}",
+        args
+    )
+    if row.empty or not row.at[0, "rated"]:
+        return None
+    return int(row.at[0, "rated"]), int(row.at[0, "adhered"])
+
+
+def operator_flow_distribution(path=DB_FILE, operator=None, day_from=None, day_to=None):
+    who = ("operator = ?", (operator,)) if operator else ("operator != ''", ())
+    clause, args = _where(day_from, day_to, who)
+    df = open_store(path).read_sql(
+        f"SELECT operator, bin, SUM(n) AS n FROM agg_operator_flow {clause} "
+        "GROUP BY operator, bin ORDER BY operator, bin",
+        args
+    )
+    df["flow_kg_s"] = df["bin"] * FLOW_BIN_KG_S
+    return df.pivot(index="flow_kg_s", columns="operator", values="n").fillna(0)
+
+
+def duration_percentiles(path=DB_FILE, percentiles=(50, 90, 95, 99), day_from=None, day_to=None):
+    """Percentiles from the duration histogram, linear within a bin."""
+    clause, args = _where(day_from, day_to)
+    hist = open_store(path).read_sql(
+        f"SELECT bin, SUM(n) AS n FROM agg_duration {clause} GROUP BY bin ORDER BY bin", args
+    )
+    total = hist["n"].sum()
+    if not total:
+        return {p: math.nan for p in percentiles}
+
+    result = {}
+    cum = hist["n"].cumsum().to_numpy()
+    bins = hist["bin"].to_numpy()
+    counts = hist["n"].to_numpy()
+    for p in percentiles:
+        target = total * p / 100
+        i = int((cum < target).sum())
+        i = min(i, len(bins) - 1)
+        before = cum[i] - counts[i]
+        frac = (target - before) / counts[i]
+        result[p] = (bins[i] + frac) * DURATION_BIN_S
+    return result
@@ -0,0 +1,505 @@
+# pour_engine.py
+import argparse
+import itertools
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+import numpy as np
+
+import INIT_PARAMS as IPS
+from flow_estimator import FlowEstimator
+from ladle_geometry import LadleGeometry, LADLE_IDS, get_geometry
+
+# =====================================================
+# PROCESS CONSTANTS (DEFAULTS, OVERRIDABLE PER ENGINE)
+# =====================================================
+DEFAULTS = {
+    "no_ladle_distance": IPS.NO_LADLE_DISTANCE,
+    "full_ladle_distance": 11.5,
+    "stable_time_s": 3,
+    "flow_start_kg_s": 50,
+    "flow_stop_kg_s": 10,
+    "ladle_id": None,             # None -> plain cylinder of ladle_diameter_m
+    "ladle_diameter_m": 3.0,
+    "metal_density": 7000,
+    "flow_window_s": IPS.FLOW_WINDOW_S,
+    "flow_min_r2": IPS.FLOW_MIN_R2,
+    "flow_min_samples": 3,
+    "flow_min_span": 0.75,        # fraction of the window a fit must cover
+    # start hysteresis: a confident fit above flow_start_kg_s must hold
+    # this long and add this much metal before it counts as a pour
+    "start_hold_s": IPS.POUR_START_HOLD_S,
+    "start_min_kg": IPS.POUR_START_MIN_KG,
+    # a finished pour shorter or lighter than this is dropped
+    "min_pour_s": IPS.POUR_MIN_S,
+    "min_pour_kg": IPS.POUR_MIN_KG,
+}
+
+
+def _dt(t):
+    return datetime.fromtimestamp(t)
+
+
+def ladle_geometry(p):
+    if p["ladle_id"]:
+        return get_geometry(p["ladle_id"])
+    return LadleGeometry.cylinder(p["ladle_diameter_m"])
+
+
+def is_pour(p, duration_s, net_kg):
+    """Whether a finished candidate is long and heavy enough to keep."""
+    return duration_s >= p["min_pour_s"] and net_kg >= p["min_pour_kg"]
+
+
+def pour_record(p, t_start, t_end, distance, material_height, fill_pct, weight, flow):
+    """Pour-store row (without operator fields) for a finished pour."""
+    if distance is not None and distance == distance:
+        adhered = int(distance >= p["full_ladle_distance"])
+    elif fill_pct is not None and fill_pct == fill_pct:
+        adhered = int(fill_pct <= 100)
+    else:
+        adhered = None
+
+    def num(v):
+        return None if v is None or v != v else float(v)
+
+    return {
+        "pour_id": _dt(t_end).strftime("%Y%m%d_%H%M%S"),
+        "ladle_id": p["ladle_id"],
+        "pour_start": _dt(t_start),
+        "pour_end": _dt(t_end),
+        "duration_s": t_end - t_start,
+        "end_distance_m": num(distance),
+        "material_height_m": num(material_height),
+        "fill_pct": num(fill_pct),
+        "total_weight_kg": num(weight),
+        "avg_flow_kg_s": num(flow),
+        "adhered": adhered,
+        "trace_t0": t_start,
+        "trace_t1": t_end,
+    }
+
+
+# =====================================================
+# STREAMING ENGINE (LIVE PAGES)
+# =====================================================
+class PourEngine:
+    """Pour detection as a pure function of timestamped readings.
+
+    Feed readings in time order with ``update``; it returns the events
+    the reading caused (``empty_learned``, ``pour_start``, ``pour_end``,
+    or ``pour_discarded`` for a pour too short or light to keep) and
+    leaves the latest derived values on the instance for display.
+    Radar-distance input learns the empty ladle itself; material-height
+    input (MQTT) is used as is.
+    """
+
+    def __init__(self, **params):
+        unknown = set(params) - set(DEFAULTS)
+        if unknown:
+            raise KeyError(f"Unknown engine parameters: {sorted(unknown)}")
+        self.params = {**DEFAULTS, **params}
+        self.geometry = ladle_geometry(self.params)
+        self.flow_est = FlowEstimator(
+            self.params["flow_window_s"], self.params["flow_min_samples"],
+            self.params["flow_min_span"]
+        )
+
+        self.empty_distance = None
+        self.stable_since = None
+        self.pouring = False
+        self.pour_start = None
+        self.start_weight = None
+        self.candidate = None         # (t, weight) where the start condition began
+        self.last_weight = None       # last valid weight (dropouts keep it)
+
+        self.t = None
+        self.distance = None
+        self.material_height = None
+        self.fill_pct = None
+        self.weight = None
+        self.flow = None
+        self.eta = None
+
+    def weight_of(self, height):
+        return self.geometry.weight(height, self.params["metal_density"])
+
+    def set_ladle(self, ladle_id):
+        """Switch ladles without losing the learned empty distance."""
+        if ladle_id != self.params["ladle_id"]:
+            self.params["ladle_id"] = ladle_id
+            self.geometry = ladle_geometry(self.params)
+            self.flow_est.clear()
+
+    def update(self, t, distance=None, material_height=None, fill_pct=None):
+        p = self.params
+        events = []
+        self.t = t
+        self.distance = distance
+
+        # ---------------- EMPTY LADLE AUTO-LEARN ----------------
+        if distance is not None:
+            if distance > p["no_ladle_distance"]:
+                if self.stable_since is None:
+                    self.stable_since = t
+                if (self.empty_distance is None
+                        and t - self.stable_since >= p["stable_time_s"]):
+                    self.empty_distance = distance
+                    events.append({"event": "empty_learned", "t": t, "distance": distance})
+            else:
+                self.stable_since = None
+
+            material_height = None
+            if self.empty_distance and distance:
+                material_height = max(self.empty_distance - distance, 0)
+                span = self.empty_distance - p["full_ladle_distance"]
+                fill_pct = 100 * material_height / span if span > 0 else None
+
+        # ---------------- WEIGHT & FLOW ----------------
+        self.material_height = material_height
+        self.fill_pct = fill_pct
+        self.weight = None
+        if material_height is not None:
+            self.weight = self.weight_of(material_height)
+            if self.weight == self.weight:
+                self.last_weight = self.weight
+        # a lost echo (no weight) still slides the window, as replay's fit does
+        self.flow_est.update(t, self.weight)
+        self.flow = flow = self.flow_est.slope
+
+        # ---------------- POUR START (WITH HYSTERESIS) ----------------
+        if not self.pouring:
+            if (flow is not None and flow > p["flow_start_kg_s"]
+                    and self.flow_est.confident(p["flow_min_r2"])):
+                if self.candidate is None:
+                    self.candidate = (t, self.last_weight)
+                t0, w0 = self.candidate
+                if (t - t0 >= p["start_hold_s"]
+                        and self.last_weight - w0 >= p["start_min_kg"]):
+                    self.pouring = True
+                    self.pour_start, self.start_weight = t0, w0
+                    self.candidate = None
+                    events.append({"event": "pour_start", "t": t0})
+            else:
+                self.candidate = None
+
+        # ---------------- POUR END ----------------
+        if self.pouring and flow is not None and flow < p["flow_stop_kg_s"]:
+            self.pouring = False
+            self.flow_est.clear()
+            if is_pour(p, t - self.pour_start, self.last_weight - self.start_weight):
+                pour = pour_record(
+                    p, self.pour_start, t, distance, material_height,
+                    fill_pct, self.weight, flow
+                )
+                pour["empty_distance_m"] = self.empty_distance
+                events.append({"event": "pour_end", "t": t, "pour": pour})
+            else:
+                events.append({"event": "pour_discarded", "t": t, "start": self.pour_start})
+
+        # ---------------- ETA ----------------
+        self.eta = None
+        if self.pouring and flow and flow > 0 and self.weight is not None and self.empty_distance:
+            full = self.weight_of(self.empty_distance - p["full_ladle_distance"])
+            self.eta = max(full - self.weight, 0) / flow
+
+        return events
+
+
+# =====================================================
+# ONE DETECTOR PER STATION (SHARED BY EVERY VIEWER)
+# =====================================================
+EVENT_LOG = 50      # recent events kept for the pages
+
+
+class StationPours:
+    """A station's single ``PourEngine`` and what happens to its events.
+
+    The acquisition side (radar worker, MQTT callback) feeds every
+    reading through ``update``; each finished pour is tagged with the
+    ladle/operator fields last given to ``set_context`` and appended to
+    the store at ``store_path`` (None: not stored). Pages only read
+    ``status``, ``context`` and ``recent``, so a pour is written once no
+    matter how many sessions watch the station.
+    """
+
+    def __init__(self, store_path, station=None, **params):
+        self.store_path = store_path
+        self.station = station
+        self.lock = threading.Lock()
+        self.engine = PourEngine(**params)
+        self.events = deque(maxlen=EVENT_LOG)
+        self._fields = {}
+
+    def set_context(self, ladle_id=None, **fields):
+        """Ladle and operator fields (operator, employee_id, shift) for
+        the pours finished from now on."""
+        with self.lock:
+            self.engine.set_ladle(ladle_id)
+            self._fields = fields
+
+    def context(self):
+        with self.lock:
+            return {"ladle_id": self.engine.params["ladle_id"], **self._fields}
+
+    def update(self, t, **reading):
+        """Feed one reading (as ``PourEngine.update``); returns its events."""
+        with self.lock:
+            events = self.engine.update(t, **reading)
+            fields = self._fields
+        for ev in events:
+            if ev["event"] == "pour_end":
+                ev["pour"].update(fields, station=self.station)
+                if self.store_path:
+                    from pour_store import open_store
+                    ev["id"] = open_store(self.store_path).append(**ev["pour"])
+        if events:
+            with self.lock:
+                self.events.extend(events)
+        return events
+
+    def status(self):
+        """The engine's latest derived values (None where unknown)."""
+        with self.lock:
+            e = self.engine
+            return {
+                "t": e.t, "material_height": e.material_height, "fill_pct": e.fill_pct,
+                "weight": e.weight, "flow": e.flow, "eta": e.eta,
+                "pouring": e.pouring, "pour_start": e.pour_start,
+            }
+
+    def recent(self, kind=None):
+        """Recent events, oldest first (only ``kind`` if given)."""
+        with self.lock:
+            return [ev for ev in self.events if kind is None or ev["event"] == kind]
+
+
+# =====================================================
+# BATCH REPLAY (VECTORIZED)
+# =====================================================
+def rolling_fit(t, w, window_s, min_samples=3, min_span=0.75, block=8192):
+    """Least-squares slope and r2 of ``w(t)`` over the trailing
+    ``window_s`` at every sample (NaN where the live estimator would
+    have no answer). Also returns each window's first index.
+
+    Cumulative sums are taken per block, anchored at the block's
+    lookback start, so months of epoch times keep their precision.
+    """
+    n = len(t)
+    slope = np.full(n, np.nan)
+    r2 = np.full(n, np.nan)
+    first = np.searchsorted(t, t - window_s, side="left")
+
+    for s0 in range(0, n, block):
+        s1 = min(s0 + block, n)
+        lo = first[s0]
+        x = t[lo:s1] - t[lo]
+        y = w[lo:s1]
+        ok = ~np.isnan(y)
+        y0 = y[ok][0] if ok.any() else 0.0
+        x = np.where(ok, x, 0.0)
+        y = np.where(ok, y - y0, 0.0)
+
+        def csum(v):
+            return np.concatenate([[0.0], np.cumsum(v)])
+
+        cn, cx, cy = csum(ok.astype(float)), csum(x), csum(y)
+        cxx, cxy, cyy = csum(x * x), csum(x * y), csum(y * y)
+
+        a = first[s0:s1] - lo
+        b = np.arange(s0, s1) - lo + 1
+        cnt = cn[b] - cn[a]
+        # span between the first and last *valid* sample in each window
+        valid_idx = np.where(ok, np.arange(lo, s1), -1)
+        last_valid = np.maximum.accumulate(valid_idx)
+        next_valid = np.minimum.accumulate(
+            np.where(ok, np.arange(lo, s1), n)[::-1]
+        )[::-1]
+        i_last = last_valid[b - 1]
+        i_first = np.append(next_valid, n)[a]
+        span = np.where(
+            (i_last >= 0) & (i_first < n),
+            t[np.clip(i_last, 0, n - 1)] - t[np.clip(i_first, 0, n - 1)], 0.0
+        )
+        with np.errstate(invalid="ignore", divide="ignore"):
+            sx, sy = cx[b] - cx[a], cy[b] - cy[a]
+            sxx = (cxx[b] - cxx[a]) - sx * sx / cnt
+            sxy = (cxy[b] - cxy[a]) - sx * sy / cnt
+            syy = (cyy[b] - cyy[a]) - sy * sy / cnt
+            good = (cnt >= min_samples) & (span >= min_span * window_s) & (sxx > 0)
+            slope[s0:s1] = np.where(good, sxy / sxx, np.nan)
+            fit = np.where(syy > 0, sxy * sxy / (sxx * syy), 1.0)
+            r2[s0:s1] = np.where(good, np.clip(fit, 0.0, 1.0), np.nan)
+
+    return slope, r2, first
+
+
+def learn_empty(t, distance, no_ladle_distance, stable_time_s):
+    """Index where the live engine would learn the empty ladle, or None."""
+    above = distance > no_ladle_distance
+    run_start = above & ~np.concatenate([[False], above[:-1]])
+    if not run_start.any():
+        return None
+    run_id = np.cumsum(run_start)
+    start_t = t[np.flatnonzero(run_start)][np.maximum(run_id - 1, 0)]
+    ok = above & (t - start_t >= stable_time_s)
+    return int(ok.argmax()) if ok.any() else None
+
+
+def replay(t, distance=None, material_height=None, fill_pct=None, **params):
+    """Pours the live engine would have found in a recorded trace.
+
+    Everything per-sample is vectorized; only pour transitions are
+    visited in Python. One approximation: straight after a pour ends, a
+    new pour can only start once the whole flow window lies after it
+    (the live estimator restarts from a partial window).
+    """
+    p = {**DEFAULTS, **params}
+    t = np.asarray(t, np.float64)
+    n = len(t)
+    geometry = ladle_geometry(p)
+    empty = None
+
+    if distance is not None:
+        distance = np.asarray(distance, np.float64)
+        learned = learn_empty(t, distance, p["no_ladle_distance"], p["stable_time_s"])
+        height = np.full(n, np.nan)
+        if learned is not None:
+            empty = float(distance[learned])
+            d = distance[learned:]
+            height[learned:] = np.where((d != 0) & ~np.isnan(d), np.maximum(empty - d, 0), np.nan)
+            span = empty - p["full_ladle_distance"]
+            fill_pct = 100 * height / span if span > 0 else np.full(n, np.nan)
+    else:
+        height = np.asarray(material_height, np.float64)
+    fill_pct = np.full(n, np.nan) if fill_pct is None else np.asarray(fill_pct, np.float64)
+
+    weight = geometry.weight(height, p["metal_density"])
+    flow, r2, first = rolling_fit(
+        t, weight, p["flow_window_s"], p["flow_min_samples"], p["flow_min_span"]
+    )
+
+    # the last valid weight at every sample, as the live engine holds it
+    # through lost echoes
+    valid = ~np.isnan(weight)
+    w_last = weight[np.maximum.accumulate(np.where(valid, np.arange(n), 0))]
+
+    with np.errstate(invalid="ignore"):
+        cond = (flow > p["flow_start_kg_s"]) & (r2 >= p["flow_min_r2"])
+        stops = np.flatnonzero(flow < p["flow_stop_kg_s"])
+
+    # start hysteresis: each run of ``cond`` is anchored at its first
+    # sample; the pour starts there once the run has lasted long enough
+    # and gained enough weight
+    run_start = cond & ~np.concatenate([[False], cond[:-1]])
+    anchor = np.maximum.accumulate(np.where(run_start, np.arange(n), 0))
+
+    def held(k, c):
+        return (t[k] - t[c] >= p["start_hold_s"]) & (w_last[k] - w_last[c] >= p["start_min_kg"])
+
+    confirmed = np.flatnonzero(cond & held(np.arange(n), anchor))
+
+    pours = []
+    pos = 0
+    while pos < n:
+        if cond[pos]:
+            # a run already under way when the previous pour's window
+            # cleared: the live engine anchors it here
+            rest = cond[pos:]
+            end = pos + (len(rest) if rest.all() else int(rest.argmin()))
+            hit = np.flatnonzero(held(np.arange(pos, end), pos))
+            if not len(hit):
+                pos = end
+                continue
+            c, k = pos, pos + int(hit[0])
+        else:
+            j = np.searchsorted(confirmed, pos)
+            if j >= len(confirmed):
+                break
+            k = int(confirmed[j])
+            c = int(anchor[k])
+
+        m = np.searchsorted(stops, k)
+        if m >= len(stops):
+            break                       # still pouring at the end of the trace
+        e = stops[m]
+        pos = max(e + 1, int(np.searchsorted(first, e, side="right")))
+        if not is_pour(p, t[e] - t[c], w_last[e] - w_last[c]):
+            continue
+
+        pour = pour_record(
+            p, t[c], t[e],
+            None if distance is None else distance[e],
+            height[e], fill_pct[e], weight[e], flow[e]
+        )
+        pour["empty_distance_m"] = empty
+        pours.append(pour)
+    return pours
+
+
+def replay_trace(trace, **params):
+    """``replay`` over a ``trace_recorder`` record array."""
+    if np.isfinite(trace["distance"]).any():
+        return replay(trace["t"], distance=trace["distance"], **params)
+    return replay(
+        trace["t"], material_height=trace["material_height"],
+        fill_pct=trace["fill_pct"], **params
+    )
+
+
+# =====================================================
+# CLI: BACKTEST A PARAMETER GRID OVER RECORDED TRACES
+# =====================================================
+def _floats(text):
+    return [float(v) for v in text.split(",")]
+
+
+def main(argv=None):
+    from trace_recorder import load_slice, trace_dir
+
+    ap = argparse.ArgumentParser(description="Replay recorded radar traces through the pour engine.")
+    ap.add_argument("--from", dest="start", required=True, help="start, e.g. 2025-12-01")
+    ap.add_argument("--to", dest="end", required=True, help="end, e.g. 2025-12-31T23:59")
+    ap.add_argument("--station", default=None, help="MQTT station (default: wired radar)")
+    ap.add_argument("--traces", default=None, help="segment directory (overrides --station)")
+    ap.add_argument("--ladle", choices=LADLE_IDS, default=None, help="ladle geometry for weights")
+    ap.add_argument("--stable-time", type=_floats, default=[DEFAULTS["stable_time_s"]])
+    ap.add_argument("--flow-start", type=_floats, default=[DEFAULTS["flow_start_kg_s"]])
+    ap.add_argument("--flow-stop", type=_floats, default=[DEFAULTS["flow_stop_kg_s"]])
+    ap.add_argument("--flow-window", type=_floats, default=[DEFAULTS["flow_window_s"]])
+    ap.add_argument("--start-hold", type=_floats, default=[DEFAULTS["start_hold_s"]])
+    ap.add_argument("--start-min-kg", type=_floats, default=[DEFAULTS["start_min_kg"]])
+    args = ap.parse_args(argv)
+
+    t0 = datetime.fromisoformat(args.start).timestamp()
+    t1 = datetime.fromisoformat(args.end).timestamp()
+    trace = load_slice(t0, t1, args.traces or trace_dir(args.station))
+    if len(trace) == 0:
+        print("No trace data in that range.")
+        return
+    span_s = trace["t"][-1] - trace["t"][0]
+    print(f"{len(trace):,} samples, {span_s / 3600:.1f} h of data")
+
+    grid = itertools.product(args.stable_time, args.flow_start, args.flow_stop,
+                             args.flow_window, args.start_hold, args.start_min_kg)
+    for stable, start, stop, window, hold, gain in grid:
+        tic = time.perf_counter()
+        pours = replay_trace(
+            trace, ladle_id=args.ladle, stable_time_s=stable, flow_start_kg_s=start,
+            flow_stop_kg_s=stop, flow_window_s=window, start_hold_s=hold, start_min_kg=gain
+        )
+        took = time.perf_counter() - tic
+        tonnes = sum(p["total_weight_kg"] or 0 for p in pours) / 1000
+        mean_dur = np.mean([p["duration_s"] for p in pours]) if pours else float("nan")
+        print(
+            f"stable={stable:g}s start={start:g} stop={stop:g} window={window:g}s "
+            f"hold={hold:g}s gain={gain:g}kg -> "
+            f"{len(pours)} pours, {tonnes:,.1f} t, mean {mean_dur:.0f} s "
+            f"({took * 1000:.0f} ms, {span_s / max(took, 1e-9):,.0f}x real time)"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,339 @@
+# pour_simulator.py
+import argparse
+import os
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+
+import INIT_PARAMS as IPS
+from ladle_geometry import LADLE_IDS
+from pour_engine import DEFAULTS as ENGINE_DEFAULTS, ladle_geometry
+
+# =====================================================
+# SIMULATION PARAMETERS
+# =====================================================
+# (mean, sd) pairs are drawn per pour; operator behaviour is drawn per
+# operator and then per pour around it.
+DEFAULTS = {
+    "hz": IPS.RADAR_SAMPLE_HZ,
+    "ladle_id": None,                  # None -> pour_engine's cylinder
+    "ladle_diameter_m": ENGINE_DEFAULTS["ladle_diameter_m"],
+    "metal_density": ENGINE_DEFAULTS["metal_density"],
+    "empty_distance": 17.0,            # radar to empty ladle bottom (m)
+    "full_fraction": 0.92,             # full mark as a fraction of the ladle depth
+    "idle_s": 8.0,                     # empty ladle before and after each pour
+    "peak_flow_kg_s": (700.0, 120.0),
+    "ramp_s": (6.0, 2.0),
+    "tail_s": (10.0, 3.0),
+    "operators": 8,
+    "target_fill": (0.95, 0.02),       # operator's aim, fraction of the full mark
+    "aim_sd": 0.02,                    # pour-to-pour scatter around an operator's aim
+    "overshoot_p": (0.08, 0.05),       # chance an operator reacts late
+    "overshoot": (0.07, 0.03),         # extra fill when they do
+    "noise_m": 0.004,                  # radar noise (sd)
+    "dropout_p": 0.002,                # chance a sample starts a lost-echo burst
+    "dropout_s": 1.0,                  # burst length
+}
+SHIFT_HOURS = (("A", 6), ("B", 14), ("C", 22))
+CHUNK = 256                            # pours per vectorized block
+SCRATCH_DIR = os.path.join(tempfile.gettempdir(), "pour_simulator")
+
+
+def _draw(rng, spec, n, low=0.0):
+    mean, sd = spec
+    return np.maximum(rng.normal(mean, sd, n), low)
+
+
+def shift_of(dt):
+    """Shift letter for a pour start time."""
+    name = SHIFT_HOURS[-1][0]
+    for shift, hour in SHIFT_HOURS:
+        if dt.hour >= hour:
+            name = shift
+    return name
+
+
+# =====================================================
+# VECTORIZED POURS (N POURS x T SAMPLES IN ONE PASS)
+# =====================================================
+def operator_profiles(n, rng, p):
+    """Per-operator aim and late-reaction chance."""
+    return {
+        "target_fill": _draw(rng, p["target_fill"], n, 0.5),
+        "overshoot_p": np.clip(rng.normal(*p["overshoot_p"], n), 0.0, 1.0),
+    }
+
+
+def simulate(n, operator=None, profiles=None, seed=None, traces=True, **params):
+    """``n`` pours as radar traces plus their ground truth.
+
+    Returns a dict of ``(n, T)`` arrays (``distance`` with NaN dropouts,
+    ``material_height``, ``fill_pct``, ``weight``, ``flow``), the shared
+    time axis ``t`` in seconds from each pour's window start, and
+    ``truth`` (per-pour arrays). ``operator`` gives each pour's operator
+    index (random when omitted) into ``profiles`` from
+    ``operator_profiles`` (drawn here when omitted). With ``traces``
+    False only ``truth`` is computed (closed form, no samples).
+    """
+    p = {**DEFAULTS, **params}
+    rng = np.random.default_rng(seed)
+    geometry = ladle_geometry(p)
+    hz = p["hz"]
+    full_height = min(p["empty_distance"] - ENGINE_DEFAULTS["full_ladle_distance"],
+                      p["full_fraction"] * geometry.depth)
+
+    # ---------------- PER POUR ----------------
+    ops = operator_profiles(p["operators"], rng, p) if profiles is None else profiles
+    p["operators"] = len(ops["target_fill"])
+    if operator is None:
+        operator = rng.integers(0, p["operators"], n)
+    operator = np.asarray(operator)
+    aim = ops["target_fill"][operator] + rng.normal(0, p["aim_sd"], n)
+    late = rng.random(n) < ops["overshoot_p"][operator]
+    fill = aim + late * _draw(rng, p["overshoot"], n)
+    target_kg = geometry.weight(fill * full_height, p["metal_density"])
+
+    peak = _draw(rng, p["peak_flow_kg_s"], n, 50.0)
+    ramp = _draw(rng, p["ramp_s"], n, 0.5)
+    tail = _draw(rng, p["tail_s"], n, 0.5)
+    steady = np.maximum(target_kg / peak - (ramp + tail) / 2, 0.0)
+    duration = ramp + steady + tail
+    start = p["idle_s"]
+
+    out = {"params": p}
+    if traces:
+        # ---------------- SAMPLES ----------------
+        t = np.arange(int(np.ceil((2 * p["idle_s"] + duration.max()) * hz))) / hz
+        x = t[None, :] - start
+        flow = (peak[:, None]
+                * np.clip(x / ramp[:, None], 0.0, 1.0)
+                * np.clip((duration[:, None] - x) / tail[:, None], 0.0, 1.0))
+        weight = np.cumsum(flow, axis=1) / hz
+        height = geometry.height(weight / p["metal_density"])
+
+        noise = rng.normal(0.0, p["noise_m"], height.shape)
+        distance = p["empty_distance"] - height + noise
+
+        # lost echoes: a burst of NaN from every dropout start
+        starts = rng.random(height.shape) < p["dropout_p"]
+        lost = starts.copy()
+        for k in range(1, int(p["dropout_s"] * hz)):
+            lost[:, k:] |= starts[:, :-k]
+        distance[lost] = np.nan
+
+        out.update(t=t, distance=distance, material_height=height + noise,
+                   fill_pct=100 * height / full_height, weight=weight, flow=flow)
+        total_kg = weight[:, -1]
+    else:
+        # area under ramp / steady / tail (exact unless ramp and tail overlap)
+        total_kg = peak * (steady + (ramp + tail) / 2)
+
+    end_height = geometry.height(total_kg / p["metal_density"])
+    out["truth"] = {
+        "operator": operator,
+        "start_s": np.full(n, start),
+        "duration_s": duration,
+        "weight_kg": total_kg,
+        "peak_flow_kg_s": peak,
+        "avg_flow_kg_s": total_kg / duration,
+        "material_height_m": end_height,
+        "fill_pct": 100 * end_height / full_height,
+        "end_distance_m": p["empty_distance"] - end_height,
+        "adhered": (end_height <= full_height).astype(int),
+    }
+    return out
+
+
+# =====================================================
+# OUTPUTS: TRACES, STORE ROWS
+# =====================================================
+def to_trace(sim, t0=None):
+    """All pours back to back as one ``trace_recorder`` record array
+    (epoch ``t`` from ``t0``), for replay, TraceRecorder.write or
+    radar_sim."""
+    from trace_recorder import TRACE_DTYPE
+
+    n, T = sim["distance"].shape
+    hz = sim["params"]["hz"]
+    t0 = time.time() if t0 is None else t0
+    rec = np.zeros(n * T, TRACE_DTYPE)
+    rec["t"] = t0 + np.arange(n * T) / hz
+    rec["distance"] = sim["distance"].ravel()
+    rec["material_height"] = sim["material_height"].ravel()
+    rec["fill_pct"] = sim["fill_pct"].ravel()
+    rec["current"] = 4 + 16 * np.clip(sim["fill_pct"].ravel(), 0, 100) / 100
+    rec["temperature"] = 45.0
+    rec["power"] = -32.0
+    rec["snr"] = 28.0
+    return rec
+
+
+def pour_rows(truth, starts, operators, ladle_id=None, station=None):
+    """Pour-store rows for simulated pours starting at the epoch
+    seconds ``starts``; ``operators`` names each operator index."""
+    rows = []
+    for i, t_start in enumerate(np.asarray(starts).tolist()):
+        begin = datetime.fromtimestamp(t_start)
+        end = begin + timedelta(seconds=float(truth["duration_s"][i]))
+        rows.append({
+            "pour_id": end.strftime("%Y%m%d_%H%M%S"),
+            "operator": operators[int(truth["operator"][i])],
+            "shift": shift_of(begin),
+            "station": station,
+            "ladle_id": ladle_id,
+            "pour_start": begin,
+            "pour_end": end,
+            "duration_s": float(truth["duration_s"][i]),
+            "end_distance_m": float(truth["end_distance_m"][i]),
+            "material_height_m": float(truth["material_height_m"][i]),
+            "fill_pct": float(truth["fill_pct"][i]),
+            "total_weight_kg": float(truth["weight_kg"][i]),
+            "avg_flow_kg_s": float(truth["avg_flow_kg_s"][i]),
+            "adhered": int(truth["adhered"][i]),
+        })
+    return rows
+
+
+def schedule(n, t_from, t_to, rng):
+    """Sorted random start times (epoch s) for ``n`` pours in a range."""
+    return np.sort(rng.uniform(t_from, t_to, n))
+
+
+# =====================================================
+# CLI
+# =====================================================
+def _roster_names(count):
+    try:
+        from operator_registry import get_roster
+        names = get_roster().names
+    except ImportError:                 # no Excel reader installed
+        names = []
+    return names or [f"Operator {i + 1}" for i in range(count)]
+
+
+def seed_store(args, rng):
+    from pour_store import open_store
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.store)), exist_ok=True)
+    store = open_store(args.store, legacy_csv=None)
+    names = _roster_names(DEFAULTS["operators"])
+    profiles = operator_profiles(len(names), rng, DEFAULTS)
+    t_to = datetime.now().timestamp()
+    starts = schedule(args.pours, t_to - args.days * 86400, t_to, rng)
+    tic = time.perf_counter()
+    sim = simulate(args.pours, profiles=profiles, seed=int(rng.integers(1 << 31)),
+                   traces=False, ladle_id=args.ladle, hz=args.hz)
+    total = store.append_many(pour_rows(sim["truth"], starts, names, args.ladle, args.station))
+    print(f"{total:,} pours over {args.days:g} days -> {store.path} "
+          f"({time.perf_counter() - tic:.1f} s)")
+
+
+def write_traces(args, rng):
+    from trace_recorder import TraceRecorder
+
+    recorder = TraceRecorder(args.traces)
+    t0 = datetime.now().timestamp()
+    tic = time.perf_counter()
+    for s0 in range(0, args.pours, CHUNK):
+        n = min(CHUNK, args.pours - s0)
+        sim = simulate(n, seed=int(rng.integers(1 << 31)), ladle_id=args.ladle, hz=args.hz)
+        trace = to_trace(sim, t0)
+        recorder.write(trace)
+        t0 = trace["t"][-1] + 1.0 / args.hz
+    recorder.close()
+    print(f"{args.pours:,} pours of traces -> {recorder.directory} "
+          f"({time.perf_counter() - tic:.1f} s)")
+
+
+def bench(args, rng):
+    """Generate pours, replay them through the pour engine and compare
+    what it detects with the ground truth."""
+    from pour_engine import replay_trace
+
+    tic = time.perf_counter()
+    sim = simulate(args.pours, seed=int(rng.integers(1 << 31)), ladle_id=args.ladle, hz=args.hz)
+    gen_s = time.perf_counter() - tic
+    trace = to_trace(sim, 0.0)
+    span_s = trace["t"][-1] - trace["t"][0]
+
+    tic = time.perf_counter()
+    pours = replay_trace(trace, ladle_id=args.ladle)
+    replay_s = time.perf_counter() - tic
+
+    # match each detection to the simulated pour whose window it starts in
+    truth = sim["truth"]
+    window_s = len(sim["t"]) / args.hz
+    best = {}
+    spurious = 0
+    for pour in pours:
+        i = int(pour["trace_t0"] // window_s)
+        rel = pour["trace_t0"] - i * window_s
+        if rel > truth["start_s"][i] + truth["duration_s"][i]:
+            spurious += 1               # started after the pour had finished
+        elif i not in best or pour["duration_s"] > best[i]["duration_s"]:
+            best[i] = pour
+
+    print(f"generated {args.pours:,} pours ({len(trace):,} samples, {span_s / 3600:.1f} h) "
+          f"in {gen_s:.2f} s")
+    print(f"replayed in {replay_s:.2f} s ({span_s / max(replay_s, 1e-9):,.0f}x real time): "
+          f"{len(best):,} of {args.pours:,} pours found, {args.pours - len(best):,} missed, "
+          f"{len(pours) - len(best):,} extra detections "
+          f"({spurious:,} after a pour had ended)")
+    if best:
+        idx = np.fromiter(best, int)
+        found = np.array([best[i]["total_weight_kg"] or np.nan for i in idx])
+        err = 100 * (found - truth["weight_kg"][idx]) / truth["weight_kg"][idx]
+        early = np.array([best[i]["trace_t0"] for i in idx]) - idx * window_s \
+            - truth["start_s"][idx]
+        late = np.array([best[i]["trace_t1"] for i in idx]) - idx * window_s \
+            - (truth["start_s"][idx] + truth["duration_s"][idx])
+        print(f"weight error: median {np.nanmedian(err):+.2f} %, "
+              f"p95 |err| {np.nanpercentile(np.abs(err), 95):.2f} %; "
+              f"start detected {np.median(early):+.1f} s and end {np.median(late):+.1f} s "
+              f"from the true start/end (median)")
+
+
+def _inside(path, live):
+    path, live = os.path.abspath(path), os.path.abspath(live)
+    return path == live or path.startswith(live + os.sep)
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Generate synthetic pours in bulk.")
+    ap.add_argument("mode", choices=["store", "traces", "bench"])
+    ap.add_argument("--pours", type=int, default=1000)
+    ap.add_argument("--days", type=float, default=365.0, help="spread of pour starts (store)")
+    ap.add_argument("--store", default=os.path.join(SCRATCH_DIR, "pour_history.db"),
+                    help="database file (default: a scratch file)")
+    ap.add_argument("--traces", default=os.path.join(SCRATCH_DIR, "traces"),
+                    help="segment directory (default: a scratch directory)")
+    ap.add_argument("--station", default=None)
+    ap.add_argument("--ladle", choices=LADLE_IDS, default=None)
+    ap.add_argument("--hz", type=float, default=DEFAULTS["hz"])
+    ap.add_argument("--seed", type=int, default=None)
+    ap.add_argument("--i-mean-it", action="store_true",
+                    help="allow writing synthetic pours into the live history/traces")
+    args = ap.parse_args(argv)
+
+    from pour_store import DB_FILE
+    from trace_recorder import TRACE_DIR
+
+    if not args.i_mean_it:
+        if args.mode == "store" and _inside(args.store, DB_FILE):
+            ap.error(f"{args.store} is the live pour history; add --i-mean-it to seed it")
+        if args.mode == "traces" and _inside(args.traces, TRACE_DIR):
+            ap.error(f"{args.traces} holds live traces; add --i-mean-it to write there")
+
+    rng = np.random.default_rng(args.seed)
+    if args.mode == "store":
+        seed_store(args, rng)
+    elif args.mode == "traces":
+        write_traces(args, rng)
+    else:
+        bench(args, rng)
+
+
+if __name__ == "__main__":
+    main()
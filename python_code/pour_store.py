@@ -0,0 +1,386 @@
+# pour_store.py
+import csv
+import os
+import sqlite3
+import sys
+import threading
+from datetime import datetime
+
+# =====================================================
+# STORAGE CONFIG
+# =====================================================
+DATA_DIR = "data"
+DB_FILE = os.path.join(DATA_DIR, "pour_history.db")
+LEGACY_CSV = os.path.join(DATA_DIR, "pour_history.csv")
+
+# every column either radar page writes (the rest stay NULL)
+POUR_COLUMNS = {
+    "pour_id": "TEXT",
+    "operator": "TEXT",
+    "employee_id": "TEXT",
+    "shift": "TEXT",
+    "station": "TEXT",           # MQTT station name (NULL for the wired radar)
+    "ladle_id": "TEXT",
+    "pour_start": "TEXT",
+    "pour_end": "TEXT",
+    "duration_s": "REAL",
+    "start_distance_m": "REAL",
+    "empty_distance_m": "REAL",
+    "end_distance_m": "REAL",
+    "material_height_m": "REAL",
+    "fill_pct": "REAL",
+    "total_weight_kg": "REAL",
+    "avg_flow_kg_s": "REAL",
+    "adhered": "INTEGER",
+    "trace_t0": "REAL",          # epoch seconds: slice of data/traces for this pour
+    "trace_t1": "REAL",
+}
+
+# column names used by older CSV exports
+LEGACY_NAMES = {
+    "start_time": "pour_start",
+    "end_time": "pour_end",
+    "duration_sec": "duration_s",
+    "start_distance": "start_distance_m",
+    "empty_distance": "empty_distance_m",
+    "end_distance": "end_distance_m",
+}
+
+
+# =====================================================
+# INCREMENTAL AGGREGATES (MAINTAINED BY TRIGGERS)
+# =====================================================
+FLOW_BIN_KG_S = 25      # operator flow histogram bin width
+DURATION_BIN_S = 5      # duration histogram bin width
+AGG_VERSION = f"2:{FLOW_BIN_KG_S}:{DURATION_BIN_S}"
+
+# every aggregate is kept per day so any date range is a small GROUP BY
+AGG_TABLES = {
+    "agg_shift": (
+        "day TEXT, shift TEXT, pours INTEGER, total_kg REAL, "
+        "PRIMARY KEY (day, shift)"
+    ),
+    "agg_operator": (
+        "day TEXT, operator TEXT, pours INTEGER, total_kg REAL, "
+        "flow_n INTEGER, flow_sum REAL, flow_sq REAL, rated INTEGER, adhered INTEGER, "
+        "PRIMARY KEY (day, operator)"
+    ),
+    "agg_operator_flow": (
+        "day TEXT, operator TEXT, bin INTEGER, n INTEGER, PRIMARY KEY (day, operator, bin)"
+    ),
+    "agg_duration": "day TEXT, bin INTEGER, n INTEGER, PRIMARY KEY (day, bin)",
+}
+
+# one statement per aggregate; NEW.* is the inserted pour
+AGG_UPDATES = [
+    """INSERT INTO agg_shift VALUES (
+        substr(NEW.pour_start, 1, 10), COALESCE(NEW.shift, ''),
+        1, COALESCE(NEW.total_weight_kg, 0))
+    ON CONFLICT (day, shift) DO UPDATE SET
+        pours = pours + 1, total_kg = total_kg + excluded.total_kg""",
+
+    """INSERT INTO agg_operator VALUES (
+        substr(NEW.pour_start, 1, 10),
+        COALESCE(NEW.operator, ''), 1, COALESCE(NEW.total_weight_kg, 0),
+        NEW.avg_flow_kg_s IS NOT NULL, COALESCE(NEW.avg_flow_kg_s, 0),
+        COALESCE(NEW.avg_flow_kg_s * NEW.avg_flow_kg_s, 0),
+        NEW.adhered IS NOT NULL, COALESCE(NEW.adhered, 0))
+    ON CONFLICT (day, operator) DO UPDATE SET
+        pours = pours + 1,
+        total_kg = total_kg + excluded.total_kg,
+        flow_n = flow_n + excluded.flow_n,
+        flow_sum = flow_sum + excluded.flow_sum,
+        flow_sq = flow_sq + excluded.flow_sq,
+        rated = rated + excluded.rated,
+        adhered = adhered + excluded.adhered""",
+
+    f"""INSERT INTO agg_operator_flow
+    SELECT substr(NEW.pour_start, 1, 10), COALESCE(NEW.operator, ''),
+        CAST(NEW.avg_flow_kg_s / {FLOW_BIN_KG_S} AS INTEGER), 1
+    WHERE NEW.avg_flow_kg_s IS NOT NULL
+    ON CONFLICT (day, operator, bin) DO UPDATE SET n = n + 1""",
+
+    f"""INSERT INTO agg_duration
+    SELECT substr(NEW.pour_start, 1, 10), CAST(NEW.duration_s / {DURATION_BIN_S} AS INTEGER), 1
+    WHERE NEW.duration_s IS NOT NULL
+    ON CONFLICT (day, bin) DO UPDATE SET n = n + 1""",
+]
+
+
+def _to_sql(value):
+    if isinstance(value, datetime):
+        return value.isoformat(sep=" ")
+    if value is None:
+        return None
+    if isinstance(value, float) and value != value:   # NaN
+        return None
+    if hasattr(value, "item"):                        # numpy scalar
+        return value.item()
+    return value
+
+
+# =====================================================
+# SQLITE (WAL) POUR HISTORY
+# =====================================================
+class PourStore:
+    """Append-only pour history in an SQLite file in WAL mode.
+
+    One INSERT per pour regardless of history size; readers never block
+    the writer and concurrent sessions can't corrupt the file. The only
+    in-place edit is re-weighing after a ladle geometry change.
+    """
+
+    def __init__(self, path=DB_FILE):
+        self.path = path
+        self.lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=5, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._create()
+
+    def _create(self):
+        cols = ", ".join(f"{name} {kind}" for name, kind in POUR_COLUMNS.items())
+        with self.lock, self._conn:
+            self._conn.execute(
+                f"CREATE TABLE IF NOT EXISTS pours (id INTEGER PRIMARY KEY, {cols})"
+            )
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS imported_files ("
+                "path TEXT PRIMARY KEY, rows INTEGER, imported_at TEXT)"
+            )
+            # tables created by an older version may miss newer columns
+            have = {r[1] for r in self._conn.execute("PRAGMA table_info(pours)")}
+            for name, kind in POUR_COLUMNS.items():
+                if name not in have:
+                    self._conn.execute(f"ALTER TABLE pours ADD COLUMN {name} {kind}")
+            for col in ("pour_start", "operator", "shift"):
+                self._conn.execute(
+                    f"CREATE INDEX IF NOT EXISTS pours_{col.split('_')[-1]} ON pours ({col})"
+                )
+            self._create_aggregates()
+
+    def _create_aggregates(self):
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)"
+        )
+        row = self._conn.execute(
+            "SELECT value FROM meta WHERE key = 'agg_version'"
+        ).fetchone()
+        if row and row[0] == AGG_VERSION:
+            return
+        # first run or bins changed: rebuild once from the raw pours
+        self._rebuild_aggregates()
+
+    def _rebuild_aggregates(self):
+        self._conn.execute("DROP TRIGGER IF EXISTS pours_agg")
+        for name, cols in AGG_TABLES.items():
+            self._conn.execute(f"DROP TABLE IF EXISTS {name}")
+            self._conn.execute(f"CREATE TABLE {name} ({cols})")
+        self._conn.execute(
+            "CREATE TRIGGER pours_agg AFTER INSERT ON pours BEGIN "
+            + "; ".join(AGG_UPDATES) + "; END"
+        )
+        # replaying through the trigger keeps one definition of each aggregate
+        self._conn.execute("CREATE TEMP TABLE pours_replay AS SELECT * FROM pours")
+        self._conn.execute("DELETE FROM pours")
+        self._conn.execute("INSERT INTO pours SELECT * FROM pours_replay ORDER BY id")
+        self._conn.execute("DROP TABLE pours_replay")
+        self._conn.execute(
+            "INSERT OR REPLACE INTO meta VALUES ('agg_version', ?)", (AGG_VERSION,)
+        )
+
+    # ---------------- write ----------------
+    def append(self, **row):
+        """Insert one pour; unknown keys are an error, missing ones NULL."""
+        unknown = set(row) - set(POUR_COLUMNS)
+        if unknown:
+            raise KeyError(f"Unknown pour columns: {sorted(unknown)}")
+
+        names = list(row)
+        sql = (
+            f"INSERT INTO pours ({', '.join(names)}) "
+            f"VALUES ({', '.join('?' * len(names))})"
+        )
+        with self.lock, self._conn:
+            cur = self._conn.execute(sql, [_to_sql(row[n]) for n in names])
+        return cur.lastrowid
+
+    def append_many(self, rows):
+        """Insert many pours in one transaction; returns how many."""
+        rows = list(rows)
+        if not rows:
+            return 0
+        names = sorted({n for r in rows for n in r})
+        unknown = set(names) - set(POUR_COLUMNS)
+        if unknown:
+            raise KeyError(f"Unknown pour columns: {sorted(unknown)}")
+
+        sql = (
+            f"INSERT INTO pours ({', '.join(names)}) "
+            f"VALUES ({', '.join('?' * len(names))})"
+        )
+        with self.lock, self._conn:
+            self._conn.executemany(sql, [[_to_sql(r.get(n)) for n in names] for r in rows])
+        return len(rows)
+
+    def update_weights(self, weights):
+        """Overwrite ``total_weight_kg`` for {row id: kg} (e.g. after a
+        ladle geometry change) and rebuild the aggregates; returns rows."""
+        if not weights:
+            return 0
+        with self.lock, self._conn:
+            self._conn.executemany(
+                "UPDATE pours SET total_weight_kg = ? WHERE id = ?",
+                [(_to_sql(kg), i) for i, kg in weights.items()]
+            )
+            self._rebuild_aggregates()
+            self._conn.execute(
+                "INSERT INTO meta VALUES ('revision', 1) "
+                "ON CONFLICT (key) DO UPDATE SET value = value + 1"
+            )
+        return len(weights)
+
+    def import_csv(self, csv_path):
+        """Copy an existing pour_history.csv in once; returns rows added."""
+        key = os.path.abspath(csv_path)
+        if not os.path.exists(csv_path):
+            return 0
+
+        with self.lock:
+            done = self._conn.execute(
+                "SELECT 1 FROM imported_files WHERE path = ?", (key,)
+            ).fetchone()
+        if done:
+            return 0
+
+        rows = []
+        with open(csv_path, newline="") as f:
+            for raw in csv.DictReader(f):
+                rec = {}
+                for name, value in raw.items():
+                    name = LEGACY_NAMES.get(name, name)
+                    if name in POUR_COLUMNS and value not in ("", None):
+                        rec[name] = value
+                if "pour_id" not in rec and "pour_start" in rec:
+                    start = datetime.fromisoformat(rec["pour_start"])
+                    rec["pour_id"] = start.strftime("%Y%m%d_%H%M%S")
+                rows.append(rec)
+
+        names = list(POUR_COLUMNS)
+        sql = (
+            f"INSERT INTO pours ({', '.join(names)}) "
+            f"VALUES ({', '.join('?' * len(names))})"
+        )
+        with self.lock, self._conn:
+            self._conn.executemany(sql, [[r.get(n) for n in names] for r in rows])
+            self._conn.execute(
+                "INSERT INTO imported_files VALUES (?, ?, ?)",
+                (key, len(rows), datetime.now().isoformat(sep=" "))
+            )
+        return len(rows)
+
+    # ---------------- read ----------------
+    def count(self):
+        with self.lock:
+            return self._conn.execute("SELECT COUNT(*) FROM pours").fetchone()[0]
+
+    def version(self):
+        """Changes whenever a pour is added or history is re-weighed."""
+        with self.lock:
+            last, revision = self._conn.execute(
+                "SELECT (SELECT MAX(id) FROM pours), "
+                "(SELECT value FROM meta WHERE key = 'revision')"
+            ).fetchone()
+        return (last or 0, int(revision or 0))
+
+    def distinct(self, column):
+        if column not in POUR_COLUMNS:
+            raise KeyError(column)
+        with self.lock:
+            rows = self._conn.execute(
+                f"SELECT DISTINCT {column} FROM pours "
+                f"WHERE {column} IS NOT NULL AND {column} != '' ORDER BY {column}"
+            ).fetchall()
+        return [r[0] for r in rows]
+
+    def query(self, offset=0, limit=50, date_from=None, date_to=None,
+              shifts=None, operator=None):
+        """One page of pours, newest first, plus the total matching count."""
+        import pandas as pd
+
+        where, args = [], []
+        if date_from is not None:
+            where.append("pour_start >= ?")
+            args.append(str(date_from))
+        if date_to is not None:
+            # dates are inclusive: everything before the next midnight
+            where.append("pour_start < date(?, '+1 day')")
+            args.append(str(date_to))
+        if shifts:
+            where.append(f"shift IN ({', '.join('?' * len(shifts))})")
+            args.extend(shifts)
+        if operator:
+            where.append("operator = ?")
+            args.append(operator)
+        clause = f"WHERE {' AND '.join(where)}" if where else ""
+
+        with self.lock:
+            total = self._conn.execute(
+                f"SELECT COUNT(*) FROM pours {clause}", args
+            ).fetchone()[0]
+            page = pd.read_sql_query(
+                f"SELECT {', '.join(POUR_COLUMNS)} FROM pours {clause} "
+                f"ORDER BY id DESC LIMIT ? OFFSET ?",
+                self._conn, params=args + [limit, offset]
+            )
+        return page, total
+
+    def read_sql(self, sql, params=()):
+        import pandas as pd
+
+        with self.lock:
+            return pd.read_sql_query(sql, self._conn, params=params)
+
+    def load(self):
+        import pandas as pd
+
+        with self.lock:
+            return pd.read_sql_query(
+                f"SELECT {', '.join(POUR_COLUMNS)} FROM pours ORDER BY id",
+                self._conn
+            )
+
+    def close(self):
+        with self.lock:
+            self._conn.close()
+
+
+# =====================================================
+# ONE STORE PER FILE, PER PROCESS
+# =====================================================
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def open_store(path=DB_FILE, legacy_csv=LEGACY_CSV):
+    """Shared store for ``path``. Only the live history (``DB_FILE``)
+    imports ``legacy_csv``, the first time; scratch and test databases
+    never pick up the old CSV."""
+    with _stores_lock:
+        store = _stores.get(path)
+        if store is None:
+            store = PourStore(path)
+            if legacy_csv and os.path.abspath(path) == os.path.abspath(DB_FILE):
+                store.import_csv(legacy_csv)
+            _stores[path] = store
+        return store
+
+
+if __name__ == "__main__":
+    # python pour_store.py some/pour_history.csv [more.csv ...]
+    store = open_store(legacy_csv=None)
+    for csv_path in sys.argv[1:]:
+        print(f"{csv_path}: {store.import_csv(csv_path)} rows imported")
+    print(f"{store.path}: {store.count()} pours")
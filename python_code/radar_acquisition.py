@@ -0,0 +1,258 @@
+# radar_acquisition.py
+import threading
+import time
+from datetime import datetime
+
+import INIT_PARAMS as IPS
+from pour_engine import StationPours
+from pour_store import DB_FILE
+from trend_chart import TrendPyramid
+from trace_recorder import get_recorder
+from radar_modbus import (
+    get_session,
+    REG_DISTANCE, REG_MATERIAL_HEIGHT, REG_MATERIAL_PERCENT,
+    REG_CURRENT, REG_TEMPERATURE, REG_POWER, REG_SNR
+)
+
+# =====================================================
+# WHAT EVERY SAMPLE CONTAINS
+# =====================================================
+SAMPLE_REGS = {
+    "distance": REG_DISTANCE,
+    "material_height": REG_MATERIAL_HEIGHT,
+    "material_percent": REG_MATERIAL_PERCENT,
+    "current": REG_CURRENT,
+    "temperature": REG_TEMPERATURE,
+    "power": REG_POWER,
+    "snr": REG_SNR,
+}
+
+IDLE_STOP_S = 120   # give up on a port that never answered and nobody looks at
+
+# registers read less often than distance (seconds between reads); the
+# rest share one contiguous span with distance and follow its rate
+SLOW_REGS = {
+    REG_TEMPERATURE: IPS.RADAR_SLOW_POLL_S,
+    REG_POWER: IPS.RADAR_DIAG_POLL_S,
+    REG_SNR: IPS.RADAR_DIAG_POLL_S,
+}
+POLL_BACKOFF_MAX_S = 300    # a register that keeps failing is tried this rarely
+
+
+# =====================================================
+# PER-REGISTER POLL SCHEDULE
+# =====================================================
+class PollScheduler:
+    """Which registers are due on each tick.
+
+    Distance (and its span) runs at ``fast_hz`` while a ladle is under
+    the radar and ``idle_hz`` when none is. Slow registers ride along
+    with a distance read once their period is up, so a rejected
+    diagnostic never costs a request of its own. Every failed read
+    doubles that register's period until it answers again.
+    """
+
+    def __init__(self, regs, fast_hz=IPS.RADAR_SAMPLE_HZ, idle_hz=IPS.RADAR_IDLE_HZ,
+                 slow=SLOW_REGS, no_ladle_distance=IPS.NO_LADLE_DISTANCE):
+        self.regs = list(regs)
+        self.fast_hz = fast_hz
+        self.idle_hz = idle_hz
+        self.slow = {r: p for r, p in slow.items() if r in self.regs}
+        self.no_ladle_distance = no_ladle_distance
+        self.ladle_present = True          # poll fast until the radar says otherwise
+
+        self._next = dict.fromkeys(self.regs, 0.0)
+        self._failures = dict.fromkeys(self.regs, 0)
+
+    def period(self, reg):
+        if reg in self.slow:
+            return self.slow[reg]
+        return 1.0 / (self.fast_hz if self.ladle_present else self.idle_hz)
+
+    def due(self, now):
+        # half a fast tick of slack so tick jitter never skips a whole period
+        now += 0.5 / self.fast_hz
+        if now < self._next[REG_DISTANCE]:
+            return []
+        return [r for r in self.regs if now >= self._next[r]]
+
+    def done(self, now, values):
+        """Reschedule after a read; ``values`` is ``{reg: value or None}``."""
+        distance = values.get(REG_DISTANCE)
+        if distance is not None and distance == distance:       # NaN: lost echo
+            self.ladle_present = distance <= self.no_ladle_distance
+
+        for reg, value in values.items():
+            base = self.period(reg)
+            if value is None and distance is None and reg in self.slow:
+                wait = base                 # link down: not this register's fault
+            elif value is None:
+                self._failures[reg] += 1
+                limit = POLL_BACKOFF_MAX_S if reg in self.slow else 1.0 / self.idle_hz
+                wait = min(base * 2 ** self._failures[reg], max(limit, base))
+            else:
+                self._failures[reg] = 0
+                wait = base
+            self._next[reg] = now + wait
+
+    def backed_off(self):
+        """Registers currently failing, with their consecutive failures."""
+        return {r: n for r, n in self._failures.items() if n}
+
+
+# =====================================================
+# ONE WORKER PER PORT
+# =====================================================
+class RadarAcquisition:
+    """Owns a radar port, samples it on a ``PollScheduler`` and publishes into a
+    ring buffer (with coarser trend levels for long windows). Every
+    sample is also recorded and goes through the port's one pour
+    detector (``pours``, which stores finished pours in ``store_path``).
+    Streamlit sessions only ever read from it.
+
+    Once the radar has answered, the worker keeps running whether or not
+    a page is open, so pours nobody watched are still stored and traced.
+    Only a port that never answered stops after ``IDLE_STOP_S`` unread.
+    """
+
+    def __init__(self, port, rate_hz=IPS.RADAR_SAMPLE_HZ, history_len=IPS.TREND_CAPACITY,
+                 store_path=DB_FILE, pours=None):
+        self.port = port
+        self.rate_hz = rate_hz
+        self.lock = threading.Lock()
+        self.scheduler = PollScheduler(SAMPLE_REGS.values(), fast_hz=rate_hz)
+        self.pours = StationPours(store_path) if pours is None else pours
+
+        self._trend = TrendPyramid(SAMPLE_REGS, history_len)
+        self._samples = self._trend.base
+        self._last_read = time.monotonic()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(
+            target=self._run, name=f"radar-{port}", daemon=True
+        )
+
+    # ---------------- worker ----------------
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    @property
+    def alive(self):
+        return self._thread.is_alive() and not self._stop.is_set()
+
+    def _run(self):
+        session = get_session(self.port)
+        recorder = get_recorder() if IPS.TRACE_RECORDING else None
+        scheduler = self.scheduler
+        # slow registers hold their last answer between reads (NaN = rejected)
+        held = dict.fromkeys(SAMPLE_REGS, float("nan"))
+        next_tick = time.monotonic()
+
+        while not self._stop.is_set():
+            started = time.monotonic()
+            due = scheduler.due(started)
+            if due:
+                values = session.read_floats(due)
+                scheduler.done(started, values)
+                if values[REG_DISTANCE] is not None:
+                    t = time.time()
+                    for name, reg in SAMPLE_REGS.items():
+                        if reg in values:
+                            value = values[reg]
+                            held[name] = float("nan") if value is None else value
+                    sample = dict(held)
+                    with self.lock:
+                        self._trend.append(t, **sample)
+                    if recorder is not None:
+                        recorder.record(t, fill_pct=sample["material_percent"], **sample)
+                    d = sample["distance"]
+                    self.pours.update(t, distance=None if d != d else d)
+
+            if (not self._samples.total
+                    and time.monotonic() - self._last_read > IDLE_STOP_S):
+                break                   # e.g. a mistyped port: nothing to keep
+
+            # ticks at the fastest rate; the scheduler decides what is read
+            next_tick += 1.0 / self.rate_hz
+            delay = next_tick - time.monotonic()
+            if delay > 0:
+                self._stop.wait(delay)
+            else:
+                next_tick = time.monotonic()
+
+        self._stop.set()
+
+    # ---------------- readers ----------------
+    def status(self):
+        """The pour detector's latest values (see ``StationPours.status``)."""
+        self._last_read = time.monotonic()
+        return self.pours.status()
+
+    def latest(self):
+        """Newest sample as a dict (with ``time`` and ``seq``), or None."""
+        with self.lock:
+            self._last_read = time.monotonic()
+            buf = self._samples
+            if not len(buf):
+                return None
+            sample = {name: buf.last(name) for name in buf.columns}
+            sample["time"] = datetime.fromtimestamp(buf.last())
+            sample["seq"] = buf.total
+
+        # NaN marks a register the radar did not answer
+        return {k: (None if v != v else v) for k, v in sample.items()}
+
+    def window(self, n=None, since=None):
+        """Copies of the newest ``n`` samples (or those after epoch
+        ``since``) as ``{"t": ..., column: ...}`` arrays."""
+        with self.lock:
+            self._last_read = time.monotonic()
+            buf = self._samples
+            if since is not None:
+                n = buf.since(since)
+            out = {"t": buf.t(n).copy()}
+            for name in buf.columns:
+                out[name] = buf.column(name, n).copy()
+            return out
+
+    def frame(self, n=None, columns=None):
+        with self.lock:
+            self._last_read = time.monotonic()
+            return self._samples.frame(n, columns)
+
+    def series(self, column, window_s, width=IPS.TREND_CHART_POINTS):
+        """Chart-sized, shape-preserving downsample of ``column``."""
+        with self.lock:
+            self._last_read = time.monotonic()
+            return self._trend.series(column, window_s, width)
+
+    @property
+    def connected(self):
+        return get_session(self.port).connected
+
+
+# =====================================================
+# PROCESS-WIDE REGISTRY
+# =====================================================
+_workers = {}
+_pours = {}         # port -> StationPours, kept across worker restarts
+_workers_lock = threading.Lock()
+
+
+def start_acquisition(port, rate_hz=IPS.RADAR_SAMPLE_HZ):
+    """Return the running worker for ``port``, starting one if needed.
+    Pours are detected and stored there, once per port; a restarted
+    worker keeps the port's detector (learned empty ladle, pour in
+    progress, operator/ladle context)."""
+    with _workers_lock:
+        worker = _workers.get(port)
+        if worker is None or not worker.alive:
+            pours = _pours.get(port)
+            if pours is None:
+                pours = _pours[port] = StationPours(DB_FILE)
+            worker = RadarAcquisition(port, rate_hz, pours=pours).start()
+            _workers[port] = worker
+        return worker
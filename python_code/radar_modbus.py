@@ -0,0 +1,261 @@
+# radar_modbus.py
+import struct
+import threading
+import time
+from pymodbus.client import ModbusSerialClient, ModbusTcpClient
+from pymodbus.exceptions import ModbusException
+
+# =====================================================
+# MODBUS CONFIG (VENDOR VERIFIED)
+# =====================================================
+DEFAULT_PORT = "COM14"
+BAUDRATE = 9600
+SLAVE_ID = 1
+TIMEOUT_S = 1
+
+# =====================================================
+# RADAR REGISTERS (FLOAT32, 2 REGISTERS EACH)
+# =====================================================
+REG_DISTANCE         = 4096   # space height
+REG_MATERIAL_HEIGHT  = 4098
+REG_MATERIAL_PERCENT = 4100
+REG_CURRENT          = 4102
+REG_TEMPERATURE      = 4110
+
+# ---- Diagnostic (OPTIONAL – radar may reject)
+REG_POWER            = 4120
+REG_SNR              = 4122
+
+# ---- Engineering (safe subset)
+REG_BLIND            = 4210
+REG_RANGE            = 4212
+REG_DAMPING          = 4220
+
+# =====================================================
+# BATCHING / RECONNECT
+# =====================================================
+MAX_READ_COUNT = 60      # registers per request (spec limit is 125)
+MAX_GAP = 10             # unused registers we will read through to merge spans
+BACKOFF_MIN_S = 0.5
+BACKOFF_MAX_S = 10.0
+
+
+def plan_reads(regs, max_gap=MAX_GAP, max_count=MAX_READ_COUNT):
+    """Group float registers into contiguous (start, count) spans."""
+    spans = []
+    for reg in sorted(set(regs)):
+        if spans:
+            start, count = spans[-1]
+            end = start + count
+            if reg - end <= max_gap and reg + 2 - start <= max_count:
+                spans[-1] = (start, reg + 2 - start)
+                continue
+        spans.append((reg, 2))
+    return spans
+
+
+def decode_floats(start, registers, regs):
+    """Decode every requested float from one block of raw registers."""
+    buf = struct.pack(f">{len(registers)}H", *registers)
+    return {
+        reg: struct.unpack_from(">f", buf, 2 * (reg - start))[0]
+        for reg in regs
+    }
+
+
+def _split_span(start, count, regs):
+    """Smaller spans to try when the radar refuses (start, count) as a block:
+    first drop the gaps, then fall back to one float per request."""
+    inner = [r for r in regs if start <= r < start + count]
+    spans = plan_reads(inner, max_gap=0)
+    if len(spans) > 1:
+        return spans
+    return [(r, 2) for r in sorted(set(inner))]
+
+
+def encode_float(value):
+    raw = struct.pack(">f", float(value))
+    return [(raw[0] << 8) | raw[1], (raw[2] << 8) | raw[3]]
+
+
+# =====================================================
+# LONG-LIVED SESSION (ONE PER PORT)
+# =====================================================
+class RadarSession:
+    """Keeps the serial port open and batches float reads.
+
+    All access goes through ``lock`` so Streamlit sessions sharing a
+    port never interleave requests on the bus.
+    """
+
+    def __init__(self, port, baudrate=BAUDRATE, slave_id=SLAVE_ID, timeout=TIMEOUT_S):
+        self.port = port
+        self.baudrate = baudrate
+        self.slave_id = slave_id
+        self.timeout = timeout
+        self.lock = threading.RLock()
+
+        self._client = None
+        self._backoff = 0.0
+        self._next_attempt = 0.0
+        # spans the radar refused as a block -> re-planned into smaller reads
+        self._split = set()
+
+    # ---------------- connection ----------------
+    def _make_client(self):
+        if self.port.startswith("tcp:"):
+            # RTU frames over TCP: radar_sim, or a serial-to-Ethernet gateway
+            _, host, port = self.port.split(":")
+            c = ModbusTcpClient(host, port=int(port), framer="rtu", timeout=self.timeout)
+            c.unit_id = self.slave_id
+            return c
+
+        c = ModbusSerialClient(
+            port=self.port,
+            baudrate=self.baudrate,
+            bytesize=8,
+            parity="N",
+            stopbits=1,
+            timeout=self.timeout
+        )
+        c.unit_id = self.slave_id
+        return c
+
+    def _connect(self):
+        if self._client is not None and self._client.connected:
+            return True
+
+        now = time.monotonic()
+        if now < self._next_attempt:
+            return False
+
+        self._drop()
+        client = self._make_client()
+        try:
+            ok = client.connect()
+        except Exception:
+            ok = False
+
+        if not ok:
+            client.close()
+            self._backoff = min(max(self._backoff * 2, BACKOFF_MIN_S), BACKOFF_MAX_S)
+            self._next_attempt = now + self._backoff
+            return False
+
+        self._client = client
+        self._backoff = 0.0
+        self._split.clear()
+        return True
+
+    def _drop(self):
+        if self._client is not None:
+            try:
+                self._client.close()
+            except Exception:
+                pass
+        self._client = None
+
+    def _link_lost(self):
+        self._drop()
+        self._backoff = min(max(self._backoff * 2, BACKOFF_MIN_S), BACKOFF_MAX_S)
+        self._next_attempt = time.monotonic() + self._backoff
+
+    @property
+    def connected(self):
+        return self._client is not None and self._client.connected
+
+    def close(self):
+        with self.lock:
+            self._drop()
+
+    # ---------------- raw access ----------------
+    def _read(self, address, count):
+        """(registers or None, whether the radar answered at all)."""
+        try:
+            rr = self._client.read_holding_registers(address, count=count)
+        except ModbusException:
+            return None, False
+        # pymodbus hands timeouts back as a ModbusIOException object;
+        # only a real exception response means the radar refused the read
+        if rr is None or isinstance(rr, ModbusException):
+            return None, False
+        if rr.isError():
+            return None, True
+        return rr.registers, True
+
+    def read_registers(self, address, count):
+        """Return the raw registers, or None if the read failed."""
+        with self.lock:
+            if not self._connect():
+                return None
+            return self._read(address, count)[0]
+
+    def read_floats(self, regs):
+        """Read many float registers in as few requests as possible.
+
+        Returns ``{reg: value or None}``. Blocks the radar rejects with
+        an exception response are re-planned into smaller reads and
+        remembered until reconnect; a block that times out is retried
+        once as is, then the link is treated as gone.
+        """
+        result = dict.fromkeys(regs)
+
+        with self.lock:
+            if not self._connect():
+                return result
+
+            pending = plan_reads(regs)
+            while pending:
+                start, count = pending.pop(0)
+                if (start, count) in self._split:
+                    pending[:0] = _split_span(start, count, regs)
+                    continue
+
+                registers, ok = self._read(start, count)
+                if not ok:
+                    registers, ok = self._read(start, count)
+                if not ok:
+                    self._link_lost()
+                    break
+                if registers is None:
+                    if count > 2:
+                        self._split.add((start, count))
+                        pending[:0] = _split_span(start, count, regs)
+                    continue
+
+                wanted = [r for r in regs if start <= r < start + count]
+                result.update(decode_floats(start, registers, wanted))
+
+        return result
+
+    def read_float(self, reg):
+        return self.read_floats([reg])[reg]
+
+    def write_float(self, reg, value):
+        with self.lock:
+            if not self._connect():
+                return False, "Connection failed"
+            try:
+                rq = self._client.write_registers(reg, encode_float(value))
+            except ModbusException:
+                return False, "Protected register"
+
+        if rq and not rq.isError():
+            return True, "Written"
+        return False, "Rejected"
+
+
+# =====================================================
+# PROCESS-WIDE POOL
+# =====================================================
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+
+def get_session(port=DEFAULT_PORT):
+    with _sessions_lock:
+        session = _sessions.get(port)
+        if session is None:
+            session = RadarSession(port)
+            _sessions[port] = session
+        return session
@@ -0,0 +1,485 @@
+# radar_sim.py
+import argparse
+import os
+import random
+import socketserver
+import struct
+import threading
+import time
+
+import numpy as np
+
+from radar_modbus import (
+    BAUDRATE, SLAVE_ID,
+    REG_DISTANCE, REG_MATERIAL_HEIGHT, REG_MATERIAL_PERCENT,
+    REG_CURRENT, REG_TEMPERATURE, REG_POWER, REG_SNR,
+    REG_BLIND, REG_RANGE, REG_DAMPING,
+    encode_float,
+)
+
+# =====================================================
+# SIMULATED RADAR (MODBUS RTU SLAVE)
+# =====================================================
+# Serves the radar register map over TCP (raw RTU frames, what
+# RadarSession opens for a "tcp:host:port" port) or a pty (POSIX, opened
+# like any serial port). Point a page's "COM Port" box at it.
+PROFILE_REGS = {
+    "distance": REG_DISTANCE,
+    "material_height": REG_MATERIAL_HEIGHT,
+    "material_percent": REG_MATERIAL_PERCENT,
+    "current": REG_CURRENT,
+    "temperature": REG_TEMPERATURE,
+    "power": REG_POWER,
+    "snr": REG_SNR,
+}
+ENGINEERING_DEFAULTS = {REG_BLIND: 0.3, REG_RANGE: 30.0, REG_DAMPING: 1.0}
+
+# register windows the radar answers; gaps inside read back as 0
+REGISTER_BLOCKS = ((4096, 4124), (4210, 4222))
+MAX_REGISTERS = 125
+
+FC_READ_HOLDING = 3
+FC_WRITE_MULTIPLE = 16
+EXC_ILLEGAL_FUNCTION = 1
+EXC_ILLEGAL_ADDRESS = 2
+EXC_ILLEGAL_VALUE = 3
+EXC_DEVICE_FAILURE = 4
+
+DEFAULT_TCP_PORT = 5020
+
+
+def crc16(data):
+    """Modbus RTU CRC (poly 0xA001, init 0xFFFF), as sent little-endian."""
+    crc = 0xFFFF
+    for b in data:
+        crc ^= b
+        for _ in range(8):
+            crc = (crc >> 1) ^ 0xA001 if crc & 1 else crc >> 1
+    return crc
+
+
+def with_crc(pdu):
+    return pdu + struct.pack("<H", crc16(pdu))
+
+
+# =====================================================
+# POUR PROFILES
+# =====================================================
+class Profile:
+    """Columns of ``PROFILE_REGS`` sampled at ``hz``; played in a loop,
+    ``speed`` times faster than recorded."""
+
+    def __init__(self, columns, hz, speed=1.0):
+        self.columns = {k: np.asarray(v, np.float64) for k, v in columns.items()}
+        self.hz = hz
+        self.speed = speed
+        self.n = len(next(iter(self.columns.values())))
+        self.t0 = time.monotonic()
+
+    @property
+    def cycle_s(self):
+        """Wall-clock seconds for one pass through the profile."""
+        return self.n / self.hz / self.speed
+
+    def sample(self, now=None):
+        elapsed = (time.monotonic() if now is None else now) - self.t0
+        i = int(elapsed * self.speed * self.hz) % self.n
+        return {name: col[i] for name, col in self.columns.items()}
+
+
+def phase_floor(speed=1.0):
+    """Shortest idle, pour and hold phases (profile seconds) that, played
+    ``speed`` times faster, still give the pour engine time to learn the
+    empty ladle, confirm the start and see the pour end (twice its
+    thresholds)."""
+    from pour_engine import DEFAULTS as p
+
+    return {
+        "idle_s": 2 * (p["stable_time_s"] + p["flow_window_s"]) * speed,
+        "pour_s": 2 * (p["min_pour_s"] + p["start_hold_s"] + p["flow_window_s"]) * speed,
+        "hold_s": 2 * p["flow_window_s"] * speed,
+    }
+
+
+def synthetic_profile(hz=20.0, cycles=1, empty_m=17.0, fill_m=4.5, idle_s=40.0,
+                      pour_s=90.0, hold_s=30.0, noise_m=0.003, speed=1.0):
+    """Ladle cycles as the radar sees them: empty ladle at ``empty_m``,
+    a linear pour raising the metal by ``fill_m``, a hold, then the
+    ladle is swapped for an empty one. One pour per cycle; phases are
+    stretched to ``phase_floor(speed)`` where shorter."""
+    floor = phase_floor(speed)
+    idle_s = max(idle_s, floor["idle_s"])
+    pour_s = max(pour_s, floor["pour_s"])
+    hold_s = max(hold_s, floor["hold_s"])
+    period = idle_s + pour_s + hold_s
+    t = np.arange(int(cycles * period * hz)) / hz
+    phase = np.mod(t, period)
+    height = np.clip((phase - idle_s) / pour_s, 0, 1) * fill_m
+    height += np.random.normal(0, noise_m, len(t))
+    distance = empty_m - height
+    return {
+        "distance": distance,
+        "material_height": height,
+        "material_percent": 100 * height / fill_m,
+        "current": 4 + 16 * height / fill_m,
+        "temperature": np.full(len(t), 45.0),
+        "power": np.full(len(t), -32.0),
+        "snr": np.full(len(t), 28.0),
+    }
+
+
+def simulated_profile(pours, hz=20.0, seed=None, idle_s=40.0, speed=1.0):
+    """Columns for ``pours`` varied pours from pour_simulator (ramp,
+    steady flow, tail-off, radar noise and lost echoes). The idle lead-in
+    (and hold, which is the same) matches ``synthetic_profile``; pours
+    shorter than ``phase_floor(speed)`` are slowed down, all by the same
+    factor, so every one is still detectable at that speed."""
+    from pour_simulator import DEFAULTS, simulate, to_trace
+
+    floor = phase_floor(speed)
+    idle_s = max(idle_s, floor["idle_s"], floor["hold_s"])
+    seed = np.random.SeedSequence(seed).entropy if seed is None else seed
+    shortest = simulate(pours, seed=seed, traces=False)["truth"]["duration_s"].min()
+    k = max(1.0, floor["pour_s"] / shortest)
+    slow = {
+        "ramp_s": tuple(v * k for v in DEFAULTS["ramp_s"]),
+        "tail_s": tuple(v * k for v in DEFAULTS["tail_s"]),
+        "peak_flow_kg_s": tuple(v / k for v in DEFAULTS["peak_flow_kg_s"]),
+    }
+    trace = to_trace(simulate(pours, seed=seed, hz=hz, idle_s=idle_s, **slow), 0.0)
+    names = {"material_percent": "fill_pct"}
+    return {name: trace[names.get(name, name)].astype(np.float64) for name in PROFILE_REGS}
+
+
+def recorded_profile(t0, t1, station=None):
+    """Columns of a ``trace_recorder`` slice and its sample rate."""
+    from trace_recorder import load_slice, trace_dir
+
+    trace = load_slice(t0, t1, trace_dir(station))
+    if len(trace) < 2:
+        raise SystemExit("No recorded trace in that range.")
+    names = {"material_percent": "fill_pct"}
+    columns = {
+        name: trace[names.get(name, name)].astype(np.float64)
+        for name in PROFILE_REGS
+    }
+    hz = (len(trace) - 1) / max(trace["t"][-1] - trace["t"][0], 1e-9)
+    return columns, hz
+
+
+# =====================================================
+# SLAVE
+# =====================================================
+class RadarSlave:
+    """Answers FC3/FC16 from a profile, with optional faults:
+
+    * ``timeout_rate``: fraction of requests left unanswered
+    * ``reject_rate``:  fraction answered with a device-failure exception
+    * ``reject``:       registers whose reads are always refused (like a
+                        radar without the optional diagnostics)
+    * ``baud``:         hold each reply for the time the request and reply
+                        would take on the wire (0 = as fast as possible)
+    """
+
+    def __init__(self, profile, slave_id=SLAVE_ID, timeout_rate=0.0, reject_rate=0.0,
+                 reject=(), latency_s=0.0, baud=BAUDRATE):
+        self.profile = profile
+        self.slave_id = slave_id
+        self.timeout_rate = timeout_rate
+        self.reject_rate = reject_rate
+        self.reject = set(reject)
+        self.latency_s = latency_s
+        self.baud = baud
+        self.engineering = dict(ENGINEERING_DEFAULTS)
+
+        self.lock = threading.Lock()
+        self.stats = {"requests": 0, "ok": 0, "rejected": 0, "timeouts": 0,
+                      "crc_errors": 0, "writes": 0}
+        self.started = time.monotonic()
+
+    # ---------------- registers ----------------
+    def _registers(self, start, count):
+        values = dict(self.engineering)
+        for name, value in self.profile.sample().items():
+            values[PROFILE_REGS[name]] = value
+
+        regs = [0] * count
+        for reg, value in values.items():
+            for k, word in enumerate(encode_float(value)):
+                if start <= reg + k < start + count:
+                    regs[reg + k - start] = word
+        return regs
+
+    @staticmethod
+    def _mapped(start, count):
+        return any(lo <= start and start + count <= hi for lo, hi in REGISTER_BLOCKS)
+
+    # ---------------- requests ----------------
+    def handle(self, frame):
+        """Reply frame for one complete request frame, or None for silence."""
+        with self.lock:
+            self.stats["requests"] += 1
+            if crc16(frame[:-2]) != struct.unpack("<H", frame[-2:])[0]:
+                self.stats["crc_errors"] += 1
+                return None
+            unit, fc = frame[0], frame[1]
+            if unit not in (0, self.slave_id):
+                return None
+            if random.random() < self.timeout_rate:
+                self.stats["timeouts"] += 1
+                return None
+            reply = self._reply(fc, frame[2:-2])
+            self.stats["ok" if not reply[0] & 0x80 else "rejected"] += 1
+            return with_crc(bytes([unit]) + reply)
+
+    def _reply(self, fc, body):
+        def error(code):
+            return bytes([fc | 0x80, code])
+
+        if fc not in (FC_READ_HOLDING, FC_WRITE_MULTIPLE):
+            return error(EXC_ILLEGAL_FUNCTION)
+        start, count = struct.unpack(">HH", body[:4])
+        if not 1 <= count <= MAX_REGISTERS:
+            return error(EXC_ILLEGAL_VALUE)
+        if not self._mapped(start, count):
+            return error(EXC_ILLEGAL_ADDRESS)
+        if any(start <= r + k < start + count for r in self.reject for k in (0, 1)):
+            return error(EXC_ILLEGAL_ADDRESS)
+        if random.random() < self.reject_rate:
+            return error(EXC_DEVICE_FAILURE)
+
+        if fc == FC_READ_HOLDING:
+            regs = self._registers(start, count)
+            return struct.pack(f">BB{count}H", fc, 2 * count, *regs)
+
+        # FC16: only whole engineering floats are writable
+        words = struct.unpack(f">{count}H", body[5:5 + 2 * count])
+        if count != 2 or start not in self.engineering:
+            return error(EXC_ILLEGAL_ADDRESS)
+        self.engineering[start] = struct.unpack(">f", struct.pack(">2H", *words))[0]
+        self.stats["writes"] += 1
+        return struct.pack(">BHH", fc, start, count)
+
+    # ---------------- byte stream ----------------
+    @staticmethod
+    def _frame_length(buf):
+        """Length of the request at the head of ``buf``; 0 = need more bytes."""
+        if len(buf) < 2:
+            return 0
+        if buf[1] == FC_WRITE_MULTIPLE:
+            return 9 + buf[6] if len(buf) >= 7 else 0
+        return 8
+
+    def serve_stream(self, recv, send):
+        """Answer requests from a byte stream until ``recv`` returns b""."""
+        buf = b""
+        while True:
+            data = recv(256)
+            if not data:
+                return
+            buf += data
+            while True:
+                size = self._frame_length(buf)
+                if not size or len(buf) < size:
+                    break
+                frame, buf = buf[:size], buf[size:]
+                received = time.monotonic()
+                reply = self.handle(frame)
+                if reply is None:
+                    buf = b""               # a silent slave also loses sync
+                    continue
+                delay = self.latency_s
+                if self.baud:
+                    delay += (len(frame) + len(reply)) * 10 / self.baud
+                delay -= time.monotonic() - received
+                if delay > 0:
+                    time.sleep(delay)
+                send(reply)
+
+    def report(self):
+        with self.lock:
+            stats = dict(self.stats)
+        elapsed = time.monotonic() - self.started
+        stats["rate_hz"] = stats["ok"] / elapsed if elapsed > 0 else 0.0
+        return stats
+
+
+# =====================================================
+# TRANSPORTS
+# =====================================================
+def serve_tcp(slave, host="127.0.0.1", port=DEFAULT_TCP_PORT):
+    """Start a background TCP server; returns it (``server_address`` has
+    the bound port when ``port`` is 0)."""
+
+    class Handler(socketserver.BaseRequestHandler):
+        def handle(self):
+            slave.serve_stream(self.request.recv, self.request.sendall)
+
+    socketserver.ThreadingTCPServer.allow_reuse_address = True
+    server = socketserver.ThreadingTCPServer((host, port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="radar-sim-tcp", daemon=True).start()
+    return server
+
+
+def serve_pty(slave):
+    """Start serving on a new pseudo-terminal (POSIX); returns its path."""
+    import tty
+
+    master, client = os.openpty()
+    tty.setraw(client)
+
+    def recv(n):
+        try:
+            return os.read(master, n)
+        except OSError:
+            return b""
+
+    threading.Thread(
+        target=slave.serve_stream, args=(recv, lambda b: os.write(master, b)),
+        name="radar-sim-pty", daemon=True
+    ).start()
+    return os.ttyname(client)
+
+
+def tcp_port(server):
+    host, port = server.server_address[:2]
+    return f"tcp:{host}:{port}"
+
+
+# =====================================================
+# BENCHMARK (RadarSession + RadarAcquisition AGAINST THE SLAVE)
+# =====================================================
+def _percentiles(values):
+    if not values:
+        return "—"
+    p50, p95, p99 = np.percentile(np.asarray(values) * 1000, [50, 95, 99])
+    return f"p50 {p50:.1f} ms  p95 {p95:.1f} ms  p99 {p99:.1f} ms"
+
+
+def bench(port, slave, duration, rate_hz):
+    import INIT_PARAMS as IPS
+    from radar_modbus import get_session
+    from radar_acquisition import RadarAcquisition, SAMPLE_REGS
+    from pour_engine import replay
+
+    IPS.TRACE_RECORDING = False         # benchmark samples stay out of data/traces
+    regs = list(SAMPLE_REGS.values())
+    session = get_session(port)
+
+    # ---------------- back-to-back reads ----------------
+    latency, missing = [], 0
+    end = time.monotonic() + duration / 2
+    while time.monotonic() < end:
+        t = time.monotonic()
+        values = session.read_floats(regs)
+        latency.append(time.monotonic() - t)
+        missing += sum(v is None for v in values.values())
+    span = duration / 2
+    print(f"read_floats, back to back : {len(latency) / span:6.1f} reads/s  "
+          f"{_percentiles(latency)}  missing values {missing}/{len(latency) * len(regs)}")
+
+    # ---------------- fixed-rate acquisition + pour detection ----------------
+    acq = RadarAcquisition(port, rate_hz, store_path=None).start()     # nothing stored
+    t_start = time.time()
+    end = time.monotonic() + duration / 2
+    while time.monotonic() < end:
+        time.sleep(1.0)
+        acq.latest()                    # keep the worker from idling out
+    acq.stop()
+    data = acq.window(since=t_start)
+    got = len(data["t"])
+    print(f"acquisition               : {got / span:6.1f} samples/s")
+    if got > 1:
+        gap = np.diff(data["t"])
+        present = data["distance"][1:] <= acq.scheduler.no_ladle_distance
+        for label, mask, hz in (("ladle present", present, rate_hz),
+                                ("no ladle", ~present, acq.scheduler.idle_hz)):
+            if mask.any():
+                print(f"  {label:<23} : {1 / np.median(gap[mask]):6.1f} samples/s "
+                      f"(target {hz:g})")
+    if acq.scheduler.backed_off():
+        print(f"  backed off registers    : {acq.scheduler.backed_off()}")
+
+    if got > 1:
+        pours = replay(data["t"], distance=data["distance"])
+        cycles = span / slave.profile.cycle_s
+        print(f"pours detected            : {len(acq.pours.recent('pour_end'))} live, "
+              f"{len(pours)} on replay (played {cycles:.1f} passes through the profile)")
+    print(f"slave                     : {slave.report()}")
+
+
+# =====================================================
+# CLI
+# =====================================================
+def _regs(text):
+    return [int(v) for v in text.split(",") if v]
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Simulated Modbus RTU radar for the radar pages.")
+    ap.add_argument("mode", choices=["serve", "bench"])
+    ap.add_argument("--tcp", type=int, default=DEFAULT_TCP_PORT, help="TCP port (serve)")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--pty", action="store_true", help="serve on a pseudo-terminal instead")
+    ap.add_argument("--from", dest="start", default=None, help="replay a recorded trace from here")
+    ap.add_argument("--to", dest="end", default=None)
+    ap.add_argument("--station", default=None)
+    ap.add_argument("--simulated", type=int, default=0, metavar="POURS",
+                    help="play this many pour_simulator pours instead of the fixed cycle")
+    ap.add_argument("--speed", type=float, default=1.0, help="play the profile this much faster")
+    ap.add_argument("--timeout-rate", type=float, default=0.0)
+    ap.add_argument("--reject-rate", type=float, default=0.0)
+    ap.add_argument("--reject", type=_regs, default=[],
+                    help="comma list of registers always refused, e.g. 4120,4122")
+    ap.add_argument("--latency-ms", type=float, default=0.0)
+    ap.add_argument("--baud", type=int, default=BAUDRATE, help="emulated bus speed, 0 = off")
+    ap.add_argument("--duration", type=float, default=60.0, help="seconds (bench)")
+    ap.add_argument("--rate", type=float, default=None, help="acquisition Hz (bench)")
+    args = ap.parse_args(argv)
+
+    if args.start:
+        from datetime import datetime
+
+        end = datetime.fromisoformat(args.end) if args.end else datetime.now()
+        columns, hz = recorded_profile(
+            datetime.fromisoformat(args.start).timestamp(), end.timestamp(), args.station
+        )
+        if args.speed > 1:
+            print(f"warning: a recorded trace is played as recorded; at --speed {args.speed:g} "
+                  f"phases shorter than {phase_floor(args.speed)} (profile s) are too quick "
+                  f"for the pour engine and their pours will be missed")
+    elif args.simulated:
+        hz = 20.0
+        columns = simulated_profile(args.simulated, hz, speed=args.speed)
+    else:
+        hz = 20.0
+        columns = synthetic_profile(hz, speed=args.speed)
+    slave = RadarSlave(
+        Profile(columns, hz, args.speed), timeout_rate=args.timeout_rate,
+        reject_rate=args.reject_rate, reject=args.reject,
+        latency_s=args.latency_ms / 1000, baud=args.baud
+    )
+
+    if args.pty:
+        port = serve_pty(slave)
+    else:
+        port = tcp_port(serve_tcp(slave, args.host, 0 if args.mode == "bench" else args.tcp))
+
+    if args.mode == "bench":
+        import INIT_PARAMS as IPS
+
+        bench(port, slave, args.duration, args.rate or IPS.RADAR_SAMPLE_HZ)
+        return
+
+    print(f"Simulated radar on {port} (enter it as the page's COM port). Ctrl-C to stop.")
+    try:
+        while True:
+            time.sleep(10)
+            print(slave.report())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
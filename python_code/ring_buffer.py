@@ -0,0 +1,114 @@
+# ring_buffer.py
+import math
+import time
+
+import numpy as np
+
+
+def local_times(t):
+    """Epoch seconds -> naive local datetimes (what st.line_chart shows)."""
+    import pandas as pd
+
+    offset = time.localtime().tm_gmtoff
+    return pd.to_datetime(np.asarray(t) + offset, unit="s")
+
+
+class RingBuffer:
+    """Fixed-size, preallocated time series: float64 epoch time plus
+    float32 value columns.
+
+    Every value is written twice (at ``i`` and ``i + capacity``) so the
+    newest ``n`` samples are always one contiguous slice and every read
+    is a zero-copy view. Views stay valid until ``capacity - n`` more
+    appends; copy them if they must outlive that.
+    """
+
+    def __init__(self, capacity, columns):
+        self.capacity = int(capacity)
+        self.columns = tuple(columns)
+        self._t = np.full(2 * self.capacity, math.nan, np.float64)
+        self._cols = {
+            c: np.full(2 * self.capacity, math.nan, np.float32) for c in self.columns
+        }
+        self._head = 0      # next write position, 0 <= head < capacity
+        self._size = 0
+        self.total = 0      # samples appended since creation / clear()
+
+    def __len__(self):
+        return self._size
+
+    # ---------------- write ----------------
+    def append(self, t, **values):
+        i = self._head
+        j = i + self.capacity
+        self._t[i] = self._t[j] = t
+        for c, arr in self._cols.items():
+            v = values.get(c)
+            arr[i] = arr[j] = math.nan if v is None else v
+
+        self._head = (i + 1) % self.capacity
+        self._size = min(self._size + 1, self.capacity)
+        self.total += 1
+
+    def extend(self, t, **values):
+        """Append many samples at once (arrays of equal length)."""
+        t = np.asarray(t, np.float64)
+        n = len(t)
+        if n == 0:
+            return
+        if n > self.capacity:
+            t = t[-self.capacity:]
+            values = {c: np.asarray(v)[-self.capacity:] for c, v in values.items()}
+            self.total += n - self.capacity
+            n = self.capacity
+
+        idx = (self._head + np.arange(n)) % self.capacity
+        self._t[idx] = self._t[idx + self.capacity] = t
+        for c, arr in self._cols.items():
+            v = values.get(c)
+            v = math.nan if v is None else np.asarray(v, np.float32)
+            arr[idx] = arr[idx + self.capacity] = v
+
+        self._head = (self._head + n) % self.capacity
+        self._size = min(self._size + n, self.capacity)
+        self.total += n
+
+    def clear(self):
+        self._head = 0
+        self._size = 0
+        self.total = 0
+
+    # ---------------- zero-copy reads ----------------
+    def _slice(self, n):
+        n = self._size if n is None else min(n, self._size)
+        end = self._head + self.capacity
+        return slice(end - n, end)
+
+    def t(self, n=None):
+        return self._t[self._slice(n)]
+
+    def column(self, name, n=None):
+        return self._cols[name][self._slice(n)]
+
+    def last(self, name=None):
+        """Newest value of ``name`` (or its time), None when empty."""
+        if not self._size:
+            return None
+        i = self._head + self.capacity - 1
+        return float(self._t[i] if name is None else self._cols[name][i])
+
+    def since(self, t0):
+        """How many of the newest samples have ``t > t0``."""
+        return self._size - int(np.searchsorted(self.t(), t0, side="right"))
+
+    # ---------------- charting ----------------
+    def frame(self, n=None, columns=None):
+        """DataFrame indexed by local time (this one copies)."""
+        import pandas as pd
+
+        columns = columns or self.columns
+        s = self._slice(n)
+        return pd.DataFrame(
+            {c: self._cols[c][s] for c in columns},
+            index=pd.Index(local_times(self._t[s]), name="time")
+        )
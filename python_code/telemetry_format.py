@@ -0,0 +1,78 @@
+# telemetry_format.py
+import struct
+
+import numpy as np
+
+# =====================================================
+# BATCHED BINARY TELEMETRY (RS485 RADAR + GYRO)
+# =====================================================
+# payload = header + count fixed-width little-endian records
+#   magic  2s  b"LT"
+#   ver    B   format version (records are looked up per version)
+#   kind   B   KIND_RADAR / KIND_GYRO
+#   count  H   records that follow
+#   _      H   reserved (0)
+HEADER = struct.Struct("<2sBBHH")
+MAGIC = b"LT"
+VERSION = 1
+
+KIND_RADAR = 1
+KIND_GYRO = 2
+
+RADAR_DTYPE = np.dtype([
+    ("t", "<f8"),                # epoch seconds, stamped on the Pi
+    ("material_height", "<f4"),
+    ("fill_pct", "<f4"),
+    ("current", "<f4"),
+    ("temperature", "<f4"),
+])
+GYRO_DTYPE = np.dtype([
+    ("t", "<f8"),
+    ("x", "<f4"),
+    ("y", "<f4"),
+    ("z", "<f4"),
+])
+
+# (version, kind) -> record layout; a v2 adds entries, v1 keeps decoding
+RECORD_DTYPES = {
+    (1, KIND_RADAR): RADAR_DTYPE,
+    (1, KIND_GYRO): GYRO_DTYPE,
+}
+KIND_NAMES = {KIND_RADAR: "rs485", KIND_GYRO: "gyro"}
+
+
+class FormatError(ValueError):
+    pass
+
+
+def is_binary(payload):
+    return payload[:2] == MAGIC
+
+
+def encode(kind, records, version=VERSION):
+    """One message for a batch of records (structured array or a dict of
+    equal-length columns)."""
+    dtype = RECORD_DTYPES[(version, kind)]
+    if isinstance(records, dict):
+        n = len(records["t"])
+        arr = np.zeros(n, dtype)
+        for name in dtype.names:
+            arr[name] = records.get(name, np.nan)
+    else:
+        arr = np.asarray(records, dtype)
+    return HEADER.pack(MAGIC, version, kind, len(arr), 0) + arr.tobytes()
+
+
+def decode(payload):
+    """(kind, records) for a binary payload. ``records`` is a read-only
+    structured array over the payload bytes (one ``np.frombuffer``, no
+    per-field parsing)."""
+    if len(payload) < HEADER.size or not is_binary(payload):
+        raise FormatError("not a binary telemetry payload")
+    _, version, kind, count, _ = HEADER.unpack_from(payload)
+    dtype = RECORD_DTYPES.get((version, kind))
+    if dtype is None:
+        raise FormatError(f"unknown telemetry version/kind {version}/{kind}")
+    if len(payload) < HEADER.size + count * dtype.itemsize:
+        raise FormatError("truncated telemetry payload")
+    return kind, np.frombuffer(payload, dtype, count, HEADER.size)
@@ -0,0 +1,65 @@
+# test_flow_estimator.py
+import numpy as np
+
+from flow_estimator import FlowEstimator, RESYNC_EVERY
+
+
+def test_constant_flow_is_recovered():
+    est = FlowEstimator(window_s=3.0)
+    for i in range(200):
+        est.update(1.7e9 + i / 10, 500.0 * i / 10)
+
+    assert abs(est.slope - 500.0) < 1e-6
+    assert est.r2 > 0.999 and est.confident()
+    assert len(est) == 31               # 3 s at 10 Hz, both ends included
+
+
+def test_no_answer_until_the_window_is_covered():
+    est = FlowEstimator(window_s=3.0)
+    for i in range(20):                 # 1.9 s < 0.75 of the window
+        est.update(i / 10, float(i))
+    assert est.slope is None and est.r2 is None and not est.confident()
+
+
+def test_missing_weights_slide_the_window():
+    est = FlowEstimator(window_s=3.0)
+    for i in range(50):
+        est.update(i / 10, 100.0 * i / 10)
+    assert est.slope is not None
+
+    for i in range(50, 90):             # 4 s of lost echoes
+        est.update(i / 10, None)
+    assert len(est) == 0 and est.slope is None
+
+    for i in range(90, 130):
+        est.update(i / 10, float("nan") if i % 7 == 0 else 10.0)
+    assert abs(est.slope) < 1e-9
+
+
+def test_noisy_flat_weight_is_not_confident():
+    rng = np.random.default_rng(0)
+    est = FlowEstimator(window_s=3.0)
+    for i in range(300):
+        est.update(i / 10, 80000 + rng.normal(0, 100))
+    assert abs(est.slope) < 150
+    assert not est.confident()
+
+
+def test_resync_keeps_long_runs_exact():
+    est, ref = FlowEstimator(window_s=3.0), FlowEstimator(window_s=3.0)
+    t0 = 1.7e9
+    for i in range(3 * RESYNC_EVERY + 17):
+        est.update(t0 + i / 10, 2.0e5 + 300.0 * i / 10)
+    for i in range(3 * RESYNC_EVERY - 40, 3 * RESYNC_EVERY + 17):
+        ref.update(t0 + i / 10, 2.0e5 + 300.0 * i / 10)
+    assert abs(est.slope - ref.slope) < 1e-6
+    assert abs(est.slope - 300.0) < 1e-6
+
+
+def test_out_of_order_readings_are_ignored():
+    est = FlowEstimator(window_s=3.0)
+    for i in range(40):
+        est.update(i / 10, 50.0 * i / 10)
+    n = len(est)
+    est.update(1.0, 1e9)
+    assert len(est) == n and abs(est.slope - 50.0) < 1e-9
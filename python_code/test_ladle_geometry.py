@@ -0,0 +1,68 @@
+# test_ladle_geometry.py
+import math
+import os
+
+import numpy as np
+import pytest
+
+import ladle_geometry as lg
+from ladle_geometry import LadleGeometry, get_geometry, load_wear, set_wear
+
+
+def test_cylinder_volume_is_exact():
+    g = LadleGeometry.cylinder(3.0)
+    area = math.pi * 1.5 ** 2
+    assert g.volume(2.0) == pytest.approx(2.0 * area)
+    assert g.weight(1.0, density=7000) == pytest.approx(7000 * area)
+    # past the top the top cross-section is extrapolated
+    assert g.volume(g.depth + 1.0) == pytest.approx(g.capacity + area)
+
+
+def test_taper_matches_the_frustum_and_inverts():
+    g = LadleGeometry(lg.NOMINAL_PROFILE)
+    (h0, d0), (h1, d1) = lg.NOMINAL_PROFILE
+    r0, r1 = d0 / 2, d1 / 2
+    frustum = math.pi * (h1 - h0) * (r0 * r0 + r0 * r1 + r1 * r1) / 3
+    assert g.capacity == pytest.approx(frustum, rel=1e-6)
+
+    heights = np.array([0.0, 0.5, 2.25, 4.9])
+    np.testing.assert_allclose(g.height(g.volume(heights)), heights, atol=1e-9)
+    assert np.isnan(g.volume(np.array([np.nan]))[0])
+
+
+def test_wear_widens_the_bore():
+    new = LadleGeometry(lg.NOMINAL_PROFILE)
+    worn = LadleGeometry(lg.NOMINAL_PROFILE, wear_mm=50)
+    assert worn.volume(3.0) > new.volume(3.0)
+
+
+def test_bad_profile_and_unknown_ladle_are_rejected():
+    with pytest.raises(ValueError):
+        LadleGeometry(((1.0, 3.0), (0.5, 3.0)))
+    with pytest.raises(KeyError):
+        get_geometry("nope")
+
+
+def test_wear_file_round_trip_and_cache(tmp_path):
+    path = str(tmp_path / "wear.json")
+    assert load_wear(path) == {}
+
+    set_wear("27AX", 12.5, path)
+    assert load_wear(path) == {"27AX": 12.5}
+
+    # edits made behind the cache's back are picked up
+    with open(path, "w") as f:
+        f.write('{"27AX": 3.0, "32AV": 1.0}')
+    os.utime(path, ns=(0, 10 ** 9))
+    assert load_wear(path) == {"27AX": 3.0, "32AV": 1.0}
+
+    load_wear(path)["27AX"] = -1         # callers get a copy
+    assert load_wear(path)["27AX"] == 3.0
+
+
+def test_tables_are_shared_and_ladles_flagged_nominal():
+    assert get_geometry("27AX", 0.0) is get_geometry("27AX", 0.0)
+    assert all(lg.is_nominal(ladle) for ladle in lg.LADLE_IDS)
+    # the pages default to no ladle: the engine's plain cylinder
+    assert lg.LADLE_CHOICES[0] is None and not lg.is_nominal(None)
+    assert lg.ladle_label(None) != lg.ladle_label("27AX") == "27AX"
@@ -0,0 +1,136 @@
+# test_pour_analytics.py
+import numpy as np
+import pandas as pd
+import pytest
+
+import pour_analytics as pa
+import pour_store
+from pour_store import PourStore, open_store, DURATION_BIN_S, FLOW_BIN_KG_S
+
+DAY_FROM, DAY_TO = "2026-03-05", "2026-03-20"
+RANGE = "WHERE substr(pour_start, 1, 10) BETWEEN ? AND ?"
+
+
+def random_pours(n, seed=0):
+    rng = np.random.default_rng(seed)
+    rows = []
+    for i in range(n):
+        day = int(rng.integers(1, 29))
+        rows.append({
+            "pour_start": f"2026-03-{day:02d} {int(rng.integers(0, 24)):02d}:{i % 60:02d}:00",
+            "operator": str(rng.choice(["Asha", "Ravi", "Meena", ""])),
+            "shift": str(rng.choice(["A", "B", "C"])),
+            "total_weight_kg": float(rng.uniform(40000, 120000)),
+            "duration_s": float(rng.uniform(20, 200)),
+            "avg_flow_kg_s": None if rng.random() < 0.1 else float(rng.uniform(200, 900)),
+            "adhered": None if rng.random() < 0.2 else int(rng.random() < 0.7),
+        })
+    return rows
+
+
+@pytest.fixture
+def path(tmp_path):
+    p = str(tmp_path / "pours.db")
+    open_store(p).append_many(random_pours(600))
+    return p
+
+
+def raw(path, sql, args=(DAY_FROM, DAY_TO)):
+    return open_store(path).read_sql(sql, args)
+
+
+def test_tonnage_per_shift_matches_a_raw_scan(path):
+    got = pa.tonnage_per_shift(path, DAY_FROM, DAY_TO)
+    want = raw(path,
+        "SELECT substr(pour_start, 1, 10) AS day, shift, COUNT(*) AS pours, "
+        f"SUM(total_weight_kg) / 1000.0 AS tonnes FROM pours {RANGE} "
+        "GROUP BY day, shift ORDER BY day, shift")
+    assert got["day"].min() >= DAY_FROM and got["day"].max() <= DAY_TO
+    pd.testing.assert_frame_equal(got.reset_index(drop=True), want, check_dtype=False)
+
+
+def test_operator_summary_matches_a_raw_scan(path):
+    got = pa.operator_summary(path, DAY_FROM, DAY_TO)
+    want = raw(path,
+        "SELECT operator, COUNT(*) AS pours, SUM(total_weight_kg) / 1000.0 AS tonnes, "
+        "AVG(avg_flow_kg_s) AS mean_flow, COUNT(adhered) AS runs, "
+        "SUM(COALESCE(adhered, 0)) AS adhered "
+        f"FROM pours {RANGE} AND operator != '' GROUP BY operator ORDER BY operator"
+    ).set_index("operator")
+
+    assert list(got.index) == list(want.index)
+    np.testing.assert_array_equal(got["pours"], want["pours"])
+    np.testing.assert_allclose(got["tonnes"], want["tonnes"])
+    np.testing.assert_allclose(got["mean_flow_kg_s"], want["mean_flow"])
+    np.testing.assert_array_equal(got["runs"], want["runs"])
+    np.testing.assert_allclose(got["performance_pct"], 100 * want["adhered"] / want["runs"])
+
+    flows = raw(path, f"SELECT operator, avg_flow_kg_s FROM pours {RANGE} "
+                      "AND avg_flow_kg_s IS NOT NULL")
+    std = flows[flows["operator"] != ""].groupby("operator")["avg_flow_kg_s"].std(ddof=0)
+    np.testing.assert_allclose(got["std_flow_kg_s"], std.loc[got.index], rtol=1e-6)
+
+
+def test_operator_flow_distribution_matches_a_raw_scan(path):
+    got = pa.operator_flow_distribution(path, "Ravi", DAY_FROM, DAY_TO)
+    want = raw(path,
+        f"SELECT CAST(avg_flow_kg_s / {FLOW_BIN_KG_S} AS INTEGER) * {FLOW_BIN_KG_S} AS flow, "
+        f"COUNT(*) AS n FROM pours {RANGE} AND operator = 'Ravi' "
+        "AND avg_flow_kg_s IS NOT NULL GROUP BY flow ORDER BY flow")
+    assert list(got.columns) == ["Ravi"]
+    np.testing.assert_array_equal(got.index, want["flow"])
+    np.testing.assert_array_equal(got["Ravi"], want["n"])
+
+    everyone = pa.operator_flow_distribution(path, None, DAY_FROM, DAY_TO)
+    assert sorted(everyone.columns) == ["Asha", "Meena", "Ravi"]
+
+
+def test_duration_percentiles_match_a_raw_scan(path):
+    got = pa.duration_percentiles(path, (10, 50, 90), DAY_FROM, DAY_TO)
+    durations = raw(path, f"SELECT duration_s FROM pours {RANGE}")["duration_s"]
+    for p, value in got.items():
+        # linear within a histogram bin, so within one bin of the exact value
+        assert abs(value - np.percentile(durations, p)) <= DURATION_BIN_S
+
+
+def test_empty_range_gives_empty_results(path):
+    assert pa.tonnage_per_shift(path, "2027-01-01", "2027-01-31").empty
+    assert np.isnan(pa.duration_percentiles(path, (50,), "2027-01-01", "2027-01-31")[50])
+    assert pa.operator_performance("Asha", path, "2027-01-01", "2027-01-31") is None
+
+
+def aggregates(store):
+    return {name: store.read_sql(f"SELECT * FROM {name} ORDER BY 1, 2, 3")
+            for name in pour_store.AGG_TABLES}
+
+
+def test_agg_version_change_rebuilds(tmp_path, monkeypatch):
+    path = str(tmp_path / "pours.db")
+    store = PourStore(path)
+    store.append_many(random_pours(200, seed=1))
+    expected = aggregates(store)
+    with store._conn:
+        store._conn.execute("DELETE FROM agg_shift")        # stale aggregates
+    store.close()
+
+    reopened = PourStore(path)                              # same version: left alone
+    assert reopened.read_sql("SELECT COUNT(*) AS n FROM agg_shift").at[0, "n"] == 0
+    reopened.close()
+
+    monkeypatch.setattr(pour_store, "AGG_VERSION", pour_store.AGG_VERSION + ":test")
+    rebuilt = PourStore(path)
+    for name, frame in aggregates(rebuilt).items():
+        pd.testing.assert_frame_equal(frame, expected[name])
+    version = rebuilt.read_sql("SELECT value FROM meta WHERE key = 'agg_version'")
+    assert version.at[0, "value"] == pour_store.AGG_VERSION
+    assert rebuilt.count() == 200
+    rebuilt.close()
+
+
+def test_update_weights_rebuilds_tonnage(path):
+    store = open_store(path)
+    ids = raw(path, f"SELECT id FROM pours {RANGE}")["id"].tolist()
+    store.update_weights({i: 1000.0 for i in ids})
+
+    got = pa.tonnage_per_shift(path, DAY_FROM, DAY_TO)
+    np.testing.assert_allclose(got["tonnes"], got["pours"] * 1.0)
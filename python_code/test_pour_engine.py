@@ -0,0 +1,91 @@
+# test_pour_engine.py
+import numpy as np
+import pytest
+
+from pour_engine import PourEngine, StationPours, replay, replay_trace
+from pour_simulator import simulate, to_trace
+
+HZ = 10.0
+
+
+def run_live(t, distance, **params):
+    engine = PourEngine(**params)
+    events = []
+    for ti, d in zip(t.tolist(), distance.tolist()):
+        events += engine.update(ti, distance=None if d != d else d)
+    return events
+
+
+def ends(events):
+    return [ev["pour"] for ev in events if ev["event"] == "pour_end"]
+
+
+@pytest.mark.parametrize("noise_m", [0.002, 0.004, 0.008])
+def test_static_noisy_ladle_gives_no_pours(noise_m):
+    rng = np.random.default_rng(int(noise_m * 1000))
+    t = 1.7e9 + np.arange(int(30 * 60 * HZ)) / HZ
+    distance = np.where(t - t[0] < 10, 17.0, 14.0) + rng.normal(0, noise_m, len(t))
+    distance[rng.random(len(t)) < 0.002] = np.nan          # lost echoes
+
+    events = run_live(t, distance)
+    assert any(ev["event"] == "empty_learned" for ev in events)
+    assert ends(events) == []
+    assert replay(t, distance=distance) == []
+
+
+@pytest.fixture(scope="module")
+def simulated():
+    sim = simulate(6, seed=11, hz=HZ)
+    return sim, to_trace(sim, 1.7e9)
+
+
+def test_one_pour_per_simulated_fill(simulated):
+    sim, trace = simulated
+    live = ends(run_live(trace["t"], trace["distance"].astype(np.float64)))
+    assert len(live) == 6
+
+    # each detection falls in its own pour's window, close to its true weight
+    window_s = len(sim["t"]) / HZ
+    found = [int((p["trace_t0"] - trace["t"][0]) // window_s) for p in live]
+    assert found == list(range(6))
+    err = np.array([p["total_weight_kg"] for p in live]) / sim["truth"]["weight_kg"] - 1
+    assert np.all(np.abs(err) < 0.01)
+
+
+def test_replay_agrees_with_live(simulated):
+    _, trace = simulated
+    live = ends(run_live(trace["t"], trace["distance"].astype(np.float64)))
+    batch = replay_trace(trace)
+
+    assert len(batch) == len(live)
+    for a, b in zip(live, batch):
+        assert a["trace_t0"] == pytest.approx(b["trace_t0"], abs=1 / HZ)
+        assert a["trace_t1"] == pytest.approx(b["trace_t1"], abs=1 / HZ)
+        assert a["total_weight_kg"] == pytest.approx(b["total_weight_kg"], rel=1e-3)
+
+
+def test_short_light_rise_is_discarded():
+    t = 1.7e9 + np.arange(int(120 * HZ)) / HZ
+    x = t - t[0]
+    # 5 s of metal at a real flow rate, then the level holds
+    height = np.clip((x - 30) / 5, 0, 1) * 0.05
+    events = run_live(t, 17.0 - height)
+
+    assert [ev["event"] for ev in events if ev["event"].startswith("pour")] == [
+        "pour_start", "pour_discarded"
+    ]
+    assert replay(t, distance=17.0 - height) == []
+
+
+def test_station_pours_tags_context(simulated):
+    _, trace = simulated
+    station = StationPours(None, station="s1")
+    station.set_context(ladle_id=None, operator="Tester", shift="A")
+    for ti, d in zip(trace["t"].tolist(), trace["distance"].tolist()):
+        station.update(ti, distance=None if d != d else d)
+
+    pours = station.recent("pour_end")
+    assert len(pours) == 6
+    assert all(ev["pour"]["operator"] == "Tester" and ev["pour"]["station"] == "s1"
+               for ev in pours)
+    assert station.context()["operator"] == "Tester"
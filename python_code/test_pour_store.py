@@ -0,0 +1,110 @@
+# test_pour_store.py
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from pour_store import PourStore, open_store
+
+LEGACY = """start_time,start_distance,empty_distance,operator,employee_id,shift,end_time,end_distance,total_weight_kg,duration_sec
+2025-12-18 16:22:57.397762,13.33,13.36,,,A,2025-12-18 16:23:41.332921,12.43,46065.95,43.9
+2025-12-18 16:23:42.613858,12.41,13.36,Shyam,1432,A,2025-12-18 16:24:39.106596,11.73,80256.68,56.5
+"""
+
+
+@pytest.fixture
+def store(tmp_path):
+    s = PourStore(str(tmp_path / "pours.db"))
+    yield s
+    s.close()
+
+
+def pour(day, hour, **extra):
+    return {"pour_start": datetime(2026, 3, day, hour), "operator": "Asha", "shift": "A",
+            "total_weight_kg": 80000.0, "duration_s": 60.0, **extra}
+
+
+def test_append_and_append_many(store):
+    first = store.append(**pour(1, 6), adhered=1)
+    assert store.append_many([pour(1, 7), pour(2, 8, operator="Ravi")]) == 2
+    assert store.append_many([]) == 0
+    assert store.count() == 3
+
+    rows = store.load()
+    assert rows.at[0, "pour_start"] == "2026-03-01 06:00:00"   # datetimes stored as text
+    assert rows["operator"].tolist() == ["Asha", "Asha", "Ravi"]
+    assert first == 1
+
+    with pytest.raises(KeyError):
+        store.append(pour_start="2026-03-01", colour="red")
+    with pytest.raises(KeyError):
+        store.append_many([{"colour": "red"}])
+
+
+def test_nan_and_numpy_values_become_sql(store):
+    store.append(**pour(1, 6, fill_pct=float("nan"), total_weight_kg=np.float32(5.5)))
+    row = store.load().iloc[0]
+    assert pd.isna(row["fill_pct"])                 # NaN is stored as NULL
+    assert row["total_weight_kg"] == 5.5
+
+
+def test_import_csv_renames_derives_ids_and_runs_once(store, tmp_path):
+    path = tmp_path / "pour_history.csv"
+    path.write_text(LEGACY)
+
+    assert store.import_csv(str(path)) == 2
+    assert store.import_csv(str(path)) == 0             # recorded in imported_files
+    assert store.import_csv(str(tmp_path / "missing.csv")) == 0
+
+    rows = store.load()
+    assert rows["pour_id"].tolist() == ["20251218_162257", "20251218_162342"]
+    assert rows["duration_s"].tolist() == [43.9, 56.5]
+    assert rows["end_distance_m"].tolist() == [12.43, 11.73]
+    assert rows["operator"].isna().tolist() == [True, False]   # empty cells stay NULL
+
+
+def test_open_store_imports_legacy_csv_only_for_the_live_db(tmp_path):
+    path = tmp_path / "pour_history.csv"
+    path.write_text(LEGACY)
+    scratch = open_store(str(tmp_path / "scratch.db"), legacy_csv=str(path))
+    assert scratch.count() == 0
+    assert open_store(str(tmp_path / "scratch.db")) is scratch
+
+
+def test_version_changes_on_append_and_reweigh(store):
+    v0 = store.version()
+    row_id = store.append(**pour(1, 6))
+    v1 = store.version()
+    assert v1 != v0
+
+    assert store.update_weights({row_id: 1234.0}) == 1
+    v2 = store.version()
+    assert v2 != v1 and v2[0] == v1[0]
+    assert store.load().at[0, "total_weight_kg"] == 1234.0
+
+
+def test_query_filters_and_pages_newest_first(store):
+    store.append_many(
+        [pour(day, 6 + i, shift=shift, operator=op)
+         for day in (1, 2, 3)
+         for i, (shift, op) in enumerate([("A", "Asha"), ("B", "Ravi"), ("C", "Asha")])]
+    )
+
+    page, total = store.query(limit=4)
+    assert total == 9 and len(page) == 4
+    assert page["pour_start"].iloc[0] == "2026-03-03 08:00:00"
+    rest, _ = store.query(offset=8, limit=4)
+    assert rest["pour_start"].tolist() == ["2026-03-01 06:00:00"]
+
+    # date_to is inclusive of the whole day
+    _, total = store.query(date_from="2026-03-02", date_to="2026-03-02")
+    assert total == 3
+    _, total = store.query(date_from="2026-03-02", shifts=["A", "B"])
+    assert total == 4
+    page, total = store.query(operator="Ravi", date_to="2026-03-02")
+    assert total == 2 and set(page["shift"]) == {"B"}
+
+    assert store.distinct("operator") == ["Asha", "Ravi"]
+    with pytest.raises(KeyError):
+        store.distinct("colour")
@@ -0,0 +1,76 @@
+# test_radar_acquisition.py
+import socket
+import time
+
+import pytest
+
+import INIT_PARAMS as IPS
+import radar_acquisition as ra
+from radar_sim import Profile, RadarSlave, serve_tcp, synthetic_profile, tcp_port
+
+
+@pytest.fixture
+def quick_idle(monkeypatch):
+    monkeypatch.setattr(ra, "IDLE_STOP_S", 0.5)
+    monkeypatch.setattr(IPS, "TRACE_RECORDING", False)
+
+
+@pytest.fixture
+def radar_port():
+    server = serve_tcp(RadarSlave(Profile(synthetic_profile(), 20.0), baud=0), port=0)
+    yield tcp_port(server)
+    server.shutdown()
+
+
+def test_answering_port_keeps_running_unwatched(quick_idle, radar_port):
+    acq = ra.RadarAcquisition(radar_port, 10.0, store_path=None).start()
+    try:
+        time.sleep(2.0)                 # four idle periods, no reader
+        assert acq.alive
+        assert acq.pours.status()["t"] is not None
+    finally:
+        acq.stop()
+
+
+def test_silent_port_stops_when_unwatched(quick_idle):
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = f"tcp:127.0.0.1:{s.getsockname()[1]}"  # nothing listening once closed
+    acq = ra.RadarAcquisition(port, 10.0, store_path=None).start()
+    deadline = time.monotonic() + 10
+    while acq.alive and time.monotonic() < deadline:
+        time.sleep(0.1)
+    assert not acq.alive
+
+
+def test_restarted_worker_keeps_the_detector(quick_idle, radar_port):
+    first = ra.start_acquisition(radar_port, 10.0)
+    first.pours.set_context(ladle_id=None, operator="Tester")
+    first.stop()
+    first._thread.join(5)
+
+    second = ra.start_acquisition(radar_port, 10.0)
+    try:
+        assert second is not first
+        assert second.pours is first.pours
+        assert second.pours.context()["operator"] == "Tester"
+    finally:
+        second.stop()
+
+
+def test_unwatched_worker_still_records_traces(quick_idle, radar_port, tmp_path, monkeypatch):
+    from trace_recorder import TraceRecorder, load_slice
+
+    recorder = TraceRecorder(str(tmp_path))
+    monkeypatch.setattr(IPS, "TRACE_RECORDING", True)
+    monkeypatch.setattr(ra, "get_recorder", lambda: recorder)
+    t0 = time.time()
+    acq = ra.RadarAcquisition(radar_port, 10.0, store_path=None).start()
+    time.sleep(3.5)                     # well past IDLE_STOP_S, nobody reading
+    recorder.close()
+    acq.stop()
+
+    trace = load_slice(t0, time.time(), str(tmp_path))
+    # no ladle yet, so the radar is polled at the idle rate (1 Hz)
+    assert len(trace) >= 3
+    assert trace["t"][-1] - t0 > 2.0    # still recording after the idle limit
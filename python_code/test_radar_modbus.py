@@ -0,0 +1,112 @@
+# test_radar_modbus.py
+import pytest
+
+from radar_acquisition import SAMPLE_REGS
+from radar_modbus import (
+    RadarSession, decode_floats, encode_float, plan_reads, _split_span,
+    REG_DISTANCE, REG_POWER, REG_SNR, REG_TEMPERATURE,
+)
+from radar_sim import Profile, RadarSlave, serve_tcp, synthetic_profile, tcp_port
+
+REGS = list(SAMPLE_REGS.values())       # 4096 ... 4122
+
+
+def test_plan_merges_the_sample_registers_into_one_span():
+    assert plan_reads(REGS) == [(4096, 28)]
+    assert plan_reads(REGS, max_gap=0) == [(4096, 8), (4110, 2), (4120, 4)]
+    assert plan_reads(REGS, max_count=20) == [(4096, 16), (4120, 4)]
+
+
+def test_split_drops_gaps_then_goes_one_float_at_a_time():
+    assert _split_span(4096, 28, REGS) == [(4096, 8), (4110, 2), (4120, 4)]
+    assert _split_span(4120, 4, REGS) == [(4120, 2), (4122, 2)]
+
+
+def test_decode_floats_reads_each_register_from_the_block():
+    words = encode_float(1.5) + [0, 0] + encode_float(-2.25)
+    assert decode_floats(4096, words, [4096, 4100]) == {4096: 1.5, 4100: -2.25}
+
+
+class DropOnce(RadarSlave):
+    """Leaves the next ``drops`` requests unanswered."""
+
+    drops = 0
+
+    def handle(self, frame):
+        if self.drops:
+            self.drops -= 1
+            with self.lock:
+                self.stats["requests"] += 1
+                self.stats["timeouts"] += 1
+            return None
+        return super().handle(frame)
+
+
+@pytest.fixture
+def radar():
+    def start(**faults):
+        slave = DropOnce(Profile(synthetic_profile(), 20.0), baud=0, **faults)
+        server = serve_tcp(slave, port=0)
+        servers.append(server)
+        session = RadarSession(tcp_port(server), timeout=0.3)
+        sessions.append(session)
+        return slave, session
+
+    servers, sessions = [], []
+    yield start
+    for session in sessions:
+        session.close()
+    for server in servers:
+        server.shutdown()
+
+
+def requests(slave):
+    return slave.report()["requests"]
+
+
+def test_one_request_for_every_sample_register(radar):
+    slave, session = radar()
+    values = session.read_floats(REGS)
+    assert all(v is not None for v in values.values())
+    assert requests(slave) == 1
+
+
+def test_rejected_diagnostics_are_split_and_remembered(radar):
+    slave, session = radar(reject=[REG_POWER, REG_SNR])
+
+    values = session.read_floats(REGS)
+    assert values[REG_POWER] is None and values[REG_SNR] is None
+    assert values[REG_DISTANCE] is not None and values[REG_TEMPERATURE] is not None
+    # 4096+28 refused -> 3 spans; 4120+4 refused -> 2 single floats
+    assert requests(slave) == 6
+    assert session._split == {(4096, 28), (4120, 4)}
+
+    before = requests(slave)
+    session.read_floats(REGS)
+    assert requests(slave) - before == 4        # straight to the smaller reads
+
+
+def test_a_single_timeout_does_not_split(radar):
+    slave, session = radar()
+    session.read_floats(REGS)                   # connect
+
+    slave.drops = 1
+    values = session.read_floats(REGS)
+    assert all(v is not None for v in values.values())
+    assert session._split == set()
+    assert session.connected
+
+    before = requests(slave)
+    session.read_floats(REGS)
+    assert requests(slave) - before == 1        # still one block
+
+
+def test_a_dead_link_is_dropped_not_split(radar):
+    slave, session = radar()
+    session.read_floats(REGS)
+
+    slave.drops = 100
+    values = session.read_floats(REGS)
+    assert all(v is None for v in values.values())
+    assert session._split == set()
+    assert not session.connected
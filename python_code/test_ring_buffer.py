@@ -0,0 +1,51 @@
+# test_ring_buffer.py
+import math
+
+import numpy as np
+
+from ring_buffer import RingBuffer
+
+
+def test_append_wraps_and_keeps_newest_contiguous():
+    buf = RingBuffer(4, ["v"])
+    for i in range(10):
+        buf.append(float(i), v=i * 10)
+
+    assert len(buf) == 4
+    assert buf.total == 10
+    np.testing.assert_array_equal(buf.t(), [6, 7, 8, 9])
+    np.testing.assert_array_equal(buf.column("v"), [60, 70, 80, 90])
+    np.testing.assert_array_equal(buf.t(2), [8, 9])
+    assert buf.last() == 9 and buf.last("v") == 90
+
+
+def test_extend_across_the_wrap_matches_append():
+    a, b = RingBuffer(5, ["v"]), RingBuffer(5, ["v"])
+    t = np.arange(13, dtype=float)
+    for chunk in (t[:3], t[3:7], t[7:]):
+        a.extend(chunk, v=chunk * 2)
+    for x in t:
+        b.append(x, v=x * 2)
+
+    np.testing.assert_array_equal(a.t(), b.t())
+    np.testing.assert_array_equal(a.column("v"), b.column("v"))
+    assert a.total == b.total == 13
+
+
+def test_extend_longer_than_capacity_keeps_the_tail():
+    buf = RingBuffer(3, ["v"])
+    buf.extend(np.arange(8.0), v=np.arange(8.0))
+    np.testing.assert_array_equal(buf.t(), [5, 6, 7])
+    assert buf.total == 8
+
+
+def test_missing_values_are_nan_and_since_counts_newer():
+    buf = RingBuffer(4, ["a", "b"])
+    buf.append(1.0, a=1)
+    buf.append(2.0, a=2, b=None)
+    assert math.isnan(buf.last("b"))
+    assert buf.since(1.0) == 1
+    assert buf.since(0.0) == 2
+
+    buf.clear()
+    assert len(buf) == 0 and buf.last() is None
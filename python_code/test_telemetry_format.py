@@ -0,0 +1,48 @@
+# test_telemetry_format.py
+import json
+
+import numpy as np
+import pytest
+
+import telemetry_format as tf
+
+
+def radar_batch(n=10):
+    rec = np.zeros(n, tf.RADAR_DTYPE)
+    rec["t"] = 1.7e9 + np.arange(n) / 10
+    rec["material_height"] = np.linspace(0, 1, n)
+    rec["fill_pct"] = np.linspace(0, 20, n)
+    rec["current"] = 4.0
+    rec["temperature"] = np.nan
+    return rec
+
+
+def test_radar_round_trip():
+    rec = radar_batch()
+    payload = tf.encode(tf.KIND_RADAR, rec)
+    assert tf.is_binary(payload)
+    assert len(payload) == tf.HEADER.size + len(rec) * tf.RADAR_DTYPE.itemsize
+
+    kind, back = tf.decode(payload)
+    assert kind == tf.KIND_RADAR and tf.KIND_NAMES[kind] == "rs485"
+    assert back.tobytes() == rec.tobytes()      # NaN fields included
+    assert not back.flags.writeable     # a view over the payload, not a copy
+
+
+def test_gyro_from_columns_fills_missing_with_nan():
+    payload = tf.encode(tf.KIND_GYRO, {"t": [1.0, 2.0], "x": [0.1, 0.2]})
+    kind, back = tf.decode(payload)
+    assert kind == tf.KIND_GYRO
+    np.testing.assert_allclose(back["x"], [0.1, 0.2], rtol=1e-6)
+    assert np.isnan(back["y"]).all()
+
+
+def test_bad_payloads_raise_format_error():
+    payload = tf.encode(tf.KIND_RADAR, radar_batch(3))
+    with pytest.raises(tf.FormatError):
+        tf.decode(payload[:-1])                         # truncated
+    with pytest.raises(tf.FormatError):
+        tf.decode(b"LT" + bytes([9, 1, 0, 0, 0, 0]))    # unknown version
+    with pytest.raises(tf.FormatError):
+        tf.decode(json.dumps({"t": 1}).encode())        # JSON fallback
+    assert not tf.is_binary(b'{"material_height": 1}')
@@ -0,0 +1,65 @@
+# test_trace_recorder.py
+import math
+
+import numpy as np
+
+from trace_recorder import (
+    TraceRecorder, TRACE_DTYPE, TRACE_FIELDS, list_segments, load_slice, read_slice
+)
+
+
+def records(t0, n, hz=10.0):
+    rec = np.zeros(n, TRACE_DTYPE)
+    rec["t"] = t0 + np.arange(n) / hz
+    for i, name in enumerate(TRACE_FIELDS):
+        rec[name] = np.arange(n) + i
+    return rec
+
+
+def test_segments_round_trip(tmp_path):
+    rec = TraceRecorder(str(tmp_path), max_bytes=100 * TRACE_DTYPE.itemsize)
+    data = records(1.7e9, 450)
+    for chunk in np.array_split(data, 9):
+        rec.write(chunk)
+    rec.close()
+
+    assert len(list_segments(str(tmp_path))) == 5      # rotated by size
+    back = load_slice(data["t"][0], data["t"][-1], str(tmp_path))
+    np.testing.assert_array_equal(back, data)
+
+
+def test_slice_bounds_and_views(tmp_path):
+    rec = TraceRecorder(str(tmp_path), max_bytes=100 * TRACE_DTYPE.itemsize)
+    data = records(1.7e9, 300)
+    for chunk in np.array_split(data, 6):
+        rec.write(chunk)
+    rec.close()
+
+    t0, t1 = data["t"][120], data["t"][260]
+    views = read_slice(t0, t1, str(tmp_path))
+    assert len(views) == 2 and all(isinstance(v, np.memmap) for v in views)
+    np.testing.assert_array_equal(np.concatenate(views), data[120:261])
+    assert len(load_slice(0, 1, str(tmp_path))) == 0
+
+
+def test_record_stores_missing_fields_as_nan(tmp_path):
+    rec = TraceRecorder(str(tmp_path))
+    rec.record(t=5.0, distance=12.5)
+    rec.record(t=6.0, distance=None, snr=30)
+    rec.close()
+
+    back = load_slice(0, 10, str(tmp_path))
+    assert back["distance"][0] == 12.5 and math.isnan(back["distance"][1])
+    assert math.isnan(back["snr"][0]) and back["snr"][1] == 30
+
+
+def test_old_segments_are_pruned(tmp_path):
+    rec = TraceRecorder(str(tmp_path), max_bytes=10 * TRACE_DTYPE.itemsize, max_segments=3)
+    data = records(1.7e9, 100)
+    for chunk in np.array_split(data, 10):
+        rec.write(chunk)
+    rec.close()
+
+    segments = list_segments(str(tmp_path))
+    assert len(segments) == 3
+    np.testing.assert_array_equal(load_slice(0, 2e9, str(tmp_path)), data[70:])
@@ -0,0 +1,81 @@
+# test_trend_chart.py
+import numpy as np
+
+from trend_chart import TrendPyramid, lttb, minmax_buckets
+
+
+def test_lttb_keeps_ends_and_the_spike():
+    x = np.arange(1000.0)
+    y = np.zeros(1000)
+    y[437] = 50.0
+    idx = lttb(x, y, 50)
+
+    assert len(idx) == 50
+    assert idx[0] == 0 and idx[-1] == 999
+    assert np.all(np.diff(idx) > 0)
+    assert 437 in idx
+
+
+def test_lttb_returns_everything_when_small():
+    np.testing.assert_array_equal(lttb(np.arange(5.0), np.arange(5.0), 10), np.arange(5))
+
+
+def test_minmax_buckets_keep_extremes():
+    x = np.arange(100.0)
+    y = np.sin(x)
+    y[63] = -9.0
+    bx, by = minmax_buckets(x, y, y, 20)
+
+    assert len(bx) == len(by) <= 20
+    assert by.min() == -9.0
+    assert by.max() == y.max()
+
+
+def test_levels_aggregate_min_max():
+    trend = TrendPyramid(["v"], capacity=1000, factor=10, levels=3)
+    for i in range(250):
+        trend.append(float(i), v=float(i % 10))
+
+    fine, coarse = trend.levels
+    assert len(trend) == 250
+    assert len(fine) == 25 and len(coarse) == 2
+    np.testing.assert_array_equal(fine.column("v_min"), 0)
+    np.testing.assert_array_equal(fine.column("v_max"), 9)
+    np.testing.assert_array_equal(fine.t()[:3], [0, 10, 20])
+    np.testing.assert_array_equal(coarse.t(), [0, 100])
+
+
+def test_series_picks_a_coarse_level_for_long_windows():
+    trend = TrendPyramid(["v"], capacity=20000, factor=10, levels=3)
+    for i in range(20000):
+        trend.append(float(i), v=float(i))
+
+    short = trend.series("v", 50, width=100)
+    assert len(short) <= 100
+    assert short["v"].iloc[-1] == 19999
+
+    whole = trend.series("v", 20000, width=100)
+    assert len(whole) <= 100
+    assert whole["v"].min() < 100 and whole["v"].max() > 19900
+
+
+def test_young_buffer_stays_at_full_resolution():
+    trend = TrendPyramid(["v"], capacity=18000, factor=10, levels=3)
+    for i in range(600):                # 60 s at 10 Hz, younger than both windows
+        trend.append(1.7e9 + i / 10, v=float(i))
+
+    for window_s in (90, 1800):
+        series = trend.series("v", window_s, width=600)
+        assert len(series) == 600
+        assert series["v"].iloc[-1] == 599
+
+
+def test_coarse_levels_include_the_filling_bucket():
+    trend = TrendPyramid(["v"], capacity=100, factor=10, levels=3)
+    for i in range(1005):               # base keeps the last 100 s only
+        trend.append(float(i), v=0.0)
+    for i in range(1005, 1008):
+        trend.append(float(i), v=42.0)  # not yet rolled into any level
+
+    series = trend.series("v", 1000, width=50)
+    assert series["v"].max() == 42.0
@@ -0,0 +1,168 @@
+# trace_recorder.py
+import glob
+import math
+import os
+import threading
+import time
+
+import numpy as np
+
+# =====================================================
+# TRACE CONFIG
+# =====================================================
+TRACE_DIR = os.path.join("data", "traces")
+SEGMENT_MAX_BYTES = 64 * 1024 * 1024   # rotate by size ...
+SEGMENT_MAX_AGE_S = 6 * 3600           # ... or by age
+MAX_SEGMENTS = 120                     # oldest files are deleted beyond this
+
+# one fixed-width little-endian record per reading (36 bytes)
+TRACE_DTYPE = np.dtype([
+    ("t", "<f8"),                # epoch seconds
+    ("distance", "<f4"),
+    ("current", "<f4"),
+    ("temperature", "<f4"),
+    ("power", "<f4"),
+    ("snr", "<f4"),
+    ("material_height", "<f4"),
+    ("fill_pct", "<f4"),
+])
+TRACE_FIELDS = TRACE_DTYPE.names[1:]
+
+
+def _segment_name(t):
+    return f"trace_{int(t * 1000):015d}.bin"
+
+
+def _segment_start(path):
+    return int(os.path.basename(path)[6:-4]) / 1000.0
+
+
+# =====================================================
+# WRITER
+# =====================================================
+class TraceRecorder:
+    """Appends every reading to rotating binary segment files.
+
+    Records are written through an ordinary append handle; readers map
+    the same files with ``np.memmap`` so slices are never copied.
+    """
+
+    def __init__(self, directory=TRACE_DIR, max_bytes=SEGMENT_MAX_BYTES,
+                 max_age_s=SEGMENT_MAX_AGE_S, max_segments=MAX_SEGMENTS):
+        self.directory = directory
+        self.max_bytes = max_bytes - max_bytes % TRACE_DTYPE.itemsize
+        self.max_age_s = max_age_s
+        self.max_segments = max_segments
+        self.lock = threading.Lock()
+
+        self._file = None
+        self._opened_at = 0.0
+        self._written = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def _rotate(self, t):
+        if self._file is not None:
+            self._file.close()
+        path = os.path.join(self.directory, _segment_name(t))
+        self._file = open(path, "ab")
+        self._opened_at = time.monotonic()
+        self._written = self._file.tell()
+
+        segments = list_segments(self.directory)
+        for old in segments[:max(len(segments) - self.max_segments, 0)]:
+            os.remove(old)
+
+    def record(self, t=None, **values):
+        """Write one reading; fields not given (or None) are stored as NaN."""
+        rec = np.zeros(1, TRACE_DTYPE)
+        rec["t"] = time.time() if t is None else t
+        for name in TRACE_FIELDS:
+            v = values.get(name)
+            rec[name] = math.nan if v is None else v
+        self.write(rec)
+
+    def write(self, records):
+        """Write an array of ``TRACE_DTYPE`` records in one call."""
+        data = np.ascontiguousarray(records, TRACE_DTYPE).tobytes()
+        with self.lock:
+            if (self._file is None
+                    or self._written + len(data) > self.max_bytes
+                    or time.monotonic() - self._opened_at > self.max_age_s):
+                self._rotate(float(records["t"][0]))
+            self._file.write(data)
+            # flushed, not fsync'd: a reader in this process sees it at once
+            self._file.flush()
+            self._written += len(data)
+
+    def close(self):
+        with self.lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+# =====================================================
+# READERS (ZERO-COPY)
+# =====================================================
+def list_segments(directory=TRACE_DIR):
+    return sorted(glob.glob(os.path.join(directory, "trace_*.bin")))
+
+
+def open_segment(path):
+    """Read-only memory map of every complete record in a segment."""
+    n = os.path.getsize(path) // TRACE_DTYPE.itemsize
+    if n == 0:
+        return np.zeros(0, TRACE_DTYPE)
+    return np.memmap(path, TRACE_DTYPE, mode="r", shape=(n,))
+
+
+def read_slice(t0, t1, directory=TRACE_DIR):
+    """Records with ``t0 <= t <= t1`` as a list of memmap views, one per
+    segment touched (concatenate only if a single array is needed)."""
+    segments = list_segments(directory)
+    starts = [_segment_start(p) for p in segments]
+
+    views = []
+    for i, path in enumerate(segments):
+        seg_end = starts[i + 1] if i + 1 < len(segments) else math.inf
+        if starts[i] > t1 or seg_end < t0:
+            continue
+        rec = open_segment(path)
+        lo = np.searchsorted(rec["t"], t0, side="left")
+        hi = np.searchsorted(rec["t"], t1, side="right")
+        if hi > lo:
+            views.append(rec[lo:hi])
+    return views
+
+
+def load_slice(t0, t1, directory=TRACE_DIR):
+    views = read_slice(t0, t1, directory)
+    if not views:
+        return np.zeros(0, TRACE_DTYPE)
+    if len(views) == 1:
+        return views[0]
+    return np.concatenate(views)
+
+
+# =====================================================
+# ONE RECORDER PER PROCESS
+# =====================================================
+def trace_dir(station=None):
+    """Segment directory of an MQTT station (its own subdirectory), or
+    the shared one for the locally wired radar."""
+    if not isinstance(station, str) or not station:     # None / NaN from pandas
+        return TRACE_DIR
+    return os.path.join(TRACE_DIR, station)
+
+
+_recorders = {}
+_recorder_lock = threading.Lock()
+
+
+def get_recorder(directory=TRACE_DIR):
+    """One recorder per directory, per process."""
+    with _recorder_lock:
+        rec = _recorders.get(directory)
+        if rec is None:
+            rec = _recorders[directory] = TraceRecorder(directory)
+        return rec
@@ -0,0 +1,184 @@
+# trend_chart.py
+import math
+
+import numpy as np
+import pandas as pd
+
+import INIT_PARAMS as IPS
+from ring_buffer import RingBuffer, local_times
+
+# =====================================================
+# TREND CONFIG
+# =====================================================
+LEVEL_FACTOR = 10       # each coarser level aggregates this many samples
+LEVELS = 3              # full-res + 2 coarse levels (1 s and 10 s at 10 Hz)
+OVERSAMPLE = 8          # use a level while it has <= width * OVERSAMPLE points
+
+# windows offered in the UI (label -> seconds)
+TREND_WINDOWS = {
+    "Last 90 s": 90,
+    "Last 30 min": 1800,
+    "Shift (8 h)": 8 * 3600,
+    "Day (24 h)": 24 * 3600,
+}
+
+
+# =====================================================
+# DOWNSAMPLING
+# =====================================================
+def lttb(x, y, n_out):
+    """Largest-Triangle-Three-Buckets: indices of ``n_out`` points that
+    keep the visual shape of ``y(x)``."""
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+
+    edges = np.linspace(1, n - 1, n_out - 1).astype(int)
+    out = np.empty(n_out, int)
+    out[0], out[-1] = 0, n - 1
+
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        nlo = edges[i + 1]
+        nhi = edges[i + 2] if i + 2 < len(edges) else n
+        avg_x = x[nlo:nhi].mean()
+        avg_y = y[nlo:nhi].mean()
+
+        area = np.abs(
+            (x[a] - avg_x) * (y[lo:hi] - y[a])
+            - (x[a] - x[lo:hi]) * (avg_y - y[a])
+        )
+        a = lo + int(area.argmax())
+        out[i + 1] = a
+    return out
+
+
+def minmax_buckets(x, ymin, ymax, n_out):
+    """Collapse (x, min, max) rows into at most ``n_out`` min/max pairs,
+    returned as interleaved (x, y) points so spikes stay visible."""
+    n = len(x)
+    buckets = max(n_out // 2, 1)
+    if n > buckets:
+        starts = np.linspace(0, n, buckets, endpoint=False).astype(int)
+        x = x[starts]
+        ymin = np.fmin.reduceat(ymin, starts)
+        ymax = np.fmax.reduceat(ymax, starts)
+    return np.repeat(x, 2), np.column_stack([ymin, ymax]).ravel()
+
+
+# =====================================================
+# MULTI-RESOLUTION TREND STORE
+# =====================================================
+class TrendPyramid:
+    """Full-resolution ring buffer plus coarser min/max levels that are
+    updated incrementally on every append.
+
+    ``series`` picks the finest level that covers the requested window
+    cheaply and downsamples it to the chart width, so a whole day costs
+    about the same to draw as the last 90 seconds.
+    """
+
+    def __init__(self, columns, capacity=IPS.TREND_CAPACITY,
+                 factor=LEVEL_FACTOR, levels=LEVELS):
+        self.columns = tuple(columns)
+        self.factor = factor
+        self.base = RingBuffer(capacity, self.columns)
+        agg_cols = [f"{c}_min" for c in self.columns] + [f"{c}_max" for c in self.columns]
+        self.levels = [RingBuffer(capacity, agg_cols) for _ in range(levels - 1)]
+        self._acc = [self._new_acc() for _ in self.levels]
+
+    def _new_acc(self):
+        k = len(self.columns)
+        return {"n": 0, "t": 0.0, "min": np.full(k, np.inf), "max": np.full(k, -np.inf)}
+
+    def __len__(self):
+        return len(self.base)
+
+    # ---------------- write ----------------
+    def append(self, t, **values):
+        self.base.append(t, **values)
+        v = np.array(
+            [math.nan if values.get(c) is None else values[c] for c in self.columns],
+            np.float64
+        )
+        self._push(0, t, v, v)
+
+    def _push(self, k, t, vmin, vmax):
+        if k >= len(self.levels):
+            return
+        acc = self._acc[k]
+        if acc["n"] == 0:
+            acc["t"] = t
+        acc["min"] = np.fmin(acc["min"], vmin)
+        acc["max"] = np.fmax(acc["max"], vmax)
+        acc["n"] += 1
+
+        if acc["n"] == self.factor:
+            lo = np.where(np.isinf(acc["min"]), np.nan, acc["min"])
+            hi = np.where(np.isinf(acc["max"]), np.nan, acc["max"])
+            row = {f"{c}_min": lo[i] for i, c in enumerate(self.columns)}
+            row.update({f"{c}_max": hi[i] for i, c in enumerate(self.columns)})
+            self.levels[k].append(acc["t"], **row)
+            self._acc[k] = self._new_acc()
+            self._push(k + 1, acc["t"], lo, hi)
+
+    def clear(self):
+        self.base.clear()
+        for lvl in self.levels:
+            lvl.clear()
+        self._acc = [self._new_acc() for _ in self.levels]
+
+    # ---------------- read ----------------
+    def _pick_level(self, t0, width):
+        chosen = None
+        for k, buf in enumerate([self.base] + self.levels):
+            if not len(buf):
+                break
+            n = buf.since(t0)
+            if chosen is not None:
+                _, finer, n_finer = chosen
+                if n_finer <= width * OVERSAMPLE and buf.t()[0] >= finer.t()[0]:
+                    break           # coarser, but reaches no further back
+            chosen = (k, buf, n)
+            if n < len(buf) and n <= width * OVERSAMPLE:
+                break
+        return chosen
+
+    def _partial(self, k, column):
+        """(t, min, max) of the newest samples not yet rolled up into
+        level ``k`` (the buckets still filling below it), or None."""
+        accs = [acc for acc in self._acc[:k] if acc["n"]]
+        if not accs:
+            return None
+        i = self.columns.index(column)
+        lo = np.fmin.reduce([acc["min"][i] for acc in accs])
+        hi = np.fmax.reduce([acc["max"][i] for acc in accs])
+        # the coarsest partial bucket started first
+        return accs[-1]["t"], (math.nan if np.isinf(lo) else lo), (math.nan if np.isinf(hi) else hi)
+
+    def series(self, column, window_s, width=IPS.TREND_CHART_POINTS):
+        """DataFrame of at most ~``width`` points for the last ``window_s``
+        seconds of ``column``, indexed by local time."""
+        t_end = self.base.last()
+        if t_end is None:
+            return pd.DataFrame({column: []})
+
+        k, buf, n = self._pick_level(t_end - window_s, width)
+        t = buf.t(n)
+        if k == 0:
+            y = buf.column(column, n)
+            ok = ~np.isnan(y)
+            t, y = t[ok], y[ok]
+            idx = lttb(t - t[0] if len(t) else t, y, width)
+            t, y = t[idx], y[idx]
+        else:
+            ymin, ymax = buf.column(f"{column}_min", n), buf.column(f"{column}_max", n)
+            partial = self._partial(k, column)
+            if partial is not None:
+                t = np.append(t, partial[0])
+                ymin = np.append(ymin, partial[1])
+                ymax = np.append(ymax, partial[2])
+            t, y = minmax_buckets(t, ymin, ymax, width)
+
+        return pd.DataFrame({column: y}, index=pd.Index(local_times(t), name="time"))
@@ -0,0 +1,189 @@
+# video_source.py
+import queue
+import threading
+import time
+from pathlib import Path
+
+import cv2
+
+import INIT_PARAMS as IPS
+
+# =====================================================
+# VIDEO SOURCES (GENERATORS OF DISPLAY-READY JPEG BYTES)
+# =====================================================
+# Every source decodes lazily, drops frames to hold ``fps`` and shrinks
+# to ``width`` before encoding, so the browser only ever gets small
+# JPEGs at the display rate whatever the camera or file produces.
+JPEG_QUALITY = 80
+IDLE_STOP_S = 60        # stop decoding a feed nobody has looked at for this long
+
+
+def fit_width(frame, width):
+    """Shrink a BGR frame to ``width`` (never enlarges)."""
+    h, w = frame.shape[:2]
+    if not width or w <= width:
+        return frame
+    return cv2.resize(frame, (width, round(h * width / w)), interpolation=cv2.INTER_AREA)
+
+
+def encode_jpeg(frame, quality=JPEG_QUALITY):
+    ok, buf = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, quality])
+    return buf.tobytes() if ok else None
+
+
+def file_frames(path, fps=IPS.VIDEO_FPS, width=IPS.VIDEO_FEED_WIDTH, loop=True):
+    """JPEGs from a video file at ``fps``. Skipped frames are only
+    ``grab``bed (demuxed, never converted or resized)."""
+    cap = cv2.VideoCapture(str(path))
+    if not cap.isOpened():
+        raise FileNotFoundError(path)
+    native = cap.get(cv2.CAP_PROP_FPS) or fps
+    step = max(native / fps, 1.0)
+    try:
+        position = 0.0          # source frame we want next
+        index = 0               # source frame the capture is at
+        while True:
+            while index < int(position):
+                if not cap.grab():
+                    break
+                index += 1
+            ok, frame = cap.read()
+            if not ok:
+                if not loop or index == 0:
+                    return
+                cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+                position, index = 0.0, 0
+                continue
+            index += 1
+            position += step
+            data = encode_jpeg(fit_width(frame, width))
+            if data is not None:
+                yield data
+    finally:
+        cap.release()
+
+
+def mqtt_frames(station, fps=IPS.VIDEO_FPS, width=IPS.VIDEO_FEED_WIDTH):
+    """JPEGs from a station's MQTT video topic at most ``fps`` times a
+    second. Frames that arrive in between are never decoded."""
+    from mqtt_client import device
+
+    state = device(station)
+    last = None
+    while True:
+        _, seq = state.frame()
+        if seq != last:
+            data = state.latest_jpeg(width)
+            if data is not None:
+                last = seq
+                yield data
+                continue
+        yield None              # nothing new this tick
+
+
+# =====================================================
+# FEED (ONE DECODER THREAD, BOUNDED QUEUE)
+# =====================================================
+class VideoFeed:
+    """Pulls a source generator at ``fps`` on a worker thread into a
+    queue of at most ``maxsize`` frames. When the viewer falls behind
+    the oldest frame is dropped, so memory and latency stay bounded;
+    when nobody reads for ``IDLE_STOP_S`` the worker stops."""
+
+    def __init__(self, make_source, fps=IPS.VIDEO_FPS, maxsize=IPS.VIDEO_QUEUE):
+        self.make_source = make_source
+        self.fps = fps
+        self.frames = queue.Queue(maxsize)
+        self.dropped = 0
+        self._last = None
+        self._last_read = time.monotonic()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="video-feed", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    @property
+    def alive(self):
+        return self._thread.is_alive() and not self._stop.is_set()
+
+    def _run(self):
+        source = self.make_source()
+        next_tick = time.monotonic()
+        try:
+            for data in source:
+                if self._stop.is_set() or time.monotonic() - self._last_read > IDLE_STOP_S:
+                    break
+                if data is not None:
+                    self._put(data)
+
+                next_tick += 1.0 / self.fps
+                delay = next_tick - time.monotonic()
+                if delay > 0:
+                    self._stop.wait(delay)
+                else:
+                    next_tick = time.monotonic()
+        finally:
+            source.close()
+            self._stop.set()
+
+    def _put(self, data):
+        while True:
+            try:
+                self.frames.put_nowait(data)
+                return
+            except queue.Full:
+                try:
+                    self.frames.get_nowait()
+                    self.dropped += 1
+                except queue.Empty:
+                    pass
+
+    def latest(self, wait_s=0.0):
+        """Newest JPEG bytes (the previous one if nothing new), or None.
+        ``wait_s`` allows time for a just-started feed's first frame."""
+        self._last_read = time.monotonic()
+        if self._last is None and wait_s:
+            try:
+                self._last = self.frames.get(timeout=wait_s)
+            except queue.Empty:
+                return None
+        while True:
+            try:
+                self._last = self.frames.get_nowait()
+            except queue.Empty:
+                return self._last
+
+
+# =====================================================
+# PROCESS-WIDE REGISTRY (ONE DECODER PER SOURCE)
+# =====================================================
+_feeds = {}
+_feeds_lock = threading.Lock()
+
+
+def _feed(key, make_source, fps):
+    with _feeds_lock:
+        feed = _feeds.get(key)
+        if feed is None or not feed.alive:
+            feed = VideoFeed(make_source, fps).start()
+            _feeds[key] = feed
+        return feed
+
+
+def file_feed(path=IPS.DEMO_VIDEO, fps=IPS.VIDEO_FPS, width=IPS.VIDEO_FEED_WIDTH):
+    """Shared feed looping a video file (relative paths are taken from
+    this directory)."""
+    path = Path(path)
+    if not path.is_absolute():
+        path = Path(__file__).parent / path
+    return _feed(("file", str(path), fps, width), lambda: file_frames(path, fps, width), fps)
+
+
+def station_feed(station, fps=IPS.VIDEO_FPS, width=IPS.VIDEO_FEED_WIDTH):
+    """Shared feed of one station's MQTT camera."""
+    return _feed(("mqtt", station, fps, width), lambda: mqtt_frames(station, fps, width), fps)